@@ -0,0 +1,214 @@
+''' Local stand-in for the IMS si command line client.
+
+    The IMS project is a JSON definition generated by generate_project.py and the value of
+    --project is the path of that file. Use it by setting
+    GTM_SI_COMMAND="python <path>/fake_si.py" before starting the syncher. '''
+
+###################################################################################################
+# imports
+
+import os
+import sys
+import json
+import stat
+import hashlib
+
+###################################################################################################
+# project model
+
+def load_project(project_file: str) -> dict:
+    ''' loads a generated project definition '''
+    with open(project_file, encoding="utf-8") as file:
+        return json.load(file)
+
+def get_dev_path_of(project: dict, revision: str) -> str:
+    ''' reports the dev path a checkpoint revision belongs to '''
+    prefix = revision[:revision.rfind(".")]
+    if prefix == "1":
+        return "main"
+    for dev_path in project["dev_paths"]:
+        if dev_path["prefix"] == prefix:
+            return dev_path["name"]
+    raise KeyError(revision)
+
+def get_checkpoint(project: dict, revision: str) -> dict:
+    ''' reports the checkpoint with the given revision '''
+    for checkpoint in project["checkpoints"][get_dev_path_of(project, revision)]:
+        if checkpoint["number"] == revision:
+            return checkpoint
+    raise KeyError(revision)
+
+def get_members(project: dict, revision: str) -> "dict[str, str]":
+    ''' reports member path -> member revision of a checkpoint by replaying the changes
+        from the first mainline checkpoint '''
+
+    dev_path_name = get_dev_path_of(project, revision)
+    if dev_path_name == "main":
+        members = {}
+    else:
+        dev_path = [item for item in project["dev_paths"] if item["name"] == dev_path_name][0]
+        members = get_members(project, dev_path["branch_point"])
+
+    for checkpoint in project["checkpoints"][dev_path_name]:
+        for path, member_revision in checkpoint["changes"].items():
+            if member_revision is None:
+                members.pop(path, None)
+            else:
+                members[path] = member_revision
+        if checkpoint["number"] == revision:
+            return members
+    raise KeyError(revision)
+
+def get_content(project: dict, path: str, member_revision: str) -> bytes:
+    ''' reports the deterministic content of a member revision '''
+    seed = hashlib.sha256(f"{path}@{member_revision}".encode("utf-8")).digest()
+    size = project["file_size"] * (1 + seed[0] % 3) // 2
+    return (seed * (size // len(seed) + 1))[:size]
+
+def compare_revisions(revision: str) -> "tuple[int]":
+    ''' sort key of a revision number '''
+    return tuple(int(part) for part in revision.split("."))
+
+###################################################################################################
+# sandbox model
+
+def write_member(sandbox_dir: str, path: str, content: bytes):
+    ''' writes a member read only like si does '''
+    file_path = os.path.join(sandbox_dir, path)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    if os.path.exists(file_path):
+        os.chmod(file_path, stat.S_IWRITE | stat.S_IREAD)
+    with open(file_path, "wb") as file:
+        file.write(content)
+    os.chmod(file_path, stat.S_IREAD)
+
+def remove_member(sandbox_dir: str, path: str):
+    ''' removes a member from the sandbox '''
+    file_path = os.path.join(sandbox_dir, path)
+    if os.path.exists(file_path):
+        os.chmod(file_path, stat.S_IWRITE | stat.S_IREAD)
+        os.unlink(file_path)
+
+def read_sandbox(sandbox_project: str) -> dict:
+    ''' reads the sandbox administration file '''
+    with open(sandbox_project, encoding="utf-8") as file:
+        return json.load(file)
+
+def write_sandbox(sandbox_project: str, sandbox: dict):
+    ''' writes the sandbox administration file '''
+    with open(sandbox_project, "w", encoding="utf-8") as file:
+        json.dump(sandbox, file)
+
+###################################################################################################
+# commands
+
+def projectinfo(options: dict, _):
+    ''' si projectinfo '''
+    project = load_project(options["project"])
+    print(f"Project Name: {options['project']}")
+    print(f"Members: {len(get_members(project, project['checkpoints']['main'][-1]['number']))}")
+    print("Development Paths:")
+    for dev_path in project["dev_paths"]:
+        print(f"\t{dev_path['name']} ({dev_path['branch_point']})")
+
+def viewprojecthistory(options: dict, _):
+    ''' si viewprojecthistory with --fields and --rfilter=range:A-[B] or devpath:name '''
+    project = load_project(options["project"])
+    fields = options.get("fields", "revision,author").split(",")
+    rfilter = options.get("rfilter", "range:1.1-")
+
+    if rfilter.startswith("devpath:"):
+        checkpoints = project["checkpoints"][rfilter[len("devpath:"):]]
+    else:
+        first, _, last = rfilter[len("range:"):].partition("-")
+        dev_path = get_dev_path_of(project, first)
+        checkpoints = [checkpoint for checkpoint in project["checkpoints"][dev_path]
+            if compare_revisions(checkpoint["number"]) >= compare_revisions(first)
+            and (not last or compare_revisions(checkpoint["number"]) <= compare_revisions(last))]
+
+    out = sys.stdout.buffer
+    out.write(f"{options['project']}\n".encode("ISO-8859-1"))
+    for checkpoint in reversed(checkpoints):
+        values = {"revision": checkpoint["number"], "author": checkpoint["author"],
+            "description": checkpoint["description"], "labels": ",".join(checkpoint["labels"])}
+        out.write(("\t".join(values[field] for field in fields) + "\n").encode("ISO-8859-1"))
+
+def createsandbox(options: dict, arguments: "list[str]"):
+    ''' si createsandbox --project --projectRevision directory '''
+    project = load_project(options["project"])
+    sandbox_dir = arguments[0]
+    revision = options["projectRevision"]
+    members = get_members(project, revision)
+    for path, member_revision in members.items():
+        write_member(sandbox_dir, path, get_content(project, path, member_revision))
+    write_sandbox(os.path.join(sandbox_dir, "project.pj"),
+        {"project": options["project"], "revision": revision, "members": members})
+
+def dropsandbox(options: dict, arguments: "list[str]"):
+    ''' si dropsandbox --delete=none sandbox_project '''
+    if not os.path.exists(arguments[0]):
+        sys.stderr.write(f"{arguments[0]} is not a registered sandbox\n")
+        sys.exit(128)
+
+def retargetsandbox(options: dict, arguments: "list[str]"):
+    ''' si retargetsandbox --projectRevision sandbox_project. Members are changed by resync. '''
+    sandbox = read_sandbox(arguments[0])
+    sandbox["target"] = options["projectRevision"]
+    write_sandbox(arguments[0], sandbox)
+
+def resync(options: dict, _):
+    ''' si resync --sandbox '''
+    sandbox_project = options["sandbox"]
+    sandbox_dir = os.path.dirname(sandbox_project)
+    sandbox = read_sandbox(sandbox_project)
+    project = load_project(sandbox["project"])
+    revision = sandbox.pop("target", sandbox["revision"])
+    members = get_members(project, revision)
+    for path in sandbox["members"]:
+        if path not in members:
+            remove_member(sandbox_dir, path)
+    for path, member_revision in members.items():
+        if sandbox["members"].get(path) != member_revision:
+            write_member(sandbox_dir, path, get_content(project, path, member_revision))
+    sandbox.update(revision=revision, members=members)
+    write_sandbox(sandbox_project, sandbox)
+
+def viewproject(options: dict, _):
+    ''' si viewproject --projectRevision --fields=name,memberrev '''
+    project = load_project(options["project"])
+    members = get_members(project, options["projectRevision"])
+    out = sys.stdout.buffer
+    for path, member_revision in sorted(members.items()):
+        out.write(f"{path}\t{member_revision}\n".encode("ISO-8859-1"))
+
+def viewrevision(options: dict, arguments: "list[str]"):
+    ''' si viewrevision --revision member, writes the member content to stdout '''
+    project = load_project(options["project"])
+    sys.stdout.buffer.write(get_content(project, arguments[0], options["revision"]))
+
+COMMANDS = {"projectinfo": projectinfo, "viewprojecthistory": viewprojecthistory,
+    "createsandbox": createsandbox, "dropsandbox": dropsandbox,
+    "retargetsandbox": retargetsandbox, "resync": resync, "viewproject": viewproject,
+    "viewrevision": viewrevision}
+
+###################################################################################################
+
+def main(argv: "list[str]"):
+    ''' parses the si command line and executes the command '''
+    options = {}
+    arguments = []
+    for arg in argv[1:]:
+        if arg.startswith("--"):
+            key, _, value = arg[2:].partition("=")
+            options[key] = value
+        elif not arg.startswith("-"):
+            arguments.append(arg)
+
+    command = COMMANDS.get(argv[0])
+    if command is None:
+        sys.stderr.write(f"unknown command {argv[0]}\n")
+        sys.exit(1)
+    command(options, arguments)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,125 @@
+''' Generates synthetic IMS projects for fake_si.py '''
+
+###################################################################################################
+# imports
+
+import json
+import random
+import argparse
+
+AUTHORS = ["anna", "bob", "carla", "dieter"]
+
+###################################################################################################
+
+class ProjectGenerator:
+    ''' generates a project definition.
+        checkpoints: number of mainline checkpoints
+        members: number of members of the first checkpoint
+        file_size: average member size in bytes
+        churn: fraction of the members changed per checkpoint
+        dev_paths: number of development paths
+        dev_path_checkpoints: number of checkpoints per development path
+        nesting: probability that a dev path is branched from another dev path '''
+
+    def __init__(self, checkpoints: int = 100, members: int = 1000, file_size: int = 4096,
+        churn: float = 0.01, dev_paths: int = 3, dev_path_checkpoints: int = 20,
+        nesting: float = 0.3, seed: int = 1):
+        self.checkpoints = checkpoints
+        self.members = members
+        self.file_size = file_size
+        self.churn = churn
+        self.dev_paths = dev_paths
+        self.dev_path_checkpoints = dev_path_checkpoints
+        self.nesting = nesting
+        self.rng = random.Random(seed)
+        self.member_count = 0
+        # checkpoint number -> member path -> member revision
+        self.states = {}
+
+    def new_member_path(self) -> str:
+        ''' reports the path of a new member '''
+        self.member_count += 1
+        number = self.member_count
+        return f"dir{number % 50:02d}/sub{number % 7}/member{number}.c"
+
+    def make_checkpoints(self, prefix: str, count: int, current: "dict[str, str]") -> list:
+        ''' generates count checkpoints numbered prefix.1 .. prefix.count '''
+        checkpoints = []
+        for index in range(1, count + 1):
+            changes = {}
+            if not current:
+                for _ in range(self.members):
+                    changes[self.new_member_path()] = "1.1"
+            else:
+                changed_count = max(1, int(len(current) * self.churn))
+                for path in self.rng.sample(sorted(current), changed_count):
+                    action = self.rng.random()
+                    if action < 0.05:
+                        changes[path] = None
+                    else:
+                        revision = current[path].split(".")
+                        revision[-1] = str(int(revision[-1]) + 1)
+                        changes[path] = ".".join(revision)
+                    if action > 0.95:
+                        changes[self.new_member_path()] = "1.1"
+
+            for path, revision in changes.items():
+                if revision is None:
+                    current.pop(path, None)
+                else:
+                    current[path] = revision
+            number = f"{prefix}.{index}"
+            self.states[number] = dict(current)
+
+            description = f"Checkpoint {number}"
+            if index % 3 == 0:
+                description += "\n\nchanged members:\n" + "\n".join(sorted(changes)[:3])
+            checkpoints.append({"number": number, "author": self.rng.choice(AUTHORS),
+                "description": description,
+                "labels": [f"REL_{number}"] if index % 10 == 0 else [],
+                "changes": changes})
+        return checkpoints
+
+    def generate(self) -> dict:
+        ''' reports the project definition '''
+        project = {"file_size": self.file_size, "dev_paths": [], "checkpoints": {}}
+        project["checkpoints"]["main"] = self.make_checkpoints("1", self.checkpoints, {})
+
+        branch_counts = {}
+        for index in range(self.dev_paths):
+            parent = "main"
+            if project["dev_paths"] and self.rng.random() < self.nesting:
+                parent = self.rng.choice(project["dev_paths"])["name"]
+            branch_point = self.rng.choice(project["checkpoints"][parent])["number"]
+            branch_counts[branch_point] = branch_counts.get(branch_point, 0) + 1
+            prefix = f"{branch_point}.{branch_counts[branch_point]}"
+            name = f"dev_{index}"
+            project["dev_paths"].append({"name": name, "branch_point": branch_point,
+                "prefix": prefix})
+            project["checkpoints"][name] = self.make_checkpoints(prefix,
+                self.dev_path_checkpoints, dict(self.states[branch_point]))
+        return project
+
+###################################################################################################
+
+def main():
+    ''' command line interface '''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output", help="project definition file to write")
+    parser.add_argument("--checkpoints", type=int, default=100)
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--file-size", type=int, default=4096)
+    parser.add_argument("--churn", type=float, default=0.01)
+    parser.add_argument("--dev-paths", type=int, default=3)
+    parser.add_argument("--dev-path-checkpoints", type=int, default=20)
+    parser.add_argument("--nesting", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    project = ProjectGenerator(args.checkpoints, args.members, args.file_size, args.churn,
+        args.dev_paths, args.dev_path_checkpoints, args.nesting, args.seed).generate()
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(project, file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+''' Times synch_ims_to_git and synch_ims_to_github against a synthetic IMS project.
+
+    A project is generated with generate_project.py, the si commands are served by fake_si.py
+    and the git side is a local bare repository. Example:
+
+        python bench/run_benchmark.py --checkpoints 200 --members 2000 --output result.json
+        python bench/run_benchmark.py --baseline result.json --tolerance 0.2
+
+    With --baseline the run fails if a stage got slower than the tolerance allows. '''
+
+###################################################################################################
+# imports
+
+import os
+import sys
+import json
+import time
+import shlex
+import shutil
+import inspect
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+
+###################################################################################################
+
+def call_command(command, **kwargs):
+    ''' calls a typer command function. Parameters not given take their command line default. '''
+    for name, parameter in inspect.signature(command).parameters.items():
+        if name not in kwargs:
+            kwargs[name] = getattr(parameter.default, "default", parameter.default)
+    return command(**kwargs)
+
+###################################################################################################
+
+def create_remote(remote_dir: str):
+    ''' creates a bare repository with an initial commit on main '''
+    seed_dir = remote_dir + "_seed"
+    subprocess.run(["git", "init", "-q", "--bare", "-b", "main", remote_dir], check=True)
+    subprocess.run(["git", "init", "-q", "-b", "main", seed_dir], check=True)
+    subprocess.run(["git", "-C", seed_dir, "-c", "user.name=bench", "-c", "user.email=bench@local",
+        "commit", "-q", "--allow-empty", "-m", "initial"], check=True)
+    subprocess.run(["git", "-C", seed_dir, "push", "-q", remote_dir, "main"], check=True)
+    shutil.rmtree(seed_dir)
+
+def run_scenario(name: str, command, root_dir: str, **kwargs) -> dict:
+    ''' runs one sync command and reports its total time and the time per stage '''
+
+    metrics_file = os.path.join(root_dir, f"metrics_{name}.json")
+    start = time.perf_counter()
+    call_command(command, metrics_file=metrics_file, **kwargs)
+    total = time.perf_counter() - start
+    print(f"{name}: {total:.2f} s")
+
+    with open(metrics_file, encoding="utf-8") as file:
+        stages = json.load(file)["stages"]
+    return {"total_seconds": round(total, 3), "stages": stages}
+
+###################################################################################################
+
+def main():
+    ''' command line interface '''
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkpoints", type=int, default=50)
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--file-size", type=int, default=4096)
+    parser.add_argument("--churn", type=float, default=0.01)
+    parser.add_argument("--dev-paths", type=int, default=2)
+    parser.add_argument("--dev-path-checkpoints", type=int, default=10)
+    parser.add_argument("--nesting", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenario", action="append", choices=["git", "github"],
+        help="scenarios to run, default all")
+    parser.add_argument("--sync-option", action="append", default=[],
+        help="extra keyword argument for the sync commands, e.g. delta_copy=true")
+    parser.add_argument("--output", help="file the results are written to as JSON")
+    parser.add_argument("--baseline", help="results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+        help="allowed relative slowdown against the baseline")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary directory")
+    args = parser.parse_args()
+
+    root_dir = tempfile.mkdtemp(prefix="gtm_bench_")
+    project_file = os.path.join(root_dir, "project.json")
+    subprocess.run([sys.executable, os.path.join(BENCH_DIR, "generate_project.py"),
+        project_file, "--checkpoints", str(args.checkpoints), "--members", str(args.members),
+        "--file-size", str(args.file_size), "--churn", str(args.churn),
+        "--dev-paths", str(args.dev_paths), "--dev-path-checkpoints",
+        str(args.dev_path_checkpoints), "--nesting", str(args.nesting),
+        "--seed", str(args.seed)], check=True)
+
+    # the syncher has to pick up the fake si, so the environment is set before the import
+    os.environ["GTM_SI_COMMAND"] = shlex.join([sys.executable,
+        os.path.join(BENCH_DIR, "fake_si.py")])
+    sys.path.insert(0, SRC_DIR)
+    os.chdir(root_dir)
+    import main as syncher
+
+    extra = {}
+    for option in args.sync_option:
+        key, _, value = option.partition("=")
+        extra[key] = json.loads(value)
+
+    scenarios = args.scenario or ["git", "github"]
+    results = {"parameters": vars(args), "scenarios": {}}
+    if "git" in scenarios:
+        remote_dir = os.path.join(root_dir, "remote_git.git")
+        create_remote(remote_dir)
+        results["scenarios"]["synch_ims_to_git"] = run_scenario("synch_ims_to_git",
+            syncher.synch_ims_to_git, root_dir, ims_repo=project_file, git_repo_url=remote_dir,
+            git_dir=os.path.join(root_dir, "git_work") + os.sep,
+            ims_dir=os.path.join(root_dir, "ims_work") + os.sep, si_retries=0, **extra)
+    if "github" in scenarios:
+        remote_dir = os.path.join(root_dir, "remote_github.git")
+        create_remote(remote_dir)
+        parameters = inspect.signature(syncher.synch_ims_to_github).parameters
+        results["scenarios"]["synch_ims_to_github"] = run_scenario("synch_ims_to_github",
+            syncher.synch_ims_to_github, root_dir, ims_repo=project_file,
+            git_repo_url=remote_dir, branch="main", dest_branch="main",
+            git_dir=os.path.join(root_dir, "github_work") + os.sep,
+            ims_dir=os.path.join(root_dir, "ims_github_work") + os.sep, si_retries=0,
+            **{key: value for key, value in extra.items() if key in parameters})
+
+    print(json.dumps(results["scenarios"], indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if not args.keep:
+        os.chdir(BENCH_DIR)
+        shutil.rmtree(root_dir, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = []
+        for name, result in results["scenarios"].items():
+            old = baseline["scenarios"].get(name)
+            if old and result["total_seconds"] > old["total_seconds"] * (1 + args.tolerance):
+                regressions.append(f"{name}: {old['total_seconds']} s -> "
+                    f"{result['total_seconds']} s")
+        if regressions:
+            print("Regressions:\n" + "\n".join(regressions))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
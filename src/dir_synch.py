@@ -0,0 +1,322 @@
+''' Synchronizes a source directory into a target directory by only touching what changed '''
+
+###################################################################################################
+# imports
+
+import os
+import stat
+import errno
+import shutil
+import filecmp
+import logging
+import threading
+import concurrent.futures
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, there is no reflink then
+    fcntl = None
+
+import util
+import path_filter
+
+###################################################################################################
+# constants
+
+# auto uses the fastest method the file systems support, hardlinks are only used on request
+COPY_MODES = ("auto", "copy", "reflink", "copy_file_range", "hardlink")
+
+# ioctl cloning a file on copy-on-write file systems like btrfs or xfs, see ioctl_ficlone(2)
+FICLONE = 0x40049409
+
+# errors of a copy method the file systems do not support for the given files
+UNSUPPORTED_ERRORS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL,
+    errno.ENOSYS, errno.ENOTTY, errno.EPERM, errno.EMLINK}
+
+###################################################################################################
+
+class ChangeSet:
+    ''' files which have been added, modified or deleted in the target directory.
+        Paths are relative to the directory root and use "/" as separator. '''
+
+    def __init__(self, added: "list[str]" = None, modified: "list[str]" = None,
+        deleted: "list[str]" = None):
+        self.added = added if added is not None else []
+        self.modified = modified if modified is not None else []
+        self.deleted = deleted if deleted is not None else []
+
+    def is_empty(self) -> bool:
+        ''' reports if nothing has changed '''
+        return not (self.added or self.modified or self.deleted)
+
+    def __len__(self):
+        return len(self.added) + len(self.modified) + len(self.deleted)
+
+    def __repr__(self):
+        return (f"ChangeSet(added={len(self.added)}, modified={len(self.modified)}, "
+            f"deleted={len(self.deleted)})")
+
+###################################################################################################
+
+def filter_changes(changes: ChangeSet, paths: path_filter.PathFilter) -> ChangeSet:
+    ''' reports the part of a change set the filter does not exclude '''
+    def keep(rel_paths: "list[str]") -> "list[str]":
+        return [rel_path for rel_path in rel_paths if not paths.is_excluded(rel_path)]
+    return ChangeSet(keep(changes.added), keep(changes.modified), keep(changes.deleted))
+
+###################################################################################################
+
+def scan_tree(directory: str, exclude: "tuple[str]" = (".git",),
+    paths: path_filter.PathFilter = None) -> "dict[str, os.stat_result]":
+    ''' reports all files below directory with their stat result. Symbolic links are files
+        of their own and not followed, they may point nowhere.
+        Top level entries named in exclude are skipped, as is everything the filter excludes. '''
+
+    files = {}
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        with os.scandir(os.path.join(directory, rel_dir)) as entries:
+            for entry in entries:
+                if not rel_dir and entry.name in exclude:
+                    continue
+                rel_path = rel_dir + entry.name
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if paths is not None and paths.is_excluded_entry(rel_path, is_dir):
+                    continue
+                if is_dir:
+                    pending.append(rel_path + "/")
+                else:
+                    files[rel_path] = entry.stat(follow_symlinks=False)
+    return files
+
+###################################################################################################
+
+def is_file_changed(src_file: str, src_stat: os.stat_result, dst_file: str,
+    dst_stat: os.stat_result) -> bool:
+    ''' compares size and modification time first and the content only when needed. Links
+        are compared by their targets. '''
+
+    if stat.S_ISLNK(src_stat.st_mode) or stat.S_ISLNK(dst_stat.st_mode):
+        return not stat.S_ISLNK(src_stat.st_mode) or not stat.S_ISLNK(dst_stat.st_mode) \
+            or os.readlink(src_file) != os.readlink(dst_file)
+    if src_stat.st_size != dst_stat.st_size:
+        return True
+    if src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+        return False
+    if filecmp.cmp(src_file, dst_file, shallow=False):
+        # same content. Take over the timestamp so that the next compare is a stat only.
+        make_writable(dst_file)
+        shutil.copystat(src_file, dst_file)
+        return False
+    return True
+
+###################################################################################################
+
+def synch_tree(src_dir: str, dst_dir: str, exclude: "tuple[str]" = (".git",),
+    paths: path_filter.PathFilter = None, copier: "Copier" = None) -> ChangeSet:
+    ''' makes dst_dir equal to src_dir. Only new and changed files are written and removed
+        files are deleted. Top level entries named in exclude are not touched. Files of src_dir
+        the filter excludes are treated as not existing. '''
+
+    logger = logging.getLogger(__name__)
+
+    src_files = scan_tree(src_dir, exclude, paths)
+    dst_files = scan_tree(dst_dir, exclude)
+
+    changes = ChangeSet()
+    for rel_path, dst_stat in dst_files.items():
+        if rel_path not in src_files:
+            changes.deleted.append(rel_path)
+
+    for rel_path, src_stat in src_files.items():
+        dst_stat = dst_files.get(rel_path)
+        if dst_stat is None:
+            changes.added.append(rel_path)
+        elif is_file_changed(os.path.join(src_dir, rel_path), src_stat,
+            os.path.join(dst_dir, rel_path), dst_stat):
+            changes.modified.append(rel_path)
+
+    apply_changes(src_dir, dst_dir, changes, copier)
+    logger.info("Synched %s to %s: %s", src_dir, dst_dir, changes)
+    return changes
+
+###################################################################################################
+
+def apply_changes(src_dir: str, dst_dir: str, changes: ChangeSet, copier: "Copier" = None):
+    ''' writes the given change set from src_dir into dst_dir '''
+
+    for rel_path in changes.deleted:
+        remove_file(os.path.join(dst_dir, rel_path))
+    remove_empty_dirs(dst_dir, {os.path.dirname(rel_path) for rel_path in changes.deleted})
+
+    rel_paths = changes.added + changes.modified
+    for rel_path in rel_paths:
+        prepare_target(os.path.join(dst_dir, rel_path))
+    copy_files(src_dir, dst_dir, rel_paths, copier)
+
+###################################################################################################
+
+def copy_tree(src_dir: str, dst_dir: str, paths: path_filter.PathFilter = None,
+    copier: "Copier" = None) -> "tuple[int, int]":
+    ''' copies all files of src_dir the filter does not exclude into the empty dst_dir and
+        reports number and size of the copied files '''
+
+    src_files = scan_tree(src_dir, (), paths)
+    for rel_dir in {os.path.dirname(rel_path) for rel_path in src_files}:
+        os.makedirs(os.path.join(dst_dir, rel_dir), exist_ok=True)
+    copy_files(src_dir, dst_dir, list(src_files), copier)
+    return len(src_files), sum(file_stat.st_size for file_stat in src_files.values())
+
+###################################################################################################
+
+def copy_files(src_dir: str, dst_dir: str, rel_paths: "list[str]", copier: "Copier" = None):
+    ''' copies files to targets which do not exist, in parallel if the copier has workers '''
+
+    if copier is None:
+        copier = Copier("copy", 1)
+    copy = lambda rel_path: copier.copy(os.path.join(src_dir, rel_path),
+        os.path.join(dst_dir, rel_path))
+    if copier.workers <= 1 or len(rel_paths) <= 1:
+        for rel_path in rel_paths:
+            copy(rel_path)
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=copier.workers,
+        thread_name_prefix="copy") as executor:
+        # list() raises the first error of a copy
+        list(executor.map(copy, rel_paths))
+
+###################################################################################################
+
+def copy_file(src_file: str, dst_file: str):
+    ''' copies one file including its timestamps. An existing target is replaced. '''
+    prepare_target(dst_file)
+    shutil.copy2(src_file, dst_file, follow_symlinks=False)
+
+###################################################################################################
+
+def prepare_target(dst_file: str):
+    ''' makes way for a file to be copied to dst_file. An existing target is removed, not
+        overwritten, since it may be a hardlink of a source file. '''
+
+    dst_parent = os.path.dirname(dst_file)
+    if os.path.isfile(dst_parent) or os.path.islink(dst_parent):
+        # a file was replaced by a directory
+        remove_file(dst_parent)
+    if os.path.isdir(dst_file) and not os.path.islink(dst_file):
+        # a directory was replaced by a file
+        shutil.rmtree(dst_file, onerror=util.del_rw)
+    os.makedirs(dst_parent, exist_ok=True)
+    remove_file(dst_file)
+
+###################################################################################################
+
+class Copier:
+    ''' copies files including their timestamps with the fastest method the file systems
+        support: a reflink shares the data blocks copy-on-write, copy_file_range copies
+        inside the kernel. A method failing as unsupported is not tried again and the next
+        one is used, the last resort is an ordinary copy. Hardlinks are only used if asked
+        for, they are only safe as long as the source files are replaced and never modified
+        in place. '''
+
+    def __init__(self, mode: str = "auto", workers: int = 4):
+        if mode not in COPY_MODES:
+            raise ValueError(f"Unknown copy mode {mode}, expected one of {COPY_MODES}")
+        self.mode = mode
+        self.workers = workers
+        if mode == "auto":
+            methods = ["reflink", "copy_file_range"]
+        elif mode == "copy":
+            methods = []
+        else:
+            methods = [mode]
+        self.methods = [method for method in methods if is_copy_method_available(method)]
+        self.methods.append("copy")
+        self.lock = threading.Lock()
+
+    def copy(self, src_file: str, dst_file: str):
+        ''' copies a file to a target which does not exist '''
+
+        logger = logging.getLogger(__name__)
+        if os.path.islink(src_file):
+            # the link itself is copied, not the file it points to
+            os.symlink(os.readlink(src_file), dst_file)
+            return
+        for method in list(self.methods):
+            try:
+                COPY_METHODS[method](src_file, dst_file)
+                return
+            except OSError as error:
+                if method == "copy" or error.errno not in UNSUPPORTED_ERRORS:
+                    raise
+                logger.info("Copy method %s not supported for %s: %s", method, dst_file,
+                    error)
+                with self.lock:
+                    if method in self.methods:
+                        self.methods.remove(method)
+                if os.path.lexists(dst_file):
+                    os.unlink(dst_file)
+
+###################################################################################################
+
+def is_copy_method_available(method: str) -> bool:
+    ''' reports whether the platform offers a copy method '''
+    if method == "reflink":
+        return fcntl is not None
+    if method == "copy_file_range":
+        return hasattr(os, "copy_file_range")
+    return True
+
+def reflink_file(src_file: str, dst_file: str):
+    ''' clones a file copy-on-write '''
+    with open(src_file, "rb") as src, open(dst_file, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(src_file, dst_file)
+
+def copy_file_range(src_file: str, dst_file: str):
+    ''' copies a file without moving its content through user space '''
+    with open(src_file, "rb") as src, open(dst_file, "wb") as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    shutil.copystat(src_file, dst_file)
+
+def hardlink_file(src_file: str, dst_file: str):
+    ''' links the target to the data of the source file '''
+    os.link(src_file, dst_file)
+
+COPY_METHODS = {"reflink": reflink_file, "copy_file_range": copy_file_range,
+    "hardlink": hardlink_file, "copy": shutil.copy2}
+
+###################################################################################################
+
+def remove_file(path: str):
+    ''' removes a file even if it is write protected '''
+    if not os.path.lexists(path):
+        return
+    make_writable(path)
+    os.unlink(path)
+
+###################################################################################################
+
+def make_writable(path: str):
+    ''' removes the write protection of a file '''
+    if not os.path.islink(path) and not os.access(path, os.W_OK):
+        os.chmod(path, os.stat(path).st_mode | stat.S_IWRITE)
+
+###################################################################################################
+
+def remove_empty_dirs(root_dir: str, rel_dirs: "set[str]"):
+    ''' removes the given directories and their parents as long as they are empty '''
+
+    for rel_dir in sorted(rel_dirs, key=len, reverse=True):
+        while rel_dir:
+            path = os.path.join(root_dir, rel_dir)
+            if not os.path.isdir(path) or os.listdir(path):
+                break
+            os.rmdir(path)
+            rel_dir = os.path.dirname(rel_dir)
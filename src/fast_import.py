@@ -0,0 +1,185 @@
+''' Streams IMS checkpoints directly into git fast-import without a working tree '''
+
+###################################################################################################
+# imports
+
+import os
+import sys
+import stat
+import time
+import shutil
+import logging
+import subprocess
+
+from git import Repo
+
+import metrics
+import dir_synch
+import git_synch
+import path_filter
+
+###################################################################################################
+# constants
+
+SYS_EXIT_FAST_IMPORT_FAILED = "2: git fast-import failed"
+
+###################################################################################################
+
+class FastImport:
+    ''' git fast-import process writing commits into the given repository.
+        Per branch the files of the last commit are remembered, so only changed files are
+        streamed as blobs for the following commits. Every commit gets its checkpoint ref.
+        Files excluded by the path filter are not
+        imported. Like git add the executable bit is only taken from the file system if
+        core.fileMode is true, otherwise files keep the mode of the parent commit. '''
+
+    def __init__(self, repo: Repo, paths: path_filter.PathFilter = None):
+        self.repo = repo
+        self.paths = paths
+        self.next_mark = 1
+        # ref -> {relative path: (size, mtime_ns, mark, mode)}
+        self.manifests = {}
+        # (branch name, checkpoint number) -> mark of the commit
+        self.checkpoint_marks = {}
+        # mark of a commit -> paths of its executable files, the parent of a new ref
+        self.executables = {}
+        self.trust_executable_bit = git_synch.is_file_mode_trusted(repo)
+        self.process = subprocess.Popen(["git", "fast-import", "--quiet", "--done"],
+            cwd=repo.working_dir, stdin=subprocess.PIPE)
+        self.stream = self.process.stdin
+
+    def new_mark(self) -> str:
+        ''' reports a new unique mark '''
+        mark = f":{self.next_mark}"
+        self.next_mark += 1
+        return mark
+
+    def write(self, text: str):
+        ''' writes a command line to fast-import '''
+        self.stream.write(text.encode("utf-8"))
+
+    def write_data(self, data: bytes):
+        ''' writes a data block '''
+        self.stream.write(f"data {len(data)}\n".encode("utf-8"))
+        self.stream.write(data)
+        self.stream.write(b"\n")
+
+    def write_blob(self, file_path: str, file_stat: os.stat_result) -> str:
+        ''' streams a file as blob and reports its mark. The blob of a link is its target. '''
+        mark = self.new_mark()
+        self.write(f"blob\nmark {mark}\n")
+        if stat.S_ISLNK(file_stat.st_mode):
+            self.write_data(os.fsencode(os.readlink(file_path)))
+            return mark
+        with open(file_path, "rb") as file:
+            self.write(f"data {file_stat.st_size}\n")
+            shutil.copyfileobj(file, self.stream)
+        self.write("\n")
+        return mark
+
+    def commit(self, branch: str, src_dir: str, commit_message: str, author: str,
+        checkpoint_number: str, parent: str = None, ref: str = None) -> str:
+        ''' commits the content of src_dir on top of the branch and reports the commit mark.
+            parent is a commit sha or mark and only needed for the first commit of a branch
+            within this fast-import stream. A commit of the branch may be written to another
+            ref, which then continues its own line of history. '''
+
+        logger = logging.getLogger(__name__)
+
+        with metrics.span("fast_import_commit", branch, checkpoint_number) as commit_span:
+            mark = self.write_commit(branch, src_dir, commit_message, author, checkpoint_number,
+                parent, ref or f"refs/heads/{branch}", commit_span)
+        logger.info("fast-import commit %s on %s with %s changed files", mark, branch,
+            commit_span.files)
+        return mark
+
+    def write_commit(self, branch: str, src_dir: str, commit_message: str, author: str,
+        checkpoint_number: str, parent: str, ref: str, commit_span: metrics.Span) -> str:
+        ''' writes the blobs and the commit of a checkpoint to the ref. See commit '''
+
+        old_manifest = self.manifests.get(ref)
+        new_manifest = {}
+        file_commands = []
+        parent_executables = frozenset()
+        if old_manifest is None:
+            # first commit of the ref in this stream: describe the complete tree
+            old_manifest = {}
+            file_commands.append("deleteall\n")
+            parent_executables = self.get_executables(parent)
+
+        for rel_path, file_stat in dir_synch.scan_tree(src_dir, paths=self.paths).items():
+            old_entry = old_manifest.get(rel_path)
+            if old_entry is not None:
+                old_mode = old_entry[3]
+            else:
+                old_mode = "100755" if rel_path in parent_executables else "100644"
+            file_mode = self.get_mode(file_stat, old_mode)
+            if old_entry is not None and old_entry[0] == file_stat.st_size \
+                and old_entry[1] == file_stat.st_mtime_ns and old_mode == file_mode:
+                new_manifest[rel_path] = old_entry
+                continue
+            mark = self.write_blob(os.path.join(src_dir, rel_path), file_stat)
+            commit_span.add(1, file_stat.st_size)
+            new_manifest[rel_path] = (file_stat.st_size, file_stat.st_mtime_ns, mark, file_mode)
+            file_commands.append(f"M {file_mode} {mark} {quote_path(rel_path)}\n")
+
+        for rel_path in old_manifest:
+            if rel_path not in new_manifest:
+                file_commands.append(f"D {quote_path(rel_path)}\n")
+
+        mark = self.new_mark()
+        identity = f"{author} <> {int(time.time())} +0000"
+        self.write(f"commit {ref}\nmark {mark}\n")
+        self.write(f"author {identity}\ncommitter {identity}\n")
+        self.write_data(commit_message.encode("utf-8"))
+        if ref not in self.manifests and parent is not None:
+            self.write(f"from {parent}\n")
+        self.write("".join(file_commands))
+        self.write("\n")
+        self.write(f"reset {git_synch.get_checkpoint_ref(branch, checkpoint_number)}\n"
+            f"from {mark}\n\n")
+
+        self.manifests[ref] = new_manifest
+        self.checkpoint_marks[(branch, checkpoint_number)] = mark
+        self.executables[mark] = frozenset(rel_path for rel_path, entry in new_manifest.items()
+            if entry[3] == "100755")
+        return mark
+
+    def get_mode(self, file_stat: os.stat_result, old_mode: str) -> str:
+        ''' reports the mode of a file which had old_mode in the parent commit '''
+        if stat.S_ISLNK(file_stat.st_mode):
+            return "120000"
+        if not self.trust_executable_bit:
+            return old_mode
+        return "100755" if file_stat.st_mode & stat.S_IXUSR else "100644"
+
+    def get_executables(self, parent: str) -> "frozenset[str]":
+        ''' reports the paths of the executable files of a parent commit, a mark of this
+            stream or a commit sha '''
+        if parent is None:
+            return frozenset()
+        if parent.startswith(":"):
+            return self.executables.get(parent, frozenset())
+        entries = self.repo.git.ls_tree("-r", "-z", parent).split("\0")
+        return frozenset(entry.split("\t", 1)[1] for entry in entries
+            if entry.startswith("100755 "))
+
+    def get_commit(self, branch: str, checkpoint_number: str) -> str:
+        ''' reports the mark of a checkpoint imported within this stream or None '''
+        return self.checkpoint_marks.get((branch, checkpoint_number))
+
+    def close(self):
+        ''' finishes the stream and waits for fast-import to update the refs '''
+        self.write("done\n")
+        self.stream.close()
+        if self.process.wait() != 0:
+            sys.exit(SYS_EXIT_FAST_IMPORT_FAILED)
+
+###################################################################################################
+
+def quote_path(path: str) -> str:
+    ''' quotes a path for fast-import if needed '''
+    if path.startswith('"') or "\n" in path:
+        escaped = path.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return f'"{escaped}"'
+    return path
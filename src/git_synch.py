@@ -4,29 +4,70 @@
 # imports
 
 import os
-import shutil
 import sys
 import re
 import logging
+import stat
+import threading
+import subprocess
+import concurrent.futures
+import hashlib
+import shutil
+import tarfile
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, the mirrors are locked with msvcrt there
+    fcntl = None
+    import msvcrt
 
 from git import Repo
 from git import Commit
 from git import Actor
+from git import GitCommandError
 
 import util
+import trash
+import metrics
+import dir_synch
+import path_filter
 
 ###################################################################################################
 # constants
 
 SYS_EXIT_UNTRACKED_FILES_IN_TARGET_REPO = "1: Untracked files in target repository"
 
+# namespace of the refs pointing from IMS checkpoints to their commits,
+# refs/ims/<branch>/<checkpoint number>
+CHECKPOINT_REFS = "refs/ims"
+# replacements grafting backfilled history below commits of a sparse import
+REPLACE_REFS = "refs/replace"
+# refs fetched in addition to the branches
+EXTRA_REFSPECS = [f"+{CHECKPOINT_REFS}/*:{CHECKPOINT_REFS}/*",
+    f"+{REPLACE_REFS}/*:{REPLACE_REFS}/*"]
+
+# serializes changes of the worktree administration of a repository
+WORKTREE_LOCK = threading.RLock()
+
+# lock files of the mirrors used by this process by the working directory of the run
+MIRROR_LOCKS = {}
+
 ###################################################################################################
 
 def synch_dir_to_git(repo: Repo, branch: str, git_dir:str , src_dir: str, commit_message: str,
-    author: str, do_push: bool):
-    ''' Synchs files to github'''
-
-    logger = logging.getLogger(__name__)
+    author: str, delta: bool = False,
+    changes: dir_synch.ChangeSet = None,
+    paths: path_filter.PathFilter = None, verify_index: bool = False,
+    copier: dir_synch.Copier = None) -> dir_synch.ChangeSet:
+    ''' Synchs files to github. Files excluded by the path filter are not synched.
+        The files are written by the copier, by default one after the other with an
+        ordinary copy.
+        If the changes of src_dir since the last synch are given, only those are applied.
+        In delta mode only changed files are written to the working directory and the
+        change set is reported. Otherwise the working directory is rebuilt and None is reported.
+        With a change set only its files are staged, verify_index checks that against a
+        full git add. '''
 
     # checkout branch
     if len(repo.branches) > 0:
@@ -41,42 +82,185 @@ def synch_dir_to_git(repo: Repo, branch: str, git_dir:str , src_dir: str, commit
         create_branch_after_commit = True
 
     # untracked files would be lost. Terminate with exit code to warn the user.
-    if len(repo.untracked_files) > 0:
+    # Applying a known change set does not touch other files.
+    if changes is None and len(repo.untracked_files) > 0:
         print("There are untracked files in the repository.")
         print("Untracked files would be lost when synchronization is done")
         print("Remove them up in front or add them to the repository")
         print(f"untracked files: {repo.untracked_files}")
         sys.exit(SYS_EXIT_UNTRACKED_FILES_IN_TARGET_REPO)
 
-    # Remove everything but ".git" folder
-    sub_dirs = os.scandir(git_dir)
-    for sub_dir in sub_dirs:
-        if sub_dir.is_dir() and sub_dir.name != ".git":
-            shutil.rmtree(sub_dir.path, onerror=util.del_rw)
-        elif sub_dir.is_file() or sub_dir.is_symlink():
-            os.unlink(sub_dir.path)
-
-    # copy files from source directory
-    print(f"Copy files from {src_dir} to {git_dir}")
-    shutil.copytree(src_dir, git_dir, dirs_exist_ok=True)
-
-    # commit all files and push to server
-    print("Add all files to index")
-    repo.git.add(all=True)
+    if changes is not None and paths is not None:
+        # changes of a sandbox shared with differently filtered repositories
+        changes = dir_synch.filter_changes(changes, paths)
+
+    if changes is not None:
+        # the caller knows what changed
+        print(f"Apply changed files from {src_dir} to {git_dir}: {changes}")
+        with metrics.span("copy") as copy_span:
+            dir_synch.apply_changes(src_dir, git_dir, changes, copier)
+            copy_span.add(len(changes.added) + len(changes.modified))
+    elif delta:
+        # only write what differs between source directory and working directory
+        print(f"Synch changed files from {src_dir} to {git_dir}")
+        with metrics.span("copy") as copy_span:
+            changes = dir_synch.synch_tree(src_dir, git_dir, paths=paths, copier=copier)
+            copy_span.add(len(changes.added) + len(changes.modified),
+                sum(os.lstat(os.path.join(git_dir, rel_path)).st_size
+                for rel_path in changes.added + changes.modified))
+        print(f"Changed files: {changes}")
+    else:
+        # Remove everything but ".git" folder (a file in case of a worktree)
+        with metrics.span("wipe"):
+            util.delete_dir(git_dir, keep=(".git",))
+
+        # copy files from source directory
+        print(f"Copy files from {src_dir} to {git_dir}")
+        with metrics.span("copy") as copy_span:
+            copy_span.add(*dir_synch.copy_tree(src_dir, git_dir, paths, copier))
+
+    # commit all files
+    if changes is not None:
+        print(f"Add changed files to index: {changes}")
+        stage_changes(repo, changes, verify_index)
+    else:
+        print("Add all files to index")
+        with metrics.span("git_add"):
+            repo.git.add(all=True)
     print("Commit files")
     committer = Actor(author, None)
-    repo.index.commit(commit_message, author=committer)
+    with metrics.span("git_commit"):
+        repo.index.commit(commit_message, author=committer)
 
     if create_branch_after_commit:
         repo.create_head(branch)
 
-    if do_push:
-        print("Push to remote")
-        logger.info("Push to remote")
-        repo.remote().push()
-
     # clean up
     repo.close()
+    return changes
+
+###################################################################################################
+
+def stage_changes(repo: Repo, changes: dir_synch.ChangeSet, verify: bool = False):
+    ''' updates only the index entries of the change set. The files are hashed in parallel.
+        If that fails, or verify finds that a full git add changes the index further, the
+        full git add is used. '''
+
+    logger = logging.getLogger(__name__)
+    try:
+        with metrics.span("git_hash") as hash_span:
+            entries = hash_files(repo, changes.added + changes.modified)
+            hash_span.add(len(entries))
+        with metrics.span("git_update_index"):
+            records = [f"{mode} {sha}\t{rel_path}" for rel_path, (mode, sha) in entries.items()]
+            records += [f"0 {'0' * 40}\t{rel_path}" for rel_path in changes.deleted]
+            run_git(repo, ["update-index", "-z", "--index-info"],
+                "".join(record + "\0" for record in records))
+    except (OSError, subprocess.CalledProcessError) as error:
+        logger.warning("Update of the index entries failed, adding all files: %s", error)
+        verify = True
+
+    if verify:
+        with metrics.span("git_add"):
+            tree = repo.git.write_tree()
+            repo.git.add(all=True)
+            if repo.git.write_tree() != tree:
+                logger.warning("Index differs from the change set %s, all files added", changes)
+
+###################################################################################################
+
+def hash_files(repo: Repo, rel_paths: "list[str]", workers: int = 4,
+    batch_size: int = 512) -> "dict[str, tuple[str, str]]":
+    ''' writes the files of the working directory as blobs and reports path -> (mode, sha).
+        Batches of files are hashed by parallel git hash-object processes. Like git add the
+        executable bit is ignored if core.fileMode is false, then the mode of the index entry
+        is kept and new files are not executable. '''
+
+    def hash_batch(batch: "list[str]") -> "list[str]":
+        return run_git(repo, ["hash-object", "-w", "--stdin-paths"],
+            "".join(rel_path + "\n" for rel_path in batch)).split()
+
+    trust_executable_bit = is_file_mode_trusted(repo)
+    index_modes = {} if trust_executable_bit else get_index_modes(repo)
+
+    def get_mode(rel_path: str) -> str:
+        if not trust_executable_bit:
+            return index_modes.get(rel_path, "100644")
+        file_stat = os.lstat(os.path.join(repo.working_dir, rel_path))
+        if stat.S_ISLNK(file_stat.st_mode):
+            return "120000"
+        return "100755" if file_stat.st_mode & stat.S_IXUSR else "100644"
+
+    entries = {}
+    links = [rel_path for rel_path in rel_paths
+        if os.path.islink(os.path.join(repo.working_dir, rel_path))]
+    for rel_path in links:
+        # the blob of a link is its target
+        target = os.readlink(os.path.join(repo.working_dir, rel_path))
+        entries[rel_path] = ("120000", run_git(repo, ["hash-object", "-w", "--stdin"],
+            target).strip())
+
+    files = [rel_path for rel_path in rel_paths if rel_path not in entries]
+    batches = [files[index:index + batch_size] for index in range(0, len(files), batch_size)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch, shas in zip(batches, executor.map(hash_batch, batches)):
+            for rel_path, sha in zip(batch, shas):
+                entries[rel_path] = (get_mode(rel_path), sha)
+    return entries
+
+###################################################################################################
+
+def is_file_mode_trusted(repo: Repo) -> bool:
+    ''' reports whether git takes the executable bit from the file system, core.fileMode '''
+    try:
+        return repo.git.config("--bool", "core.fileMode") == "true"
+    except GitCommandError:
+        # not set
+        return True
+
+###################################################################################################
+
+def get_index_modes(repo: Repo) -> "dict[str, str]":
+    ''' reports the modes of the regular files in the index by path '''
+    modes = {}
+    for entry in run_git(repo, ["ls-files", "-s", "-z"], "").split("\0"):
+        if entry:
+            info, rel_path = entry.split("\t", 1)
+            mode = info.split()[0]
+            if mode in ("100644", "100755"):
+                modes[rel_path] = mode
+    return modes
+
+###################################################################################################
+
+def run_git(repo: Repo, args: "list[str]", stdin: str) -> str:
+    ''' runs a git command in the working directory with the given input and reports its
+        output '''
+    return subprocess.run(["git"] + args, cwd=repo.working_dir, input=stdin.encode("utf-8"),
+        capture_output=True, check=True).stdout.decode("utf-8")
+
+###################################################################################################
+
+def extract_files(repo: Repo, commit: str, target_dir: str, rel_paths: "set[str]") -> "set[str]":
+    ''' writes the files of a commit which are among the given paths into the target directory
+        and reports the paths written. The files are streamed out of git archive. '''
+
+    extracted = set()
+    with metrics.span("git_extract") as extract_span, subprocess.Popen(["git", "archive",
+        "--format=tar", commit], cwd=repo.working_dir, stdout=subprocess.PIPE) as process:
+        with tarfile.open(fileobj=process.stdout, mode="r|") as archive:
+            for member in archive:
+                if not member.isfile() or member.name not in rel_paths:
+                    continue
+                file_path = os.path.join(target_dir, member.name)
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with archive.extractfile(member) as source, open(file_path, "wb") as file:
+                    shutil.copyfileobj(source, file)
+                extracted.add(member.name)
+                extract_span.add(1, member.size)
+    if process.returncode != 0:
+        raise GitCommandError(["git", "archive", commit], process.returncode)
+    return extracted
 
 ###################################################################################################
 
@@ -96,6 +280,230 @@ def clone_repo(git_repo: str, repo_name: str) -> Repo:
 
 ###################################################################################################
 
+def get_mirror_dir(cache_dir: str, git_repo: str) -> str:
+    ''' reports the directory of the local mirror of a remote repository. The URL is part of
+        the key since different remotes may have the same repository name. '''
+    url_hash = hashlib.sha1(git_repo.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{get_repo_name_from_https(git_repo)}_{url_hash}.git")
+
+###################################################################################################
+
+def update_mirror(git_repo: str, mirror_dir: str, blobless: bool = False) -> Repo:
+    ''' creates the bare local mirror of a remote repository or fetches what is new.
+        A blobless mirror only downloads the file contents which are checked out. '''
+
+    logger = logging.getLogger(__name__)
+    if not os.path.exists(mirror_dir):
+        print(f"Create mirror of git repo {git_repo} in {mirror_dir}")
+        args = ["--bare"]
+        if blobless:
+            args.append("--filter=blob:none")
+        with metrics.span("git_clone"):
+            mirror = Repo.clone_from(git_repo, mirror_dir, multi_options=args)
+            # a bare clone fetches into local branches, use remote tracking branches instead
+            mirror.git.config("remote.origin.fetch", "+refs/heads/*:refs/remotes/origin/*")
+            add_extra_refspecs(mirror)
+            mirror.git.fetch("origin", prune=True)
+    else:
+        logger.info("Fetch git repo %s into mirror %s", git_repo, mirror_dir)
+        mirror = Repo(mirror_dir)
+        # mirror may be created before the extra refs existed
+        add_extra_refspecs(mirror)
+        with metrics.span("git_fetch"):
+            mirror.git.fetch("origin", prune=True)
+    return mirror
+
+###################################################################################################
+
+def open_repo(git_repo: str, git_dir: str, cache_dir: str = None,
+    blobless: bool = False) -> Repo:
+    ''' provides a working copy of the remote repository in git_dir. Without cache_dir the
+        repository is cloned. Otherwise the working copy is a worktree of a persistent mirror in
+        cache_dir, which only fetches what is new since the last run. Like a fresh clone the
+        working copy only has the default branch as local branch. Checkpoint refs and
+        replacements are fetched as well. The run holds the lock of the mirror until the
+        repository is closed with close_repo, a mirror in use is not shared but cloned. '''
+
+    logger = logging.getLogger(__name__)
+    if not cache_dir:
+        return clone_with_checkpoint_refs(git_repo, git_dir)
+
+    mirror_dir = get_mirror_dir(cache_dir, git_repo)
+    os.makedirs(cache_dir, exist_ok=True)
+    lock_file = lock_mirror(mirror_dir)
+    if lock_file is None:
+        # the branches of the mirror belong to the run which holds it
+        logger.info("Mirror %s is in use, clone git repo %s", mirror_dir, git_repo)
+        return clone_with_checkpoint_refs(git_repo, git_dir)
+
+    try:
+        mirror = update_mirror(git_repo, mirror_dir, blobless)
+        default_branch = mirror.git.symbolic_ref("HEAD", short=True)
+        if f"refs/remotes/origin/{default_branch}" not in [ref.path for ref in mirror.refs]:
+            # a worktree needs a commit, an empty remote is cloned
+            mirror.close()
+            lock_file.close()
+            return clone_with_checkpoint_refs(git_repo, git_dir)
+
+        with WORKTREE_LOCK, metrics.span("git_worktree"):
+            # forget the worktrees and branches of earlier runs
+            mirror.git.worktree("prune")
+            checked_out = {line.split(" ", 1)[1] for line in mirror.git.worktree("list",
+                "--porcelain").splitlines() if line.startswith("branch ")}
+            for head in mirror.git.for_each_ref("refs/heads", format="%(refname)").split():
+                if head not in checked_out:
+                    mirror.git.update_ref("-d", head)
+            mirror.git.worktree("add", "--force", "--track", "-B", default_branch, git_dir,
+                f"origin/{default_branch}")
+        mirror.close()
+    except BaseException:
+        lock_file.close()
+        raise
+    repo = Repo(git_dir)
+    MIRROR_LOCKS[os.path.realpath(repo.working_dir)] = lock_file
+    return repo
+
+###################################################################################################
+
+def lock_mirror(mirror_dir: str):
+    ''' takes the lock of a mirror, which is held until the repository is closed with
+        close_repo or the process ends. Reports the open lock file, None if the mirror is
+        used by another run or another project of this run. '''
+
+    lock_file = open(mirror_dir + ".lock", "wb")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+###################################################################################################
+
+def close_repo(repo: Repo):
+    ''' closes a repository opened with open_repo and releases the lock of its mirror '''
+    repo.close()
+    lock_file = MIRROR_LOCKS.pop(os.path.realpath(repo.working_dir), None)
+    if lock_file is not None:
+        lock_file.close()
+
+###################################################################################################
+
+def clone_with_checkpoint_refs(git_repo: str, git_dir: str) -> Repo:
+    ''' clones the remote repository into git_dir including the extra refs, which a clone
+        does not fetch by default '''
+    with metrics.span("git_clone"):
+        repo = Repo.clone_from(git_repo, git_dir)
+        add_extra_refspecs(repo)
+        repo.git.fetch("origin")
+    return repo
+
+###################################################################################################
+
+def add_extra_refspecs(repo: Repo):
+    ''' makes fetches of the repository get the checkpoint refs and replacements '''
+    ref_specs = repo.git.config("--get-all", "remote.origin.fetch").split()
+    for ref_spec in EXTRA_REFSPECS:
+        if ref_spec not in ref_specs:
+            repo.git.config("--add", "remote.origin.fetch", ref_spec)
+
+###################################################################################################
+
+def is_repo(git_dir: str) -> bool:
+    ''' reports whether the directory is the working directory of a git repository '''
+    return os.path.exists(os.path.join(git_dir, ".git"))
+
+###################################################################################################
+
+def reopen_repo(git_dir: str) -> Repo:
+    ''' opens the working directory of an interrupted run. Changes of a checkpoint which was
+        not committed any more are discarded. '''
+    repo = Repo(git_dir)
+    discard_changes(repo)
+    return repo
+
+###################################################################################################
+
+def discard_changes(repo: Repo):
+    ''' resets the working directory and the index to the checked out commit '''
+    if repo.head.is_valid():
+        repo.git.reset("--hard")
+    repo.git.clean("-f", "-d")
+
+###################################################################################################
+
+def add_worktree(repo: Repo, worktree_dir: str) -> Repo:
+    ''' creates an additional working directory of the repository with a detached HEAD '''
+
+    with WORKTREE_LOCK:
+        if os.path.exists(worktree_dir):
+            remove_worktree(repo, worktree_dir)
+        repo.git.worktree("add", "--force", "--detach", worktree_dir, "HEAD")
+    return Repo(worktree_dir)
+
+###################################################################################################
+
+def remove_worktree(repo: Repo, worktree_dir: str):
+    ''' removes a working directory created by add_worktree '''
+
+    with WORKTREE_LOCK:
+        if os.path.exists(worktree_dir):
+            trash.discard(worktree_dir)
+        repo.git.worktree("prune")
+
+###################################################################################################
+
+def track_remote_branches(repo: Repo):
+    ''' creates a local branch for every branch of the remote repository which has none '''
+    local_branches = get_branches(repo)
+    for ref in repo.remote().refs:
+        if ref.remote_head != "HEAD" and ref.remote_head not in local_branches:
+            repo.create_head(ref.remote_head, ref).set_tracking_branch(ref)
+
+###################################################################################################
+
+def push_branches(repo: Repo, branches: "list[str]"):
+    ''' pushes the given branches together with their checkpoint refs to the remote
+        repository in one atomic push, either all of them are updated or none. The remote is
+        set as upstream of the branches. '''
+    print(f"Push branches {branches} to remote")
+    ref_specs = [f"{CHECKPOINT_REFS}/{branch}/*:{CHECKPOINT_REFS}/{branch}/*"
+        for branch in branches]
+    with metrics.span("git_push"):
+        repo.git.push("--atomic", "--set-upstream", repo.remote().name, *branches, *ref_specs)
+
+###################################################################################################
+
+def push_extra_refs(repo: Repo):
+    ''' pushes all checkpoint refs and replacements to the remote repository in one atomic
+        push '''
+    print("Push checkpoint refs and replacements to remote")
+    with metrics.span("git_push"):
+        repo.git.push("--atomic", repo.remote().name,
+            *[ref_spec.lstrip("+") for ref_spec in EXTRA_REFSPECS])
+
+###################################################################################################
+
+def get_head_commit(repo: Repo, branch: str) -> str:
+    ''' reports the hash of the newest commit of a branch, None if it does not exist '''
+    if branch in get_branches(repo):
+        return repo.heads[branch].commit.hexsha
+    return None
+
+###################################################################################################
+
+def count_commits(repo: Repo, branch: str, since_commit: str = None) -> int:
+    ''' reports the number of commits of a branch which came after the given commit '''
+    if branch not in get_branches(repo):
+        return 0
+    revisions = f"{since_commit}..{branch}" if since_commit else branch
+    return int(repo.git.rev_list("--count", revisions))
+
+###################################################################################################
+
 def get_branches(repo: Repo) -> list:
     ''' reports branches of the given repo '''
     return [h.name for h in repo.heads]
@@ -131,11 +539,102 @@ def get_last_synched_commit(repo: Repo, branch: str) -> Commit:
 
 ###################################################################################################
 
+def get_last_synched_checkpoint(repo: Repo, branch: str) -> str:
+    ''' reports the number of the newest IMS checkpoint of a branch, None if none is synched.
+        The newest checkpoint ref is the starting point, only the commits after it are read.
+        Without a usable checkpoint ref the whole branch is searched. '''
+
+    if branch not in get_branches(repo):
+        return None
+    newest_ref = get_newest_checkpoint_ref(repo, branch)
+    if newest_ref is not None:
+        checkpoint_number, commit = newest_ref
+        if repo.is_ancestor(commit, branch):
+            for current_commit in repo.iter_commits(f"{commit}..{branch}"):
+                if is_commit_synched_with_ims(current_commit):
+                    return get_ims_checkpoint(current_commit)
+            return checkpoint_number
+    return get_ims_checkpoint(get_last_synched_commit(repo, branch))
+
+###################################################################################################
+
+def get_checkpoint_ref(branch: str, checkpoint_number: str) -> str:
+    ''' reports the name of the ref of a checkpoint synched to a branch '''
+    return f"{CHECKPOINT_REFS}/{branch}/{checkpoint_number}"
+
+###################################################################################################
+
+def set_checkpoint_ref(repo: Repo, branch: str, checkpoint_number: str, commit: str):
+    ''' records the commit of a checkpoint synched to a branch '''
+    repo.git.update_ref(get_checkpoint_ref(branch, checkpoint_number), commit)
+
+###################################################################################################
+
+def get_checkpoint_ref_commit(repo: Repo, branch: str, checkpoint_number: str) -> str:
+    ''' reports the commit recorded for a checkpoint of a branch, None if there is no ref '''
+    try:
+        return repo.git.rev_parse("--verify", "--quiet",
+            get_checkpoint_ref(branch, checkpoint_number) + "^{commit}")
+    except GitCommandError:
+        return None
+
+###################################################################################################
+
+def get_checkpoint_refs(repo: Repo, branch: str) -> "dict[str, str]":
+    ''' reports the commits of all checkpoint refs of a branch by checkpoint number '''
+    refs = {}
+    for line in repo.git.for_each_ref(f"{CHECKPOINT_REFS}/{branch}/*",
+        format="%(refname) %(objectname)").splitlines():
+        ref_name, commit = line.split()
+        refs[ref_name.rsplit("/", 1)[1]] = commit
+    return refs
+
+###################################################################################################
+
+def get_newest_checkpoint_ref(repo: Repo, branch: str) -> "tuple[str, str]":
+    ''' reports checkpoint number and commit of the highest checkpoint ref of a branch,
+        None if the branch has none '''
+    newest_ref = repo.git.for_each_ref(f"{CHECKPOINT_REFS}/{branch}/*",
+        "--sort=-version:refname", "--count=1", format="%(refname) %(objectname)")
+    if not newest_ref:
+        return None
+    ref_name, commit = newest_ref.split()
+    return ref_name.rsplit("/", 1)[1], commit
+
+###################################################################################################
+
+def backfill_checkpoint_refs(repo: Repo, branches: "list[str]") -> int:
+    ''' creates the checkpoint refs of commits synched before the refs existed and reports
+        their number. A commit belongs to the branch it was synched to, so branches with
+        shorter checkpoint numbers are searched first and the search of a branch stops at a
+        commit of one searched before. '''
+
+    def get_depth(branch: str) -> int:
+        checkpoint_number = get_ims_checkpoint(get_last_synched_commit(repo, branch))
+        return checkpoint_number.count(".") if checkpoint_number else 0
+
+    seen_commits = set()
+    updates = []
+    for branch in sorted(branches, key=lambda branch: (branch != "main", get_depth(branch))):
+        for commit in repo.iter_commits(branch):
+            if commit.hexsha in seen_commits:
+                break
+            seen_commits.add(commit.hexsha)
+            checkpoint_number = get_ims_checkpoint(commit)
+            if checkpoint_number is not None:
+                updates.append(f"update {get_checkpoint_ref(branch, checkpoint_number)} "
+                    f"{commit.hexsha}\n")
+    # one transaction instead of a git process per ref
+    run_git(repo, ["update-ref", "--stdin"], "".join(updates))
+    return len(updates)
+
+###################################################################################################
+
 def get_ims_checkpoint(commit: Commit) -> str:
     ''' Report the IMS checkpoint of the given commit'''
 
     if commit is not None:
-        regex = r".*IMS_CP: (\d+\.\d+) .*"
+        regex = r".*IMS_CP: (\d+(?:\.\d+)+) .*"
         match = re.search(regex, commit.message)
 
         if match:
@@ -146,14 +645,19 @@ def get_ims_checkpoint(commit: Commit) -> str:
 
 def is_commit_synched_with_ims(commit: Commit) -> bool:
     ''' Checks if a commit is already synched to an IMS checkpoint '''
-    if re.search(r".*IMS_CP: (\d+\.\d+) .*", commit.message, re.MULTILINE) is None:
+    if re.search(r".*IMS_CP: (\d+(?:\.\d+)+) .*", commit.message, re.MULTILINE) is None:
         return False
     return True
 
 ###################################################################################################
 
 def get_commit(repo: Repo, branch: str, ims_checkpoint_number: int):
-    ''' report the commit belonging to an ims checkpoint in the given branch '''
+    ''' report the commit belonging to an ims checkpoint in the given branch. The checkpoint
+        ref is used if there is one, otherwise the branch is searched. '''
+    commit = get_checkpoint_ref_commit(repo, branch, ims_checkpoint_number)
+    if commit is not None:
+        return repo.commit(commit)
+
     branch_commits = repo.iter_commits(branch)
 
     for commit in branch_commits:
@@ -0,0 +1,100 @@
+''' Persistent local cache of IMS project metadata '''
+
+###################################################################################################
+# imports
+
+import sqlite3
+import logging
+import threading
+
+import ims_synch
+
+###################################################################################################
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    project TEXT NOT NULL,
+    dev_path TEXT NOT NULL,
+    number TEXT NOT NULL,
+    author TEXT,
+    description TEXT,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (project, dev_path, number)
+);
+"""
+
+###################################################################################################
+
+class MetadataCache(ims_synch.Metadata):
+    ''' IMS metadata backed by a SQLite database.
+        Checkpoint history never changes once written. Therefore only checkpoints newer than
+        the cached high water mark of a dev path are queried from IMS. The dev paths are not
+        cached, they are created from and deleted without new checkpoints. Their list is one si
+        projectinfo call per run or poll. '''
+
+    def __init__(self, database_file: str):
+        self.database_file = database_file
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database_file, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        ''' closes the database '''
+        self.connection.close()
+
+    def get_checkpoints_from(self, ims_project: str, branch: str,
+        lowest_checkpoint_number: str) -> "list[ims_synch.Checkpoint]":
+        ''' Reports all checkpoints on a branch coming after the given checkpoint number.
+            IMS is only asked for the checkpoints after the cached ones. '''
+
+        logger = logging.getLogger(__name__)
+
+        checkpoints = self.get_cached_checkpoints(ims_project, branch)
+        high_water_mark = checkpoints[-1].number if checkpoints else None
+
+        cached_keys = {ims_synch.get_checkpoint_key(checkpoint.number)
+            for checkpoint in checkpoints}
+        new_checkpoints = [checkpoint for checkpoint in ims_synch.get_checkpoints_from(
+            ims_project, branch, high_water_mark)
+            if ims_synch.get_checkpoint_key(checkpoint.number) not in cached_keys]
+        logger.info("Checkpoints of %s in cache: %s, new: %s", branch, len(checkpoints),
+            len(new_checkpoints))
+
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO checkpoints "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(ims_project, branch, checkpoint.number, checkpoint.author,
+                checkpoint.description, position)
+                for position, checkpoint in enumerate(new_checkpoints, len(checkpoints))])
+        checkpoints += new_checkpoints
+
+        # limit list with given lowest checkpoint parameter
+        if lowest_checkpoint_number is not None:
+            lowest_checkpoint = ims_synch.get_from_number(checkpoints, lowest_checkpoint_number)
+            if lowest_checkpoint is not None:
+                checkpoints = checkpoints[checkpoints.index(lowest_checkpoint) + 1:]
+        return checkpoints
+
+    def get_cached_checkpoints(self, ims_project: str, branch: str) -> "list[ims_synch.Checkpoint]":
+        ''' Reports the cached checkpoints of a branch from oldest to newest '''
+        with self.lock:
+            rows = self.connection.execute("SELECT number, author, description FROM checkpoints "
+                "WHERE project = ? AND dev_path = ? ORDER BY position",
+                (ims_project, branch)).fetchall()
+        return [ims_synch.Checkpoint(*row) for row in rows]
+
+    def get_checkpoint_description(self, ims_project: str, checkpoint_number: str) -> str:
+        ''' Reports checkpoint description. Only asks IMS if it is not cached yet. '''
+
+        with self.lock:
+            row = self.connection.execute("SELECT description FROM checkpoints "
+                "WHERE project = ? AND number = ? AND description IS NOT NULL",
+                (ims_project, checkpoint_number)).fetchone()
+        if row is not None:
+            return row[0]
+
+        description = ims_synch.get_checkpoint_description(ims_project, checkpoint_number)
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE checkpoints SET description = ? "
+                "WHERE project = ? AND number = ?", (description, ims_project, checkpoint_number))
+        return description
@@ -1,24 +1,44 @@
 ''' Handles IMS side'''
 
-import subprocess
 import re
-import shutil
 import os
+import logging
+import itertools
+import contextlib
+import concurrent.futures
 import util
+import metrics
+import dir_synch
+import path_filter
+import si_runner
+from si_runner import SiCommandError
 
 def get_from_number(checkpoints: "list[Checkpoint]", number: str):
     ''' Reports checkpoint from number'''
+    key = get_checkpoint_key(number)
     for checkpoint in checkpoints:
-        if checkpoint.number is number:
+        if get_checkpoint_key(checkpoint.number) == key:
             return checkpoint
     return None
 
+def get_checkpoint_key(number: str) -> "tuple[int]":
+    ''' reports the checkpoint number as tuple of ints, "1.10" comes after "1.9" '''
+    return tuple(int(part) for part in number.strip().split("."))
+
+def is_same_or_older(number: str, other_number: str) -> bool:
+    ''' reports whether a checkpoint is the other one or comes before it on the same
+        dev path '''
+    key = get_checkpoint_key(number)
+    other_key = get_checkpoint_key(other_number)
+    return key[:-1] == other_key[:-1] and key[-1] <= other_key[-1]
+
 class Checkpoint:
     ''' IMS checkpoint class '''
 
-    def __init__(self, number: str, author: str):
+    def __init__(self, number: str, author: str, description: str = None):
         self.number = number
         self.author = author
+        self.description = description
 
 class Branch:
     ''' IMS branch class '''
@@ -33,10 +53,9 @@ class Branch:
 
 def get_branches(ims_project:str) -> list:
     ''' reports branches of the given repo '''
-    cmd = f"si projectinfo --project={ims_project} "
-    cmd +="--noacl --noattributes --noassociatedIssues --noshowCheckpointDescription"
-    result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout = result.stdout.decode("utf-8").rstrip()
+    with metrics.span("ims_projectinfo"):
+        stdout = si_runner.run(["projectinfo", f"--project={ims_project}", "--noacl",
+            "--noattributes", "--noassociatedIssues", "--noshowCheckpointDescription"]).rstrip()
 
     # get development paths as text
     regex = r"Development Paths:\n(.*)"
@@ -59,14 +78,9 @@ def get_branches_with_source(ims_project: str) -> "list[Branch]":
     ''' Reports IMS branches of the given project
         with info from which checkpoint the branch was started '''
 
-    cmd = f"si projectinfo --project={ims_project} "
-    cmd +="--noacl --noattributes --noassociatedIssues --noshowCheckpointDescription"
-    result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout = result.stdout.decode("utf-8").rstrip()
-
-    # get development paths as text
-    regex = r"Development Paths:\n(.*)"
-    match = re.search(regex, stdout, re.MULTILINE|re.S)
+    with metrics.span("ims_projectinfo"):
+        stdout = si_runner.run(["projectinfo", f"--project={ims_project}", "--noacl",
+            "--noattributes", "--noassociatedIssues", "--noshowCheckpointDescription"]).rstrip()
 
     # each line is holding one development path
     # capture group 1: dev path name
@@ -77,80 +91,168 @@ def get_branches_with_source(ims_project: str) -> "list[Branch]":
     # the mainline is not listed in the si projectinfo as dev path.
     # the mainline is always existing and therefore always added.
     branches = [Branch("main", "1.1", None)]
-
     for match in pattern.finditer(stdout):
-        # find the dev path name from which this dev path is branched from
-        source_checkpoint_num = match.group(2)[:-4].rstrip()
-        source_dev_path = ""
-        if source_checkpoint_num == "":
-            source_dev_path = "main"
-        else:
-            for branch in branches:
-                if source_checkpoint_num == branch.base_checkpoint:
-                    source_dev_path = branch.name
-
-        branches.append(Branch(match.group(1), match.group(2), source_dev_path))
+        branches.append(Branch(match.group(1), match.group(2).strip(), ""))
 
+    assign_source_dev_paths(branches,
+        lambda dev_path: get_dev_path_prefix(ims_project, dev_path))
     return branches
 
+###################################################################################################
+# assign_source_dev_paths
+
+def assign_source_dev_paths(branches: "list[Branch]", get_prefix=None):
+    ''' sets the dev path each branch is branched from, independent of the order of branches.
+        A branch point with two components like 1.5 is a mainline checkpoint. Otherwise the
+        branch point without its last component is the numbering prefix of the source dev
+        path, e.g. 1.3.1 for 1.3.1.2, and the source dev path is branched at 1.3. If several dev
+        paths are branched at 1.3, get_prefix(dev_path) tells which one numbers its
+        checkpoints 1.3.1. A source which cannot be determined is left empty. '''
+
+    by_branch_point = {}
+    for branch in branches:
+        if branch.name != "main":
+            by_branch_point.setdefault(branch.base_checkpoint, []).append(branch)
+
+    prefixes = {}
+    for branch in branches:
+        if branch.name == "main":
+            continue
+        components = branch.base_checkpoint.split(".")
+        if len(components) <= 2:
+            branch.source_dev_path_name = "main"
+            continue
+
+        candidates = by_branch_point.get(".".join(components[:-2]), [])
+        if len(candidates) > 1 and get_prefix is not None:
+            prefix = ".".join(components[:-1])
+            for candidate in candidates:
+                if candidate.name not in prefixes:
+                    prefixes[candidate.name] = get_prefix(candidate.name)
+            candidates = [candidate for candidate in candidates
+                if prefixes[candidate.name] == prefix]
+        if len(candidates) == 1:
+            branch.source_dev_path_name = candidates[0].name
+        else:
+            logging.getLogger(__name__).warning("Source of dev path %s branched at %s unknown",
+                branch.name, branch.base_checkpoint)
+            branch.source_dev_path_name = ""
+
+###################################################################################################
+# get_dev_path_prefix
+
+def get_dev_path_prefix(ims_project: str, dev_path: str) -> str:
+    ''' reports the numbering prefix of the checkpoints of a dev path, e.g. 1.3.1 for a dev
+        path with the checkpoints 1.3.1.1, 1.3.1.2. Only the newest checkpoint is read. '''
+
+    args = ["viewprojecthistory", f"--project={ims_project}", "--fields=revision,author",
+        f"--rfilter=devpath:{dev_path}"]
+    with metrics.span("ims_history", branch=dev_path), \
+        contextlib.closing(si_runner.stream(args, "ISO-8859-1")) as lines:
+        for checkpoint in parse_history_lines(itertools.islice(lines, 1, None)):
+            return checkpoint.number[:checkpoint.number.rfind(".")]
+    return None
+
 ###################################################################################################
 # get_checkpoints_from
 
 def get_checkpoints_from(ims_project: str, branch:str,
     lowest_checkpoint_number: str) -> "list[Checkpoint]":
-    ''' Reports all checkpoints on a branch coming after the given checkpoint number'''
+    ''' Reports all checkpoints on a branch coming after the given checkpoint number.
+        Revision, author and description are fetched with one history query. The history is
+        read while si delivers it, newest first, and the query is stopped as soon as the given
+        checkpoint is reached. '''
 
-    cmd = f"si viewprojecthistory --project={ims_project} "
-    cmd += "--fields=revision,author "
-    if branch == "main":
-        cmd += "--rfilter=range:1.1-"
-    else:
-        cmd += f"--rfilter=devpath:{branch}"
-
-    # execute bat cmd
-    print(f"cmd executed: {cmd}")
-    result = subprocess.run(cmd, shell=True, check=False,
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout = result.stdout.decode("utf-8").rstrip()
-
-    # each line is representing a checkpoint
-    # the first line holds the bat cmd
-    stdout_lines = stdout.split("\n")
-    stdout_lines = stdout_lines[1:]
-    stdout = "\n".join(stdout_lines)
-
-    regex = r"(\S+)\s+(.*)"
-    pattern = re.compile(regex, re.MULTILINE)
+    args = ["viewprojecthistory", f"--project={ims_project}",
+        "--fields=revision,author,description", get_history_filter(branch)]
 
+    print(f"cmd executed: si {' '.join(args)}")
     checkpoints = []
-    for match in re.finditer(pattern, stdout):
-        checkpoint = Checkpoint(match.group(1), match.group(2))
-        checkpoints.append(checkpoint)
-
-    # limit list with given lowest checkpoint parameter
-    if lowest_checkpoint_number is not None:
-        lowest_checkpoint = get_from_number(checkpoints, lowest_checkpoint_number)
-        if lowest_checkpoint is not None:
-            idx = checkpoints.index(lowest_checkpoint)
-            checkpoints = checkpoints[0:idx]
+    with metrics.span("ims_history", branch=branch) as history_span, \
+        contextlib.closing(si_runner.stream(args, "ISO-8859-1")) as lines:
+        # the first line holds the ims project info
+        for checkpoint in parse_history_lines(itertools.islice(lines, 1, None)):
+            if lowest_checkpoint_number is not None and \
+                is_same_or_older(checkpoint.number, lowest_checkpoint_number):
+                break
+            checkpoints.append(checkpoint)
+        history_span.add(len(checkpoints))
 
     checkpoints.reverse()
     return checkpoints
 
+###################################################################################################
+# get_history_filter
+
+def get_history_filter(branch: str) -> str:
+    ''' reports the si option limiting the project history to the checkpoints of a branch '''
+    if branch == "main":
+        return "--rfilter=range:1.1-"
+    return f"--rfilter=devpath:{branch}"
+
+###################################################################################################
+# get_labelled_checkpoints
+
+def get_labelled_checkpoints(ims_project: str, branch: str) -> "set[str]":
+    ''' Reports the numbers of the checkpoints of a branch which have a label '''
+    args = ["viewprojecthistory", f"--project={ims_project}", "--fields=revision,labels",
+        get_history_filter(branch)]
+
+    print(f"cmd executed: si {' '.join(args)}")
+    with metrics.span("ims_labels", branch=branch):
+        stdout = si_runner.run(args, "ISO-8859-1")
+
+    # the first line holds the ims project info
+    labelled = set()
+    for line in stdout.splitlines()[1:]:
+        number, _, labels = line.partition("\t")
+        if labels.strip():
+            labelled.add(number.strip())
+    return labelled
+
+###################################################################################################
+# parse_history_lines
+
+# a checkpoint starts with revision and author separated by tabs, followed by the first line
+# of the description. All further lines up to the next checkpoint belong to the description.
+HISTORY_RECORD_PATTERN = re.compile(r"^(\d+(?:\.\d+)+)\t([^\t]*)(?:\t(.*))?$")
+
+def parse_history_lines(lines) -> "Iterator[Checkpoint]":
+    ''' Parses the output lines of si viewprojecthistory --fields=revision,author,description
+        and yields the checkpoints in the order of the output '''
+
+    checkpoint = None
+    description_lines = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        match = HISTORY_RECORD_PATTERN.match(line)
+        if match is None:
+            # continuation of a multi line description
+            if checkpoint is not None:
+                description_lines.append(line)
+            continue
+
+        if checkpoint is not None:
+            checkpoint.description = "\n".join(description_lines).rstrip()
+            yield checkpoint
+        checkpoint = Checkpoint(match.group(1), match.group(2).strip())
+        description_lines = [match.group(3) or ""]
+
+    if checkpoint is not None:
+        checkpoint.description = "\n".join(description_lines).rstrip()
+        yield checkpoint
+
 ###################################################################################################
 # get_checkpoint_description
 
 def get_checkpoint_description(ims_project: str, checkpoint_number):
     ''' Reports checkpoint description'''
-    cmd = f"si viewprojecthistory --project={ims_project} "
-    cmd += "--fields=description "
-    cmd += f"--rfilter=range:{checkpoint_number}-{checkpoint_number}"
+    args = ["viewprojecthistory", f"--project={ims_project}", "--fields=description",
+        f"--rfilter=range:{checkpoint_number}-{checkpoint_number}"]
 
-    # execute bat cmd
-    print(f"cmd executed: {cmd}")
-    result = subprocess.run(cmd, shell=True, check=False,
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout = result.stdout.decode("ISO-8859-1").rstrip()
+    print(f"cmd executed: si {' '.join(args)}")
+    with metrics.span("ims_description", checkpoint=checkpoint_number):
+        stdout = si_runner.run(args, "ISO-8859-1").rstrip()
 
     # get rid of first line which holds the ims project info
     stdout_lines = stdout.split("\n")
@@ -158,6 +260,34 @@ def get_checkpoint_description(ims_project: str, checkpoint_number):
     stdout = "\n".join(stdout_lines)
     return stdout
 
+###################################################################################################
+# Metadata
+
+class Metadata:
+    ''' access to the IMS project metadata. Every request is sent to IMS.
+        See ims_cache.MetadataCache for a persistent cached variant. '''
+
+    def get_branches_with_source(self, ims_project: str) -> "list[Branch]":
+        ''' see get_branches_with_source '''
+        return get_branches_with_source(ims_project)
+
+    def get_checkpoints_from(self, ims_project: str, branch: str,
+        lowest_checkpoint_number: str) -> "list[Checkpoint]":
+        ''' see get_checkpoints_from '''
+        return get_checkpoints_from(ims_project, branch, lowest_checkpoint_number)
+
+    def get_checkpoint_description(self, ims_project: str, checkpoint_number: str) -> str:
+        ''' see get_checkpoint_description '''
+        return get_checkpoint_description(ims_project, checkpoint_number)
+
+    def get_labelled_checkpoints(self, ims_project: str, branch: str) -> "set[str]":
+        ''' see get_labelled_checkpoints. Labels may be added at any time, so they are never
+            cached. '''
+        return get_labelled_checkpoints(ims_project, branch)
+
+    def close(self):
+        ''' releases the resources of the metadata access '''
+
 ###################################################################################################
 # generate git commit message
 
@@ -173,33 +303,253 @@ def generate_git_commit_message(checkpoint_description: str, author: str, checkp
 def checkout(ims_project: str, checkpoint: str, sandbox_dir: str):
     ''' checkout of an specific IMS checkpoint into the given directory '''
 
-    cmd = f"si createsandbox --project={ims_project} -R -Y "
-    cmd += f"--projectRevision={checkpoint} {sandbox_dir}"
+    args = ["createsandbox", f"--project={ims_project}", "-R", "-Y",
+        f"--projectRevision={checkpoint}", sandbox_dir]
 
-    # execute bat cmd
-    print(f"cmd executed for checkout: {cmd}")
-    result = subprocess.run(cmd, shell=True, check=False,
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout = result.stdout.decode("utf-8").rstrip()
+    print(f"cmd executed for checkout: si {' '.join(args)}")
+    si_runner.run(args)
 
 ###################################################################################################
 # drop_sandbox
 
 def drop_sandbox(sandbox_project: str):
     ''' drop sandbox'''
-    cmd = f"si dropsandbox --noconfirm --delete=none {sandbox_project}"
+    args = ["dropsandbox", "--noconfirm", "--delete=none", sandbox_project]
 
-    # execute bat cmd
-    print(f"cmd executed to drop sandbox: {cmd}")
-    result = subprocess.run(cmd, shell=True, check=False,
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    print(f"cmd executed to drop sandbox: si {' '.join(args)}")
+    try:
+        si_runner.run(args)
+    except SiCommandError as error:
+        # the sandbox content is removed below anyway
+        logging.getLogger(__name__).warning("Drop of sandbox failed: %s", error)
 
     ims_dir = os.path.dirname(sandbox_project)
 
     # Remove everything in ims_dir folder
-    sub_dirs = os.scandir(ims_dir)
-    for sub_dir in sub_dirs:
-        if sub_dir.is_dir():
-            shutil.rmtree(sub_dir.path, onerror=util.del_rw)
-        elif sub_dir.is_file() or sub_dir.is_symlink():
-            os.unlink(sub_dir.path)
+    util.delete_dir(ims_dir)
+
+###################################################################################################
+# retarget_sandbox
+
+def retarget_sandbox(ims_project: str, checkpoint: str, sandbox_project: str):
+    ''' moves an existing sandbox to another project revision and resyncs the changed members.
+        Raises SiCommandError if one of the si commands fails. '''
+
+    args = ["retargetsandbox", f"--project={ims_project}", f"--projectRevision={checkpoint}",
+        sandbox_project]
+    print(f"cmd executed to retarget sandbox: si {' '.join(args)}")
+    si_runner.run(args)
+
+    args = ["resync", f"--sandbox={sandbox_project}", "-R", "-Y", "-f"]
+    print(f"cmd executed to resync sandbox: si {' '.join(args)}")
+    si_runner.run(args)
+
+###################################################################################################
+# Sandbox
+
+class Sandbox:
+    ''' IMS sandbox which is either recreated for every checkpoint or, in persistent mode,
+        created once and moved forward from checkpoint to checkpoint. '''
+
+    def __init__(self, ims_project: str, sandbox_dir: str, persistent: bool = False):
+        self.ims_project = ims_project
+        self.sandbox_dir = sandbox_dir
+        self.project_file = os.path.join(sandbox_dir, "project.pj")
+        self.persistent = persistent
+        self.checkpoint = None
+        # a sandbox does not know which files changed with the last update
+        self.changes = None
+
+    def update_to(self, checkpoint: str):
+        ''' brings the sandbox content to the given checkpoint '''
+
+        logger = logging.getLogger(__name__)
+        if not os.path.exists(self.sandbox_dir):
+            os.makedirs(self.sandbox_dir)
+
+        # a sandbox left behind by an interrupted run is moved forward as well
+        resumable = self.checkpoint is not None or os.path.exists(self.project_file)
+        if not self.persistent and resumable:
+            self.drop()
+        elif self.persistent and resumable:
+            try:
+                with metrics.span("ims_retarget", checkpoint=checkpoint):
+                    retarget_sandbox(self.ims_project, checkpoint, self.project_file)
+                self.checkpoint = checkpoint
+                return
+            except SiCommandError as error:
+                # sandbox is corrupted. Fall back to a full recreate.
+                logger.warning("Retarget of sandbox %s failed, recreating it: %s",
+                    self.sandbox_dir, error)
+                self.drop()
+
+        with metrics.span("ims_checkout", checkpoint=checkpoint):
+            checkout(self.ims_project, checkpoint, self.sandbox_dir)
+        self.checkpoint = checkpoint
+
+    def release(self):
+        ''' called once the current checkpoint is processed.
+            A non persistent sandbox is dropped, a persistent one is kept. '''
+        if not self.persistent:
+            self.drop()
+
+    def drop(self):
+        ''' drops the sandbox and removes its content '''
+        if os.path.exists(self.sandbox_dir):
+            with metrics.span("ims_drop", checkpoint=self.checkpoint):
+                drop_sandbox(self.project_file)
+        self.checkpoint = None
+
+###################################################################################################
+# get_member_revisions
+
+def get_member_revisions(ims_project: str, checkpoint: str) -> "dict[str, str]":
+    ''' Reports member path -> member revision of all members of a checkpoint.
+        The paths are relative to the project directory and use "/" as separator. '''
+
+    args = ["viewproject", f"--project={ims_project}", f"--projectRevision={checkpoint}",
+        "--recurse", "--fields=name,memberrev"]
+    print(f"cmd executed: si {' '.join(args)}")
+    with metrics.span("ims_members", checkpoint=checkpoint):
+        stdout = si_runner.run(args, "ISO-8859-1")
+
+    members = {}
+    for line in stdout.splitlines():
+        name, _, revision = line.strip().partition("\t")
+        # subprojects are listed as well but have no content of their own
+        if revision and not name.endswith(".pj"):
+            members[name.replace("\\", "/")] = revision.strip()
+    return members
+
+###################################################################################################
+# diff_member_revisions
+
+def diff_member_revisions(old_members: "dict[str, str]",
+    new_members: "dict[str, str]") -> dir_synch.ChangeSet:
+    ''' Reports the members which are added, modified or deleted between two checkpoints '''
+
+    changes = dir_synch.ChangeSet()
+    for path, revision in new_members.items():
+        old_revision = old_members.get(path)
+        if old_revision is None:
+            changes.added.append(path)
+        elif old_revision != revision:
+            changes.modified.append(path)
+    changes.deleted = [path for path in old_members if path not in new_members]
+    return changes
+
+###################################################################################################
+# fetch_members
+
+def fetch_members(ims_project: str, members: "dict[str, str]", target_dir: str,
+    workers: int = 8):
+    ''' writes the given member revisions into the target directory, up to workers at the same
+        time '''
+
+    def fetch_member(path: str, revision: str) -> int:
+        content = si_runner.run(["viewrevision", f"--project={ims_project}",
+            f"--revision={revision}", path], None)
+        file_path = os.path.join(target_dir, path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # replaced instead of overwritten, the git working directory may link to the file
+        dir_synch.remove_file(file_path)
+        with open(file_path, "wb") as file:
+            file.write(content)
+        return len(content)
+
+    # the si runner limits how many of them really run at the same time
+    with metrics.span("ims_fetch") as fetch_span, \
+        concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for size in executor.map(fetch_member, members.keys(), members.values()):
+            fetch_span.add(1, size)
+
+###################################################################################################
+# MemberMirror
+
+class MemberMirror:
+    ''' directory holding the member content of a checkpoint without an IMS sandbox.
+        Moving to the next checkpoint compares the member revisions of both checkpoints and
+        only fetches added and modified members and deletes removed ones. The change set of
+        the last update is kept in changes. It is None after the first fill of the directory
+        since the content which was there before is not known. A mirror seeded with the
+        content of a checkpoint reports the changes from the first update on. Members excluded
+        by the path filter are never fetched. Unlike a sandbox the directory has no project.pj,
+        so it is not committed to git. '''
+
+    def __init__(self, ims_project: str, sandbox_dir: str, paths: path_filter.PathFilter = None,
+        workers: int = 8):
+        self.ims_project = ims_project
+        self.sandbox_dir = sandbox_dir
+        self.paths = paths
+        # number of members fetched at the same time
+        self.workers = workers
+        self.checkpoint = None
+        self.members = None
+        self.changes = None
+
+    def get_members(self, checkpoint: str) -> "dict[str, str]":
+        ''' reports the revisions of the members of a checkpoint which pass the path filter '''
+        members = get_member_revisions(self.ims_project, checkpoint)
+        if self.paths is not None:
+            members = {path: revision for path, revision in members.items()
+                if not self.paths.is_excluded(path)}
+        return members
+
+    def seed(self, checkpoint: str, extract):
+        ''' fills the directory with the content of a checkpoint which is available elsewhere,
+            e.g. in git. extract(target_dir, paths) writes the files of the given paths it has
+            into the directory and reports them. The other members are fetched. '''
+
+        logger = logging.getLogger(__name__)
+        members = self.get_members(checkpoint)
+        if os.path.exists(self.sandbox_dir):
+            util.delete_dir(self.sandbox_dir)
+        else:
+            os.makedirs(self.sandbox_dir)
+        extracted = extract(self.sandbox_dir, set(members))
+        missing = {path: revision for path, revision in members.items() if path not in extracted}
+        fetch_members(self.ims_project, missing, self.sandbox_dir, self.workers)
+        logger.info("Mirror seeded with checkpoint %s, %s members extracted, %s fetched",
+            checkpoint, len(extracted), len(missing))
+
+        self.changes = None
+        self.members = members
+        self.checkpoint = checkpoint
+
+    def update_to(self, checkpoint: str):
+        ''' brings the directory content to the given checkpoint '''
+
+        logger = logging.getLogger(__name__)
+        new_members = self.get_members(checkpoint)
+
+        if self.members is None:
+            if os.path.exists(self.sandbox_dir):
+                util.delete_dir(self.sandbox_dir)
+            else:
+                os.makedirs(self.sandbox_dir)
+            changes = diff_member_revisions({}, new_members)
+        else:
+            changes = diff_member_revisions(self.members, new_members)
+
+        for path in changes.deleted:
+            dir_synch.remove_file(os.path.join(self.sandbox_dir, path))
+        dir_synch.remove_empty_dirs(self.sandbox_dir,
+            {os.path.dirname(path) for path in changes.deleted})
+        fetch_members(self.ims_project, {path: new_members[path]
+            for path in changes.added + changes.modified}, self.sandbox_dir, self.workers)
+        logger.info("Members of checkpoint %s fetched: %s", checkpoint, changes)
+
+        self.changes = changes if self.members is not None else None
+        self.members = new_members
+        self.checkpoint = checkpoint
+
+    def release(self):
+        ''' the content is kept for the next checkpoint '''
+
+    def drop(self):
+        ''' removes the content '''
+        if os.path.exists(self.sandbox_dir):
+            util.delete_dir(self.sandbox_dir)
+        self.checkpoint = None
+        self.members = None
+        self.changes = None
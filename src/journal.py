@@ -0,0 +1,122 @@
+''' Write-ahead journal of the synchronization progress '''
+
+###################################################################################################
+# imports
+
+import os
+import json
+import logging
+import threading
+
+###################################################################################################
+
+COMMITTED = "committed"
+PUSHED = "pushed"
+
+class BranchProgress:
+    ''' progress of one branch as recorded in the journal '''
+
+    def __init__(self):
+        self.committed = None
+        self.commit = None
+        self.pushed = None
+
+    def is_pushed(self) -> bool:
+        ''' reports whether the last commit is pushed '''
+        return self.committed is None or self.pushed == self.committed
+
+###################################################################################################
+
+class Journal:
+    ''' appends one JSON line per step to the journal file and flushes it to disk before the
+        step is treated as done. Reopening the file of an interrupted run restores the progress
+        of every branch. '''
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.lock = threading.Lock()
+        self.branches = {}
+        complete = True
+        if os.path.exists(file_name):
+            complete = self.load()
+        self.file = open(file_name, "a", encoding="utf-8")
+        if not complete:
+            # new records must not continue the incomplete last line
+            self.file.write("\n")
+
+    def load(self) -> bool:
+        ''' replays the records of the journal file and reports whether its last line is
+            complete '''
+        logger = logging.getLogger(__name__)
+        line = "\n"
+        with open(self.file_name, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line may be incomplete if the run died while writing it
+                    logger.warning("Incomplete journal record ignored: %s", line.strip())
+                    continue
+                self.apply(record)
+        return line.endswith("\n")
+
+    def apply(self, record: dict):
+        ''' applies one record to the progress '''
+        progress = self.branches.setdefault(record["branch"], BranchProgress())
+        if record["state"] == COMMITTED:
+            progress.committed = record["checkpoint"]
+            progress.commit = record["commit"]
+        elif record["state"] == PUSHED:
+            progress.pushed = record["checkpoint"]
+
+    def write(self, record: dict):
+        ''' appends a record and waits until it is on disk '''
+        with self.lock:
+            self.apply(record)
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def is_resumed(self) -> bool:
+        ''' reports whether the journal continues an interrupted run '''
+        return len(self.branches) > 0
+
+    def committed(self, branch: str, checkpoint: str, commit: str):
+        ''' records the git commit of a checkpoint '''
+        self.write({"branch": branch, "state": COMMITTED, "checkpoint": checkpoint,
+            "commit": commit})
+
+    def get_committed_checkpoints(self, branches: "list[str]") -> "dict[str, str]":
+        ''' reports the last committed checkpoint of each of the branches which has one '''
+        with self.lock:
+            return {branch: self.branches[branch].committed for branch in branches
+                if branch in self.branches and self.branches[branch].committed is not None}
+
+    def pushed(self, checkpoints: "dict[str, str]"):
+        ''' records that the branches are pushed up to the given checkpoints. They are taken
+            before the push, a checkpoint committed while pushing may not be pushed. '''
+        for branch, checkpoint in checkpoints.items():
+            if self.branches[branch].pushed != checkpoint:
+                self.write({"branch": branch, "state": PUSHED, "checkpoint": checkpoint})
+
+    def get_committed_checkpoint(self, branch: str, head_commit: str) -> str:
+        ''' reports the last committed checkpoint of a branch if it is still the given head
+            commit of the branch, otherwise None '''
+        progress = self.branches.get(branch)
+        if progress is not None and progress.commit is not None and progress.commit == head_commit:
+            return progress.committed
+        return None
+
+    def get_unpushed_branches(self) -> "list[str]":
+        ''' reports the branches with commits which are not pushed yet '''
+        return [branch for branch, progress in self.branches.items() if not progress.is_pushed()]
+
+    def close(self):
+        ''' closes the journal file '''
+        if not self.file.closed:
+            self.file.close()
+
+    def finish(self):
+        ''' removes the journal after a completed run, the next run starts from scratch '''
+        self.close()
+        os.remove(self.file_name)
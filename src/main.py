@@ -4,85 +4,713 @@
 # imports
 
 import os
+import sys
+import copy
+import json
+import time
+import configparser
+import concurrent.futures
 import logging        # standard logger library
 
 import typer          # handles the command line execution
 from git import Repo  # git library to execute git commands
+from git import GitCommandError
 
 import git_synch      # abstracts the git access
+import dir_synch      # change sets of directory contents
+import path_filter    # paths which are not synched
+import fast_import    # streams checkpoints into git fast-import
+import sparse_history # import of selected checkpoints first and the gaps later
+import scheduler      # parallel synchronization of independent branches
+import pipeline       # prefetching of upcoming checkpoints
+import push_scheduler # batched pushes of the synched branches
+import journal        # progress of a run for resuming it
+import manifest       # projects of a batch run
 import ims_synch      # abstracts the IMS access
+import ims_cache      # persistent cache of the IMS metadata
+import si_runner      # execution of the si commands
+import metrics        # timing of the synchronization stages
+import trash          # background deletion of working directories
 import util           # helpful basic functions
+from si_runner import SiCommandError
+
+###################################################################################################
+
+class SynchOptions:
+    ''' options controlling how checkpoints are transferred from IMS to git '''
+
+    def __init__(self, persistent_sandbox: bool = False, delta_copy: bool = False,
+        metadata: ims_synch.Metadata = None, prefetch: int = 0, member_fetch: bool = False,
+        pusher: push_scheduler.PushScheduler = None, run_journal: journal.Journal = None,
+        paths: path_filter.PathFilter = None, verify_index: bool = False,
+        copier: dir_synch.Copier = None, fetch_workers: int = 8):
+        # reuse one sandbox per branch and move it from checkpoint to checkpoint
+        self.persistent_sandbox = persistent_sandbox
+        # only write changed files into the git working directory
+        self.delta_copy = delta_copy
+        # source of the IMS dev paths, checkpoints and descriptions
+        self.metadata = metadata if metadata is not None else ims_synch.Metadata()
+        # number of checkpoints checked out in the background while committing
+        self.prefetch = prefetch
+        # fetch changed members by their revision instead of using IMS sandboxes
+        self.member_fetch = member_fetch
+        # collects the commits to push, None if nothing is pushed
+        self.pusher = pusher
+        # records the progress of the run, None if it is not resumable
+        self.journal = run_journal
+        # paths of the checkpoints which are not synched, None synchs everything
+        self.paths = paths
+        # check the index entries staged from a change set against a full git add
+        self.verify_index = verify_index
+        # writes the checked out files into the git working directory
+        self.copier = copier
+        # number of members fetched at the same time with member fetch
+        self.fetch_workers = fetch_workers
+
+###################################################################################################
+
+def create_pusher(git_repo: Repo, every_commits: int = 0, every_seconds: float = 0,
+    run_journal: journal.Journal = None) -> push_scheduler.PushScheduler:
+    ''' creates the push scheduler of a git repository. Pushes are recorded in the journal and
+        branches the journal reports as not pushed are pushed with the next push. '''
+
+    def push(branches: "list[str]"):
+        if run_journal is not None:
+            committed = run_journal.get_committed_checkpoints(branches)
+        git_synch.push_branches(git_repo, branches)
+        if run_journal is not None:
+            run_journal.pushed(committed)
+
+    pusher = push_scheduler.PushScheduler(push, every_commits, every_seconds)
+    if run_journal is not None:
+        for branch in run_journal.get_unpushed_branches():
+            pusher.committed(branch)
+    return pusher
+
+###################################################################################################
+
+def create_sandbox(ims_repo: str, sandbox_dir: str, options: SynchOptions) -> ims_synch.Sandbox:
+    ''' creates the directory the checkpoints are checked out into '''
+    if options.member_fetch:
+        return ims_synch.MemberMirror(ims_repo, sandbox_dir, options.paths,
+            options.fetch_workers)
+    return ims_synch.Sandbox(ims_repo, sandbox_dir, options.persistent_sandbox)
+
+###################################################################################################
+
+def seed_member_mirror(sandbox: ims_synch.Sandbox, git_repo: Repo, git_branch: str,
+    last_synched_checkpoint_number: str):
+    ''' fills an empty member mirror with the git commit of the last synched checkpoint, or of
+        the base checkpoint of a new branch, so that only the members changed since are
+        fetched. Other sandboxes and mirrors which already hold a checkpoint are left alone. '''
+
+    if not isinstance(sandbox, ims_synch.MemberMirror) or sandbox.members is not None:
+        return
+    if last_synched_checkpoint_number is not None:
+        commit = git_synch.get_commit(git_repo, git_branch, last_synched_checkpoint_number)
+    else:
+        # a new branch starts on the commit of its base checkpoint
+        commit = git_synch.get_last_synched_commit(git_repo, git_branch)
+    if commit is None:
+        return
+    sandbox.seed(git_synch.get_ims_checkpoint(commit), lambda target_dir, rel_paths:
+        git_synch.extract_files(git_repo, commit.hexsha, target_dir, rel_paths))
+
+###################################################################################################
+
+def open_path_filter(filter_file: str) -> path_filter.PathFilter:
+    ''' reads the path filter if a filter file is given '''
+    if filter_file:
+        return path_filter.PathFilter.from_file(filter_file)
+    return None
+
+###################################################################################################
+
+def create_copier(copy_mode: str, copy_workers: int) -> dir_synch.Copier:
+    ''' creates the copier of the checked out files, an unknown mode is a usage error '''
+    try:
+        return dir_synch.Copier(copy_mode, copy_workers)
+    except ValueError as error:
+        raise typer.BadParameter(str(error)) from error
+
+###################################################################################################
+
+def open_metadata(metadata_cache: str) -> ims_synch.Metadata:
+    ''' opens the IMS metadata cache if a database file is given '''
+    if metadata_cache:
+        return ims_cache.MetadataCache(metadata_cache)
+    return ims_synch.Metadata()
+
+###################################################################################################
+
+def get_commit_message(checkpoint: ims_synch.Checkpoint, ims_repo: str,
+    options: SynchOptions) -> str:
+    ''' generates the git commit message of a checkpoint. The description is normally
+        delivered together with the checkpoint and only requested separately if missing. '''
+
+    checkpoint_description = checkpoint.description
+    if checkpoint_description is None:
+        checkpoint_description = options.metadata.get_checkpoint_description(ims_repo,
+            checkpoint.number)
+    return ims_synch.generate_git_commit_message(checkpoint_description,
+        checkpoint.author, checkpoint.number)
 
 ###################################################################################################
 
 def synch_ims_branch_to_git(ims_repo: str, ims_branch: ims_synch.Branch, git_repo: Repo,
-    ims_dir: str, git_dir: str):
-    ''' synchs an IMS branch to git '''
+    ims_dir: str, git_dir: str, options: SynchOptions = None,
+    sandbox: ims_synch.Sandbox = None):
+    ''' synchs an IMS branch to git. A given sandbox is used instead of a new one in ims_dir
+        and kept for the next call. '''
+
+    if options is None:
+        options = SynchOptions()
 
     logger = logging.getLogger(__name__)
     logger.info(f"Doing branch {ims_branch.name}, {ims_branch.base_checkpoint}, {ims_branch.source_dev_path_name}")
 
+    last_synched_checkpoint_number = prepare_git_branch(ims_branch, git_repo, options)
+
+    # get checkpoints which has to be synched
+    checkpoints_to_synch = options.metadata.get_checkpoints_from(ims_repo, ims_branch.name,
+        last_synched_checkpoint_number)
+    logger.info("Number of checkpoints to synch: %s", str(len(checkpoints_to_synch)))
+
+    if options.prefetch > 0:
+        synch_checkpoints_pipelined(checkpoints_to_synch, ims_repo, ims_branch.name,
+            git_repo, ims_dir, git_dir, options)
+        return
+
+    # cycle through checkpoints
+    keep_sandbox = sandbox is not None
+    if not keep_sandbox:
+        sandbox = create_sandbox(ims_repo, ims_dir, options)
+    try:
+        if checkpoints_to_synch:
+            seed_member_mirror(sandbox, git_repo, ims_branch.name, last_synched_checkpoint_number)
+        for checkpoint in checkpoints_to_synch:
+            # synch IMS checkpoint to git
+            logger.info("Synch checkpoint: %s to git branch %s", checkpoint.number,
+                ims_branch.name)
+
+            synch_ims_checkpoint_to_git(checkpoint, ims_repo, ims_branch.name,
+                git_repo, sandbox, git_dir, options)
+    finally:
+        if not keep_sandbox:
+            sandbox.drop()
+
+###################################################################################################
+
+def prepare_git_branch(ims_branch: ims_synch.Branch, git_repo: Repo, options: SynchOptions,
+    git_branch: str = None, source_git_branch: str = None) -> str:
+    ''' creates the git branch of an IMS branch from the commit of its base checkpoint if it
+        does not exist yet, checks it out and reports the number of the last checkpoint
+        synched to it. None means that the complete IMS branch has to be synched. The git
+        branches default to the names of the IMS branches. '''
+
+    logger = logging.getLogger(__name__)
+    git_branch = git_branch or ims_branch.name
+    source_git_branch = source_git_branch or ims_branch.source_dev_path_name
+
     # is branch in target repo existing. if not create it.
     synch_complete_branch = False
-    is_ims_branch_in_git = ims_branch.name in git_synch.get_branches(git_repo)
+    is_ims_branch_in_git = git_branch in git_synch.get_branches(git_repo)
     if (ims_branch.name != "main") and not is_ims_branch_in_git:
 
         # determine commit from which the branch shall be created.
         commit_to_create_branch_from = git_synch.get_commit(git_repo,
-            ims_branch.source_dev_path_name, ims_branch.base_checkpoint)
-        git_repo.create_head(ims_branch.name, commit_to_create_branch_from)
+            source_git_branch, ims_branch.base_checkpoint)
+        git_repo.create_head(git_branch, commit_to_create_branch_from)
 
         logger.info("Ims branch does not exist in git."
             " New Git branch created --> Synch complete ims branch to git")
         synch_complete_branch = True
 
-    # checkout branch if git repo is not empty
-    if len(git_synch.get_branches(git_repo)) > 0:
-        git_repo.git.checkout(ims_branch.name)
+    # checkout branch if git repo has it
+    if git_branch in git_synch.get_branches(git_repo):
+        git_repo.git.checkout(git_branch)
 
     last_synched_checkpoint_number = None
-    if not synch_complete_branch:
-        last_synched_commit = git_synch.get_last_synched_commit(git_repo, ims_branch.name)
+    if not synch_complete_branch and options.journal is not None:
+        # the journal knows the last checkpoint as long as nobody else committed since
+        last_synched_checkpoint_number = options.journal.get_committed_checkpoint(
+            git_branch, git_synch.get_head_commit(git_repo, git_branch))
 
-        if last_synched_commit is not None:
-            last_synched_checkpoint_number = git_synch.get_ims_checkpoint(last_synched_commit)
-            logger.info("last synched checkpoint number: %s", last_synched_checkpoint_number)
+    if not synch_complete_branch and last_synched_checkpoint_number is None:
+        last_synched_checkpoint_number = git_synch.get_last_synched_checkpoint(git_repo,
+            git_branch)
+        logger.info("last synched checkpoint number: %s", last_synched_checkpoint_number)
+    return last_synched_checkpoint_number
 
-    # get checkpoints which has to be synched
-    checkpoints_to_synch = ims_synch.get_checkpoints_from(ims_repo, ims_branch.name,
-        last_synched_checkpoint_number)
-    logger.info("Number of checkpoints to synch: %s", str(len(checkpoints_to_synch)))
+###################################################################################################
 
-    # cycle through checkpoints
-    for checkpoint in checkpoints_to_synch:
-        # synch IMS checkpoint to git
-        logger.info("Synch checkpoint: %s to git branch %s", checkpoint.number, ims_branch.name)
+def synch_checkpoints_pipelined(checkpoints: "list[ims_synch.Checkpoint]", ims_repo: str,
+    git_branch_name: str, git_repo: Repo, ims_dir: str, git_dir: str, options: SynchOptions):
+    ''' synchs the checkpoints while the following ones are checked out in the background
+        into a pool of sandboxes '''
+
+    logger = logging.getLogger(__name__)
 
-        synch_ims_checkpoint_to_git(checkpoint, ims_repo, ims_branch.name,
-            git_repo, ims_dir, git_dir)
+    # the changes a sandbox reports refer to the checkpoint it held before, which is not
+    # the previous commit since the sandboxes take turns
+    def commit_checkpoint(checkpoint: ims_synch.Checkpoint, sandbox: ims_synch.Sandbox):
+        logger.info("Synch checkpoint: %s to git branch %s", checkpoint.number, git_branch_name)
+        commit_checkpoint_to_git(checkpoint, ims_repo, git_branch_name, git_repo,
+            sandbox.sandbox_dir, git_dir, options)
+
+    sandboxes = [create_sandbox(ims_repo, os.path.join(ims_dir, f"sandbox_{index}"), options)
+        for index in range(options.prefetch + 1)]
+    try:
+        pipeline.synch_checkpoints_pipelined(checkpoints, sandboxes, commit_checkpoint)
+    finally:
+        for sandbox in sandboxes:
+            sandbox.drop()
 
 ###################################################################################################
 
 def synch_ims_checkpoint_to_git(checkpoint: ims_synch.Checkpoint, ims_repo: str,
-    git_branch_name: str, git_repo: Repo, sandbox_dir: str, git_dir):
+    git_branch_name: str, git_repo: Repo, sandbox: ims_synch.Sandbox, git_dir,
+    options: SynchOptions):
     ''' synchs an ims checkpoint to git '''
 
-    sandbox_dir_project = sandbox_dir + "project.pj"
-    ims_synch.checkout(ims_repo, checkpoint.number, sandbox_dir)
+    with metrics.context(git_branch_name, checkpoint.number):
+        sandbox.update_to(checkpoint.number)
+        commit_checkpoint_to_git(checkpoint, ims_repo, git_branch_name, git_repo,
+            sandbox.sandbox_dir, git_dir, options, sandbox.changes)
+        sandbox.release()
 
-    checkpoint_description = ims_synch.get_checkpoint_description(ims_repo, checkpoint.number)
-    git_commit_message = ims_synch.generate_git_commit_message(checkpoint_description,
-        checkpoint.author, checkpoint.number)
+###################################################################################################
+
+def commit_checkpoint_to_git(checkpoint: ims_synch.Checkpoint, ims_repo: str,
+    git_branch_name: str, git_repo: Repo, sandbox_dir: str, git_dir: str,
+    options: SynchOptions, changes: dir_synch.ChangeSet = None):
+    ''' commits the checkpoint content of a sandbox to git. changes are the changes of the
+        sandbox since the previous commit of the branch if known. '''
+
+    with metrics.context(git_branch_name, checkpoint.number):
+        git_commit_message = get_commit_message(checkpoint, ims_repo, options)
+        git_synch.synch_dir_to_git(git_repo, git_branch_name, git_dir,
+            sandbox_dir, git_commit_message, checkpoint.author, options.delta_copy,
+            changes, options.paths, options.verify_index, options.copier)
+        commit = git_repo.head.commit.hexsha
+        git_synch.set_checkpoint_ref(git_repo, git_branch_name, checkpoint.number, commit)
+        if options.journal is not None:
+            options.journal.committed(git_branch_name, checkpoint.number, commit)
+        if options.pusher is not None:
+            options.pusher.committed(git_branch_name)
+
+###################################################################################################
+
+def synch_ims_branches_parallel(ims_repo: str, ims_branches: "list[ims_synch.Branch]",
+    git_repo: Repo, ims_dir: str, git_dir: str, options: SynchOptions, workers: int):
+    ''' synchs independent IMS branches at the same time. main is synched in git_dir, every
+        other branch in its own git worktree. Each branch uses its own IMS sandbox. '''
+
+    worktree_root = get_worktree_root(git_dir)
+
+    def synch_branch(ims_branch: ims_synch.Branch):
+        sandbox_dir = os.path.join(ims_dir, ims_branch.name)
+        if ims_branch.name == "main":
+            synch_ims_branch_to_git(ims_repo, ims_branch, git_repo, sandbox_dir, git_dir,
+                options)
+            return
+
+        worktree_dir = os.path.join(worktree_root, ims_branch.name)
+        worktree_repo = git_synch.add_worktree(git_repo, worktree_dir)
+        try:
+            synch_ims_branch_to_git(ims_repo, ims_branch, worktree_repo, sandbox_dir,
+                worktree_dir, options)
+        finally:
+            worktree_repo.close()
+            git_synch.remove_worktree(git_repo, worktree_dir)
+
+    scheduler.synch_branches_parallel(ims_branches, synch_branch, workers)
+
+###################################################################################################
+
+def get_worktree_root(git_dir: str) -> str:
+    ''' reports the directory of the git worktrees of branches synched in parallel '''
+    return git_dir.rstrip("/\\") + "_worktrees"
+
+###################################################################################################
+
+def synch_new_checkpoints(ims_repo: str, git_repo: Repo, ims_dir: str, git_dir: str,
+    options: SynchOptions, sandboxes: "dict[str, ims_synch.Sandbox]") -> "list[str]":
+    ''' synchs the checkpoints which are new on any IMS dev path and reports the branches
+        which got new commits. sandboxes holds the sandbox of each branch between calls. '''
+
+    touched_branches = []
+    ims_branches = options.metadata.get_branches_with_source(ims_repo)
+    for ims_branch in scheduler.BranchTree(ims_branches).topological_order():
+        head_before = git_synch.get_head_commit(git_repo, ims_branch.name)
+        sandbox = sandboxes.get(ims_branch.name)
+        if sandbox is None:
+            sandbox = create_sandbox(ims_repo, os.path.join(ims_dir, ims_branch.name), options)
+            sandboxes[ims_branch.name] = sandbox
+        synch_ims_branch_to_git(ims_repo, ims_branch, git_repo, ims_dir, git_dir, options,
+            sandbox)
+        if git_synch.get_head_commit(git_repo, ims_branch.name) != head_before:
+            touched_branches.append(ims_branch.name)
+    return touched_branches
+
+###################################################################################################
+
+def watch_ims_branches(ims_repo: str, git_repo: Repo, ims_dir: str, git_dir: str,
+    options: SynchOptions, interval: float, iterations: int = 0, metrics_file: str = None,
+    metrics_format: str = "json"):
+    ''' polls IMS for new checkpoints, synchs them and pushes the branches which got new
+        commits after every poll through options.pusher. Runs until interrupted or the given
+        number of polls is done. The metrics of every poll are written to the metrics file,
+        which then only holds the last poll. '''
+
+    logger = logging.getLogger(__name__)
+
+    # branches which already exist in the remote repository are continued
+    git_synch.track_remote_branches(git_repo)
+
+    sandboxes = {}
+    poll = 0
+    try:
+        while True:
+            poll += 1
+            started = time.monotonic()
+            try:
+                with metrics.span("watch_poll"):
+                    touched_branches = synch_new_checkpoints(ims_repo, git_repo, ims_dir,
+                        git_dir, options, sandboxes)
+                    options.pusher.flush()
+                logger.info("Poll %s done, branches with new commits: %s", poll,
+                    touched_branches)
+            except (SiCommandError, GitCommandError) as error:
+                # IMS or the git remote may be unreachable for a while, try again with the
+                # next poll. Half done checkouts and commits are discarded.
+                logger.warning("Poll %s failed: %s", poll, error)
+                for sandbox in sandboxes.values():
+                    sandbox.drop()
+                sandboxes.clear()
+                git_synch.discard_changes(git_repo)
+
+            if metrics_file:
+                metrics.METRICS.write(metrics_file, metrics_format)
+            metrics.reset()
+
+            if iterations and poll >= iterations:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        logger.info("Watch stopped")
+    finally:
+        for sandbox in sandboxes.values():
+            sandbox.drop()
+
+###################################################################################################
+
+def synch_project(project: manifest.Project, work_dir: str, options: SynchOptions,
+    git_cache: str = None, blobless: bool = False) -> dict:
+    ''' synchs the dev paths of a manifest project in its own working directories below
+        work_dir and reports the outcome. A failure is reported, not raised. '''
+
+    logger = logging.getLogger(__name__)
+    result = {"project": project.name, "ims_project": project.ims_project,
+        "git_repo": project.git_repo, "status": "ok", "commits": {}}
+    started = time.monotonic()
+    git_dir = os.path.join(work_dir, project.name, "git")
+    ims_dir = os.path.join(work_dir, project.name, "ims")
+    try:
+        util.setup_temporary_working_folders(git_dir, ims_dir)
+        git_repo = git_synch.open_repo(project.git_repo, git_dir, git_cache, blobless)
+        git_synch.track_remote_branches(git_repo)
+        project_options = copy.copy(options)
+        project_options.pusher = create_pusher(git_repo) if project.push else None
+        if project.filter_file:
+            project_options.paths = open_path_filter(project.filter_file)
+
+        ims_branches = scheduler.select_branches(
+            options.metadata.get_branches_with_source(project.ims_project), project.branches)
+        for ims_branch in ims_branches:
+            head_before = git_synch.get_head_commit(git_repo, ims_branch.name)
+            if head_before is None and ims_branch.source_dev_path_name in \
+                git_synch.get_branches(git_repo):
+                # a new branch only counts the commits after the one it starts from
+                head_before = ims_branch.source_dev_path_name
+            synch_ims_branch_to_git(project.ims_project, ims_branch, git_repo, ims_dir, git_dir,
+                project_options)
+            result["commits"][ims_branch.name] = git_synch.count_commits(git_repo,
+                ims_branch.name, head_before)
+        if project_options.pusher is not None:
+            project_options.pusher.flush()
+        git_synch.close_repo(git_repo)
+    except (Exception, SystemExit) as error:
+        logger.error("Synch of project %s failed: %s", project.name, error)
+        result["status"] = "failed"
+        result["error"] = str(error)
+    result["seconds"] = round(time.monotonic() - started, 3)
+    return result
+
+###################################################################################################
+
+def synch_projects(projects: "list[manifest.Project]", work_dir: str, options: SynchOptions,
+    workers: int, git_cache: str = None, blobless: bool = False) -> dict:
+    ''' synchs the projects with up to workers projects in parallel and reports the results
+        of all projects '''
+
+    started = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+        thread_name_prefix="project") as executor:
+        results = list(executor.map(lambda project: synch_project(project, work_dir, options,
+            git_cache, blobless), projects))
+    return {"seconds": round(time.monotonic() - started, 3),
+        "failed": len([result for result in results if result["status"] != "ok"]),
+        "projects": results}
+
+###################################################################################################
+
+class FanOutTarget:
+    ''' git repository of a fan out together with the options of its commits '''
+
+    def __init__(self, target: manifest.Target, git_repo: Repo, git_dir: str,
+        options: SynchOptions):
+        self.target = target
+        self.git_repo = git_repo
+        self.git_dir = git_dir
+        self.options = options
+        # IMS branch name -> number of the checkpoint committed last in this run
+        self.committed = {}
+
+###################################################################################################
+
+def open_fan_out_target(target: manifest.Target, git_dir: str, options: SynchOptions,
+    paths: path_filter.PathFilter = None, git_cache: str = None,
+    blobless: bool = False) -> FanOutTarget:
+    ''' provides the working copy of a fan out target in git_dir. The target gets its own
+        path filter and push scheduler. '''
 
-    git_synch.synch_dir_to_git(git_repo, git_branch_name, git_dir,
-        sandbox_dir, git_commit_message, checkpoint.author, False)
-    ims_synch.drop_sandbox(sandbox_dir_project)
+    git_repo = git_synch.open_repo(target.git_repo, git_dir, git_cache, blobless)
+    git_synch.track_remote_branches(git_repo)
+    target_options = copy.copy(options)
+    target_options.paths = paths
+    target_options.pusher = create_pusher(git_repo, target.push_every,
+        target.push_interval) if target.push else None
+    return FanOutTarget(target, git_repo, git_dir, target_options)
+
+###################################################################################################
+
+def fan_out_ims_branch(ims_repo: str, ims_branch: ims_synch.Branch,
+    targets: "list[FanOutTarget]", ims_dir: str, options: SynchOptions):
+    ''' synchs an IMS branch to several git repositories. Every checkpoint is checked out
+        once and committed to each target which does not have it yet. '''
+
+    logger = logging.getLogger(__name__)
+    logger.info("Fan out branch %s to %s", ims_branch.name,
+        [target.target.name for target in targets])
+
+    last_synched = {}
+    for target in targets:
+        source_git_branch = target.target.get_git_branch(ims_branch.source_dev_path_name) \
+            if ims_branch.source_dev_path_name else None
+        last_synched[target] = prepare_git_branch(ims_branch, target.git_repo, target.options,
+            target.target.get_git_branch(ims_branch.name), source_git_branch)
+
+    # the target furthest behind decides where to start
+    numbers = list(last_synched.values())
+    lowest_checkpoint_number = None if None in numbers else min(numbers,
+        key=ims_synch.get_checkpoint_key)
+    checkpoints_to_synch = options.metadata.get_checkpoints_from(ims_repo, ims_branch.name,
+        lowest_checkpoint_number)
+    logger.info("Number of checkpoints to synch: %s", str(len(checkpoints_to_synch)))
+
+    sandbox = create_sandbox(ims_repo, ims_dir, options)
+    previous_checkpoint_number = None
+    try:
+        for checkpoint in checkpoints_to_synch:
+            due_targets = [target for target in targets if last_synched[target] is None
+                or not ims_synch.is_same_or_older(checkpoint.number, last_synched[target])]
+            with metrics.context(ims_branch.name, checkpoint.number):
+                sandbox.update_to(checkpoint.number)
+            for target in due_targets:
+                # the changes of the sandbox only apply to a target which got its previous
+                # checkpoint, any other target is rebuilt from the sandbox
+                changes = sandbox.changes if previous_checkpoint_number is not None and \
+                    target.committed.get(ims_branch.name) == previous_checkpoint_number \
+                    else None
+                commit_checkpoint_to_git(checkpoint, ims_repo,
+                    target.target.get_git_branch(ims_branch.name), target.git_repo,
+                    sandbox.sandbox_dir, target.git_dir, target.options, changes)
+                target.committed[ims_branch.name] = checkpoint.number
+                last_synched[target] = checkpoint.number
+            sandbox.release()
+            previous_checkpoint_number = checkpoint.number
+    finally:
+        sandbox.drop()
+
+###################################################################################################
+
+def import_ims_branch_to_git(importer: fast_import.FastImport, ims_repo: str,
+    ims_branch: ims_synch.Branch, git_repo: Repo, ims_dir: str, options: SynchOptions,
+    sparse: sparse_history.Selection = None, branch_points: "set[str]" = ()):
+    ''' imports an IMS branch through git fast-import without using a git working tree.
+        A branch which is not in git yet is imported sparse if a selection is given,
+        branch_points are the checkpoints other branches start from. '''
+
+    logger = logging.getLogger(__name__)
+    logger.info(f"Importing branch {ims_branch.name}, {ims_branch.base_checkpoint}, {ims_branch.source_dev_path_name}")
+
+    last_synched_checkpoint_number = None
+    parent = None
+    if ims_branch.name in git_synch.get_branches(git_repo):
+        # continue the existing branch
+        parent = git_repo.heads[ims_branch.name].commit.hexsha
+        last_synched_checkpoint_number = git_synch.get_last_synched_checkpoint(git_repo,
+            ims_branch.name)
+        logger.info("last synched checkpoint number: %s", last_synched_checkpoint_number)
+    elif ims_branch.name != "main":
+        # branch from the source dev path. Commit is either imported in this run or existing.
+        parent = importer.get_commit(ims_branch.source_dev_path_name, ims_branch.base_checkpoint)
+        if parent is None:
+            commit = git_synch.get_commit(git_repo, ims_branch.source_dev_path_name,
+                ims_branch.base_checkpoint)
+            parent = commit.hexsha if commit is not None else None
+
+    checkpoints_to_synch = options.metadata.get_checkpoints_from(ims_repo, ims_branch.name,
+        last_synched_checkpoint_number)
+    if last_synched_checkpoint_number is None and sparse is not None and sparse.is_sparse():
+        labelled_numbers = options.metadata.get_labelled_checkpoints(ims_repo,
+            ims_branch.name) if sparse.labelled else set()
+        checkpoints_to_synch = sparse.select(checkpoints_to_synch, labelled_numbers,
+            branch_points)
+    logger.info("Number of checkpoints to import: %s", str(len(checkpoints_to_synch)))
+
+    sandbox = create_sandbox(ims_repo, ims_dir, options)
+    try:
+        for checkpoint in checkpoints_to_synch:
+            logger.info("Import checkpoint: %s to git branch %s", checkpoint.number,
+                ims_branch.name)
+            with metrics.context(ims_branch.name, checkpoint.number):
+                sandbox.update_to(checkpoint.number)
+                git_commit_message = get_commit_message(checkpoint, ims_repo, options)
+                importer.commit(ims_branch.name, sandbox.sandbox_dir, git_commit_message,
+                    checkpoint.author, checkpoint.number, parent)
+                sandbox.release()
+    finally:
+        sandbox.drop()
+
+###################################################################################################
+
+def import_ims_branch_gaps(importer: fast_import.FastImport, ims_repo: str,
+    ims_branch: ims_synch.Branch, git_repo: Repo, ims_dir: str,
+    options: SynchOptions) -> "list[sparse_history.Gap]":
+    ''' imports the checkpoints a sparse import left out of a branch. Every gap is imported as
+        its own line of history, which is grafted once the import is complete. '''
+
+    logger = logging.getLogger(__name__)
+
+    base_commit = None
+    if ims_branch.name != "main":
+        commit = git_synch.get_commit(git_repo, ims_branch.source_dev_path_name,
+            ims_branch.base_checkpoint)
+        base_commit = commit.hexsha if commit is not None else None
+    gaps = sparse_history.find_gaps(ims_branch.name,
+        options.metadata.get_checkpoints_from(ims_repo, ims_branch.name, None),
+        git_synch.get_checkpoint_refs(git_repo, ims_branch.name), base_commit)
+    logger.info("Gaps of branch %s: %s with %s checkpoints", ims_branch.name, len(gaps),
+        sum(len(gap.checkpoints) for gap in gaps))
+
+    sandbox = create_sandbox(ims_repo, ims_dir, options)
+    try:
+        for gap in gaps:
+            for checkpoint in gap.checkpoints:
+                with metrics.context(ims_branch.name, checkpoint.number):
+                    sandbox.update_to(checkpoint.number)
+                    importer.commit(ims_branch.name, sandbox.sandbox_dir,
+                        get_commit_message(checkpoint, ims_repo, options), checkpoint.author,
+                        checkpoint.number, gap.parent, gap.ref)
+                    sandbox.release()
+    finally:
+        sandbox.drop()
+    return gaps
 
 ###################################################################################################
 # CLI
 
 app = typer.Typer()
 
+# options shared by the commands
+PERSISTENT_SANDBOX_OPTION = typer.Option(False,
+    help="Reuse one IMS sandbox per branch and move it from checkpoint to checkpoint")
+DELTA_COPY_OPTION = typer.Option(False,
+    help="Only write changed files into the git working directory")
+MEMBER_FETCH_OPTION = typer.Option(False,
+    help="Fetch only the members changed between checkpoints instead of using IMS sandboxes, "
+    "project.pj is not committed then")
+FETCH_WORKERS_OPTION = typer.Option(8,
+    help="Number of members fetched at the same time with --member-fetch")
+FILTER_FILE_OPTION = typer.Option(None,
+    help="File with gitignore-style patterns of the paths which are not synched")
+VERIFY_INDEX_OPTION = typer.Option(False,
+    help="Check the files staged from a change set against a full git add")
+COPY_MODE_OPTION = typer.Option("auto",
+    help="How files are copied into the git working directory: auto, copy, reflink, "
+        "copy_file_range or hardlink. Unsupported methods fall back to a copy. "
+        "hardlink needs --member-fetch with persistent sandboxes")
+COPY_WORKERS_OPTION = typer.Option(4,
+    help="Number of files copied at the same time")
+METADATA_CACHE_OPTION = typer.Option(None,
+    help="SQLite file caching the IMS checkpoints and their descriptions between runs")
+SI_CONCURRENCY_OPTION = typer.Option(4,
+    help="Maximum number of si commands running at the same time")
+SI_TIMEOUT_OPTION = typer.Option(3600,
+    help="Seconds after which an si command is aborted")
+SI_RETRIES_OPTION = typer.Option(3,
+    help="Number of retries of an si command failing with a transient error")
+PUSH_EVERY_OPTION = typer.Option(0,
+    help="Push after this number of commits, 0 only pushes at the end")
+PUSH_INTERVAL_OPTION = typer.Option(0,
+    help="Push after this number of seconds, 0 only pushes at the end")
+GIT_CACHE_OPTION = typer.Option(None,
+    help="Directory of persistent git mirrors reused between runs")
+BLOBLESS_OPTION = typer.Option(False,
+    help="Create new git mirrors without file contents, they are fetched on demand")
+METRICS_FILE_OPTION = typer.Option(None,
+    help="File the timing of the synchronization stages is written to")
+METRICS_FORMAT_OPTION = typer.Option("json",
+    help="Format of the metrics file: json or prometheus")
+
+###################################################################################################
+
+def setup_command(si_concurrency: int, si_timeout: float, si_retries: int) -> logging.Logger:
+    ''' sets up log file and console output, the si command limits and the metrics of a
+        command and reports the logger '''
+
+    # setup logger
+    util.setup_logger()
+    logger = logging.getLogger(__name__)
+    if not logger.handlers:
+        console = logging.StreamHandler()
+        console.setLevel(logging.INFO)
+        logger.addHandler(console)
+
+    si_runner.configure(si_concurrency, si_timeout, si_retries)
+    metrics.reset()
+    return logger
+
+###################################################################################################
+
+def create_synch_options(persistent_sandbox: bool, delta_copy: bool, member_fetch: bool,
+    filter_file: str, verify_index: bool, copy_mode: str, copy_workers: int,
+    metadata_cache: str, prefetch: int = 0, fetch_workers: int = 8) -> SynchOptions:
+    ''' creates the synch options of the shared command line options. Push scheduler and
+        journal are up to the command. A persistent sandbox updates its files in place, which
+        would change the files hardlinked into git, so hardlinks need member fetch there. '''
+    if copy_mode == "hardlink" and persistent_sandbox and not member_fetch:
+        raise typer.BadParameter("hardlink copies need --member-fetch with persistent "
+            "sandboxes, IMS would change the committed files in place", param_hint="--copy-mode")
+    return SynchOptions(persistent_sandbox, delta_copy, open_metadata(metadata_cache),
+        prefetch, member_fetch, paths=open_path_filter(filter_file),
+        verify_index=verify_index, copier=create_copier(copy_mode, copy_workers),
+        fetch_workers=fetch_workers)
+
+###################################################################################################
+
 @app.command()
 def synch_ims_to_git(ims_repo: str = typer.Argument(...,
             help="IMS project path"),
@@ -91,28 +719,364 @@ def synch_ims_to_git(ims_repo: str = typer.Argument(...,
         git_dir: str = typer.Option(...,
             help="Git working directory"),
         ims_dir: str = typer.Option(...,
-            help="IMS working directory")):
+            help="IMS working directory"),
+        persistent_sandbox: bool = PERSISTENT_SANDBOX_OPTION,
+        delta_copy: bool = DELTA_COPY_OPTION,
+        member_fetch: bool = MEMBER_FETCH_OPTION,
+        fetch_workers: int = FETCH_WORKERS_OPTION,
+        filter_file: str = FILTER_FILE_OPTION,
+        verify_index: bool = VERIFY_INDEX_OPTION,
+        copy_mode: str = COPY_MODE_OPTION,
+        copy_workers: int = COPY_WORKERS_OPTION,
+        push: bool = typer.Option(False,
+            help="Push the synched branches to the remote repository"),
+        journal_file: str = typer.Option(None, "--journal",
+            help="File recording the progress. An interrupted run started again with the same "
+                "file continues where it stopped"),
+        fast_import_backend: bool = typer.Option(False, "--fast-import",
+            help="Stream the checkpoints into git fast-import instead of committing "
+                "through the git working directory"),
+        sparse_every: int = typer.Option(0,
+            help="Import only every Nth checkpoint of new branches, needs --fast-import. "
+                "The gaps are filled by fill_ims_history"),
+        sparse_last: int = typer.Option(0,
+            help="Import the last N checkpoints of new branches, needs --fast-import"),
+        sparse_labelled: bool = typer.Option(False,
+            help="Import the labelled checkpoints of new branches, needs --fast-import"),
+        metadata_cache: str = METADATA_CACHE_OPTION,
+        workers: int = typer.Option(1,
+            help="Number of IMS branches synched in parallel"),
+        prefetch: int = typer.Option(0,
+            help="Number of upcoming checkpoints checked out while committing"),
+        si_concurrency: int = SI_CONCURRENCY_OPTION,
+        si_timeout: float = SI_TIMEOUT_OPTION,
+        si_retries: int = SI_RETRIES_OPTION,
+        push_every: int = PUSH_EVERY_OPTION,
+        push_interval: float = PUSH_INTERVAL_OPTION,
+        git_cache: str = GIT_CACHE_OPTION,
+        blobless: bool = BLOBLESS_OPTION,
+        metrics_file: str = METRICS_FILE_OPTION,
+        metrics_format: str = METRICS_FORMAT_OPTION):
     ''' synching an given ims repository to a given git repository.
         It will use temporary directories to checkout and and commit. '''
 
-    # setup logger
-    util.setup_logger()
-    logger = logging.getLogger(__name__)
-    console = logging.StreamHandler()
-    console.setLevel(logging.INFO)
-    logger.addHandler(console)
+    sparse = sparse_history.Selection(sparse_every, sparse_last, sparse_labelled)
+    if sparse.is_sparse() and not fast_import_backend:
+        raise typer.BadParameter("a sparse import needs --fast-import")
+
+    logger = setup_command(si_concurrency, si_timeout, si_retries)
+    options = create_synch_options(persistent_sandbox, delta_copy, member_fetch, filter_file,
+        verify_index, copy_mode, copy_workers, metadata_cache, prefetch=prefetch,
+        fetch_workers=fetch_workers)
+
+    # trash of the worktrees of an earlier run
+    trash.reclaim(get_worktree_root(git_dir))
+    run_journal = journal.Journal(journal_file) if journal_file else None
+    options.journal = run_journal
+    if run_journal is not None and run_journal.is_resumed() and git_synch.is_repo(git_dir):
+        # continue the interrupted run in its working directories
+        logger.info("resume run recorded in %s", journal_file)
+        # trash the interrupted run left behind
+        trash.reclaim(git_dir)
+        trash.reclaim(ims_dir)
+        git_repo = git_synch.reopen_repo(git_dir)
+    else:
+        # create temporary working directories for git and ims
+        logger.info("setup temporary working folders")
+        util.setup_temporary_working_folders(git_dir, ims_dir)
+
+        # clone git repo or take it from the mirror cache
+        git_repo = git_synch.open_repo(git_repo_url, git_dir, git_cache, blobless)
+        # branches which already exist in the remote repository are continued
+        git_synch.track_remote_branches(git_repo)
+
+    # cycle through ims branches
+    if push:
+        options.pusher = create_pusher(git_repo, push_every, push_interval, run_journal)
+    try:
+        # a branch is created from a commit of its parent, parents come first
+        ims_branches = scheduler.BranchTree(
+            options.metadata.get_branches_with_source(ims_repo)).topological_order()
+        if fast_import_backend:
+            branch_points = sparse_history.get_branch_points(ims_branches)
+            importer = fast_import.FastImport(git_repo, options.paths)
+            for ims_branch in ims_branches:
+                import_ims_branch_to_git(importer, ims_repo, ims_branch, git_repo, ims_dir,
+                    options, sparse, branch_points.get(ims_branch.name, set()))
+            importer.close()
+            # the branches are only written when the import is complete
+            if push:
+                git_synch.push_branches(git_repo, [ims_branch.name for ims_branch
+                    in ims_branches if ims_branch.name in git_synch.get_branches(git_repo)])
+        elif workers > 1:
+            synch_ims_branches_parallel(ims_repo, ims_branches, git_repo, ims_dir, git_dir,
+                options, workers)
+        else:
+            for ims_branch in ims_branches:
+                synch_ims_branch_to_git(ims_repo, ims_branch, git_repo, ims_dir, git_dir,
+                    options)
+        if push and not fast_import_backend:
+            options.pusher.flush()
+        if run_journal is not None:
+            run_journal.finish()
+    finally:
+        if run_journal is not None:
+            run_journal.close()
+        git_synch.close_repo(git_repo)
+        options.metadata.close()
+        if metrics_file:
+            metrics.METRICS.write(metrics_file, metrics_format)
+
+@app.command()
+def watch_ims_to_git(ims_repo: str = typer.Argument(...,
+            help="IMS project path"),
+        git_repo_url: str = typer.Argument(...,
+         help="Github repository url"),
+        git_dir: str = typer.Option(...,
+            help="Git working directory"),
+        ims_dir: str = typer.Option(...,
+            help="IMS working directory"),
+        interval: float = typer.Option(60,
+            help="Seconds between two polls of IMS"),
+        iterations: int = typer.Option(0,
+            help="Number of polls before stopping, 0 runs until interrupted"),
+        delta_copy: bool = DELTA_COPY_OPTION,
+        member_fetch: bool = MEMBER_FETCH_OPTION,
+        fetch_workers: int = FETCH_WORKERS_OPTION,
+        filter_file: str = FILTER_FILE_OPTION,
+        verify_index: bool = VERIFY_INDEX_OPTION,
+        copy_mode: str = COPY_MODE_OPTION,
+        copy_workers: int = COPY_WORKERS_OPTION,
+        metadata_cache: str = METADATA_CACHE_OPTION,
+        si_concurrency: int = SI_CONCURRENCY_OPTION,
+        si_timeout: float = SI_TIMEOUT_OPTION,
+        si_retries: int = SI_RETRIES_OPTION,
+        push_every: int = PUSH_EVERY_OPTION,
+        push_interval: float = PUSH_INTERVAL_OPTION,
+        git_cache: str = GIT_CACHE_OPTION,
+        blobless: bool = BLOBLESS_OPTION,
+        metrics_file: str = METRICS_FILE_OPTION,
+        metrics_format: str = METRICS_FORMAT_OPTION):
+    ''' keeps synching new IMS checkpoints of all dev paths to a git repository and pushes
+        them. Git repository, sandboxes and metadata are set up once and kept between polls. '''
+
+    logger = setup_command(si_concurrency, si_timeout, si_retries)
+    # the sandboxes stay between the polls
+    options = create_synch_options(True, delta_copy, member_fetch, filter_file, verify_index,
+        copy_mode, copy_workers, metadata_cache, fetch_workers=fetch_workers)
 
-    # create temporary working directories for git and ims
     logger.info("setup temporary working folders")
     util.setup_temporary_working_folders(git_dir, ims_dir)
+    git_repo = git_synch.open_repo(git_repo_url, git_dir, git_cache, blobless)
+    options.pusher = create_pusher(git_repo, push_every, push_interval)
+    try:
+        watch_ims_branches(ims_repo, git_repo, ims_dir, git_dir, options, interval, iterations,
+            metrics_file, metrics_format)
+    finally:
+        git_synch.close_repo(git_repo)
+        options.metadata.close()
 
-    # clone git repo
-    git_repo = Repo.clone_from(git_repo_url, git_dir)
+@app.command()
+def synch_manifest(manifest_file: str = typer.Argument(...,
+            help="Manifest of the IMS projects and their git repositories, see test/test.cfg"),
+        work_dir: str = typer.Option(...,
+            help="Directory the working directories of the projects are created in"),
+        workers: int = typer.Option(4,
+            help="Number of projects synched in parallel"),
+        persistent_sandbox: bool = PERSISTENT_SANDBOX_OPTION,
+        delta_copy: bool = DELTA_COPY_OPTION,
+        member_fetch: bool = MEMBER_FETCH_OPTION,
+        fetch_workers: int = FETCH_WORKERS_OPTION,
+        filter_file: str = FILTER_FILE_OPTION,
+        verify_index: bool = VERIFY_INDEX_OPTION,
+        copy_mode: str = COPY_MODE_OPTION,
+        copy_workers: int = COPY_WORKERS_OPTION,
+        metadata_cache: str = METADATA_CACHE_OPTION,
+        si_concurrency: int = SI_CONCURRENCY_OPTION,
+        si_timeout: float = SI_TIMEOUT_OPTION,
+        si_retries: int = SI_RETRIES_OPTION,
+        git_cache: str = GIT_CACHE_OPTION,
+        blobless: bool = BLOBLESS_OPTION,
+        report_file: str = typer.Option(None,
+            help="File the results of all projects are written to as JSON"),
+        metrics_file: str = METRICS_FILE_OPTION,
+        metrics_format: str = METRICS_FORMAT_OPTION):
+    ''' synchs all IMS projects of a manifest in one process. The projects share the worker
+        pool, the si command limit, the metadata cache and the git mirrors. '''
 
-    # cycle through ims branches
-    ims_branches = ims_synch.get_branches_with_source(ims_repo)
-    for ims_branch in ims_branches:
-        synch_ims_branch_to_git(ims_repo, ims_branch, git_repo, ims_dir, git_dir)
+    setup_command(si_concurrency, si_timeout, si_retries)
+
+    try:
+        projects = manifest.read_manifest(manifest_file)
+    except (ValueError, configparser.Error) as error:
+        print(f"Invalid manifest {manifest_file}: {error}")
+        sys.exit(manifest.SYS_EXIT_INVALID_MANIFEST)
+
+    options = create_synch_options(persistent_sandbox, delta_copy, member_fetch, filter_file,
+        verify_index, copy_mode, copy_workers, metadata_cache, fetch_workers=fetch_workers)
+    try:
+        report = synch_projects(projects, work_dir, options, workers, git_cache, blobless)
+    finally:
+        options.metadata.close()
+        if metrics_file:
+            metrics.METRICS.write(metrics_file, metrics_format)
+
+    for result in report["projects"]:
+        print(f"{result['project']}: {result['status']} in {result['seconds']} s, "
+            f"commits: {result['commits']} {result.get('error', '')}")
+    print(f"{len(projects)} projects synched in {report['seconds']} s, "
+        f"{report['failed']} failed")
+    if report_file:
+        with open(report_file, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if report["failed"]:
+        sys.exit(manifest.SYS_EXIT_PROJECTS_FAILED)
+
+@app.command()
+def synch_ims_to_targets(ims_repo: str = typer.Argument(...,
+            help="IMS project path"),
+        targets_file: str = typer.Argument(...,
+            help="Git repositories the IMS project is synched to, see test/targets.cfg"),
+        work_dir: str = typer.Option(...,
+            help="Directory the IMS sandbox and the git working directories are created in"),
+        persistent_sandbox: bool = PERSISTENT_SANDBOX_OPTION,
+        delta_copy: bool = DELTA_COPY_OPTION,
+        member_fetch: bool = MEMBER_FETCH_OPTION,
+        fetch_workers: int = FETCH_WORKERS_OPTION,
+        filter_file: str = typer.Option(None,
+            help="File with gitignore-style patterns of the paths which are not synched, "
+                "used by the targets without filter_file"),
+        verify_index: bool = VERIFY_INDEX_OPTION,
+        copy_mode: str = COPY_MODE_OPTION,
+        copy_workers: int = COPY_WORKERS_OPTION,
+        metadata_cache: str = METADATA_CACHE_OPTION,
+        si_concurrency: int = SI_CONCURRENCY_OPTION,
+        si_timeout: float = SI_TIMEOUT_OPTION,
+        si_retries: int = SI_RETRIES_OPTION,
+        git_cache: str = GIT_CACHE_OPTION,
+        blobless: bool = BLOBLESS_OPTION,
+        metrics_file: str = METRICS_FILE_OPTION,
+        metrics_format: str = METRICS_FORMAT_OPTION):
+    ''' synchs an IMS project to several git repositories. Every checkpoint is checked out of
+        IMS once and committed to all targets, each with its own branches, branch names,
+        path filter and pushes. '''
+
+    setup_command(si_concurrency, si_timeout, si_retries)
+
+    try:
+        targets = manifest.read_targets(targets_file)
+    except (ValueError, configparser.Error) as error:
+        print(f"Invalid target file {targets_file}: {error}")
+        sys.exit(manifest.SYS_EXIT_INVALID_MANIFEST)
+
+    git_root = os.path.join(work_dir, "git")
+    ims_dir = os.path.join(work_dir, "ims")
+    util.setup_temporary_working_folders(git_root, ims_dir)
+
+    # the sandbox is shared, so the path filters are only applied per target
+    options = create_synch_options(persistent_sandbox, delta_copy, member_fetch, None,
+        verify_index, copy_mode, copy_workers, metadata_cache, fetch_workers=fetch_workers)
+    fan_out_targets = []
+    try:
+        for target in targets:
+            fan_out_targets.append(open_fan_out_target(target, os.path.join(git_root,
+                target.name), options, open_path_filter(target.filter_file or filter_file),
+                git_cache, blobless))
+
+        ims_branches = options.metadata.get_branches_with_source(ims_repo)
+        selected = {target: {ims_branch.name for ims_branch in scheduler.select_branches(
+            ims_branches, target.target.branches)} for target in fan_out_targets}
+        for ims_branch in scheduler.BranchTree(ims_branches).topological_order():
+            branch_targets = [target for target in fan_out_targets
+                if ims_branch.name in selected[target]]
+            if branch_targets:
+                fan_out_ims_branch(ims_repo, ims_branch, branch_targets,
+                    os.path.join(ims_dir, ims_branch.name), options)
+
+        for target in fan_out_targets:
+            if target.options.pusher is not None:
+                target.options.pusher.flush()
+    finally:
+        for target in fan_out_targets:
+            git_synch.close_repo(target.git_repo)
+        options.metadata.close()
+        if metrics_file:
+            metrics.METRICS.write(metrics_file, metrics_format)
+
+@app.command()
+def backfill_checkpoint_refs(git_repo_url: str = typer.Argument(...,
+            help="Github repository url"),
+        git_dir: str = typer.Option(...,
+            help="Git working directory"),
+        push: bool = typer.Option(False,
+            help="Push the created checkpoint refs to the remote repository")):
+    ''' creates the checkpoint refs of a repository synched before they existed. This is
+        needed once per repository, afterwards the refs are written with every commit. '''
+
+    util.setup_logger()
+    if os.path.exists(git_dir):
+        util.delete_dir(git_dir)
+    git_repo = git_synch.open_repo(git_repo_url, git_dir)
+    git_synch.track_remote_branches(git_repo)
+    branches = git_synch.get_branches(git_repo)
+    print(f"Created {git_synch.backfill_checkpoint_refs(git_repo, branches)} checkpoint refs")
+    if push:
+        git_synch.push_branches(git_repo, branches)
+
+@app.command()
+def fill_ims_history(ims_repo: str = typer.Argument(...,
+            help="IMS project path"),
+        git_repo_url: str = typer.Argument(...,
+         help="Github repository url"),
+        git_dir: str = typer.Option(...,
+            help="Git working directory"),
+        ims_dir: str = typer.Option(...,
+            help="IMS working directory"),
+        member_fetch: bool = MEMBER_FETCH_OPTION,
+        fetch_workers: int = FETCH_WORKERS_OPTION,
+        filter_file: str = FILTER_FILE_OPTION,
+        push: bool = typer.Option(False,
+            help="Push the checkpoint refs and replacements to the remote repository"),
+        metadata_cache: str = METADATA_CACHE_OPTION,
+        si_concurrency: int = SI_CONCURRENCY_OPTION,
+        si_timeout: float = SI_TIMEOUT_OPTION,
+        si_retries: int = SI_RETRIES_OPTION,
+        metrics_file: str = METRICS_FILE_OPTION,
+        metrics_format: str = METRICS_FORMAT_OPTION):
+    ''' imports the checkpoints a sparse import of synch_ims_to_git left out. The branches
+        keep their commits, the missing history is attached with git replace. Clones see it
+        after fetching refs/replace/*. '''
+
+    setup_command(si_concurrency, si_timeout, si_retries)
+
+    util.setup_temporary_working_folders(git_dir, ims_dir)
+    git_repo = git_synch.open_repo(git_repo_url, git_dir)
+    git_synch.track_remote_branches(git_repo)
+
+    options = SynchOptions(metadata=open_metadata(metadata_cache), member_fetch=member_fetch,
+        paths=open_path_filter(filter_file), fetch_workers=fetch_workers)
+    try:
+        ims_branches = [ims_branch for ims_branch in scheduler.BranchTree(
+            options.metadata.get_branches_with_source(ims_repo)).topological_order()
+            if ims_branch.name in git_synch.get_branches(git_repo)]
+        importer = fast_import.FastImport(git_repo, options.paths)
+        gaps = []
+        for ims_branch in ims_branches:
+            gaps += import_ims_branch_gaps(importer, ims_repo, ims_branch, git_repo, ims_dir,
+                options)
+        importer.close()
+
+        for gap in gaps:
+            sparse_history.graft(git_repo, gap, git_synch.get_checkpoint_ref_commit(git_repo,
+                gap.branch, gap.checkpoints[-1].number))
+        print(f"Filled {len(gaps)} gaps with "
+            f"{sum(len(gap.checkpoints) for gap in gaps)} checkpoints")
+        if push:
+            git_synch.push_extra_refs(git_repo)
+    finally:
+        options.metadata.close()
+        if metrics_file:
+            metrics.METRICS.write(metrics_file, metrics_format)
 
 @app.command()
 def synch_ims_to_github(ims_repo: str = typer.Argument(...,
@@ -128,8 +1092,29 @@ def synch_ims_to_github(ims_repo: str = typer.Argument(...,
         git_dir: str = typer.Option(...,
             help="Git working directory"),
         ims_dir: str = typer.Option(...,
-            help="IMS working directory")):
+            help="IMS working directory"),
+        persistent_sandbox: bool = PERSISTENT_SANDBOX_OPTION,
+        delta_copy: bool = DELTA_COPY_OPTION,
+        member_fetch: bool = MEMBER_FETCH_OPTION,
+        fetch_workers: int = FETCH_WORKERS_OPTION,
+        filter_file: str = FILTER_FILE_OPTION,
+        verify_index: bool = VERIFY_INDEX_OPTION,
+        copy_mode: str = COPY_MODE_OPTION,
+        copy_workers: int = COPY_WORKERS_OPTION,
+        metadata_cache: str = METADATA_CACHE_OPTION,
+        si_concurrency: int = SI_CONCURRENCY_OPTION,
+        si_timeout: float = SI_TIMEOUT_OPTION,
+        si_retries: int = SI_RETRIES_OPTION,
+        push_every: int = PUSH_EVERY_OPTION,
+        push_interval: float = PUSH_INTERVAL_OPTION,
+        git_cache: str = GIT_CACHE_OPTION,
+        blobless: bool = BLOBLESS_OPTION,
+        metrics_file: str = METRICS_FILE_OPTION,
+        metrics_format: str = METRICS_FORMAT_OPTION):
     ''' synch IMS to github'''
+    setup_command(si_concurrency, si_timeout, si_retries)
+    options = create_synch_options(persistent_sandbox, delta_copy, member_fetch, filter_file,
+        verify_index, copy_mode, copy_workers, metadata_cache, fetch_workers=fetch_workers)
     print(f"Synch IMS project {ims_repo} branch {branch} to github {git_repo_url}")
 
     # create temporary git working directory
@@ -142,10 +1127,10 @@ def synch_ims_to_github(ims_repo: str = typer.Argument(...,
         os.makedirs(ims_dir)
         print(f"Directory created: {ims_dir}")
 
-    # clone git repo
+    # clone git repo or take it from the mirror cache
     git_repo_name = git_synch.get_repo_name_from_https(git_repo_url)
     # git_repo = git_synch.clone_repo(git_repo_url, git_repo_name)
-    git_repo = Repo.clone_from(git_repo_url, git_dir)
+    git_repo = git_synch.open_repo(git_repo_url, git_dir, git_cache, blobless)
 
     # get git branches
     git_branches = git_synch.get_branches(git_repo)
@@ -172,33 +1157,37 @@ def synch_ims_to_github(ims_repo: str = typer.Argument(...,
 
     print(f"destination git branch: {dest_branch}")
 
+    options.pusher = create_pusher(git_repo, push_every, push_interval)
+
     # determine checkpoints to be synched
-    checkpoints_to_synch: "list[ims_synch.Checkpoint]"
-    last_synched_commit = None
-    if dest_branch in git_branches:
-        last_synched_commit = git_synch.get_last_synched_commit(git_repo, branch)
-        if last_synched_commit is not None:
-            # get ims checkpoint information
-            ims_last_synched_checkpoint_number = git_synch.get_ims_checkpoint(last_synched_commit)
-            checkpoints_to_synch = ims_synch.get_checkpoints_from(ims_repo, branch,
-                ims_last_synched_checkpoint_number)
-
-    if last_synched_commit is None:
-        # complete branch has no IMS checkpoints
-        checkpoints_to_synch = ims_synch.get_checkpoints_from(ims_repo, branch, None)
-
-    for checkpoint in checkpoints_to_synch:
-        sandbox_dir = ims_dir
-        sandbox_dir_project = sandbox_dir + "project.pj"
-        if not os.path.exists(sandbox_dir):
-            os.makedirs(sandbox_dir)
-        ims_synch.checkout(ims_repo, checkpoint.number, sandbox_dir)
-        checkpoint_description = ims_synch.get_checkpoint_description(ims_repo, checkpoint.number)
-        git_commit_message = ims_synch.generate_git_commit_message(checkpoint_description,
-            checkpoint.author, checkpoint.number)
-        git_synch.synch_dir_to_git(git_repo, dest_branch, git_dir, sandbox_dir,
-            git_commit_message, checkpoint.author)
-        ims_synch.drop_sandbox(sandbox_dir_project)
+    # without synched checkpoint the complete branch is synched
+    ims_last_synched_checkpoint_number = git_synch.get_last_synched_checkpoint(git_repo,
+        dest_branch)
+    checkpoints_to_synch = options.metadata.get_checkpoints_from(ims_repo, branch,
+        ims_last_synched_checkpoint_number)
+
+    sandbox = create_sandbox(ims_repo, ims_dir, options)
+    try:
+        if checkpoints_to_synch:
+            seed_member_mirror(sandbox, git_repo, dest_branch, ims_last_synched_checkpoint_number)
+        for checkpoint in checkpoints_to_synch:
+            with metrics.context(dest_branch, checkpoint.number):
+                sandbox.update_to(checkpoint.number)
+                git_commit_message = get_commit_message(checkpoint, ims_repo, options)
+                git_synch.synch_dir_to_git(git_repo, dest_branch, git_dir, sandbox.sandbox_dir,
+                    git_commit_message, checkpoint.author, options.delta_copy,
+                    sandbox.changes, options.paths, options.verify_index, options.copier)
+                git_synch.set_checkpoint_ref(git_repo, dest_branch, checkpoint.number,
+                    git_repo.head.commit.hexsha)
+                options.pusher.committed(dest_branch)
+                sandbox.release()
+        options.pusher.flush()
+    finally:
+        sandbox.drop()
+        git_synch.close_repo(git_repo)
+        options.metadata.close()
+        if metrics_file:
+            metrics.METRICS.write(metrics_file, metrics_format)
 
 
 ###################################################################################################
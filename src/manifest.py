@@ -0,0 +1,140 @@
+''' Manifest of the IMS projects synched by one batch run and of the git targets one IMS
+    project is fanned out to '''
+
+###################################################################################################
+# imports
+
+import os
+import configparser
+
+###################################################################################################
+# constants
+
+SYS_EXIT_INVALID_MANIFEST = "3: Invalid manifest"
+SYS_EXIT_PROJECTS_FAILED = "4: Synch of at least one project failed"
+
+###################################################################################################
+
+class Project:
+    ''' one IMS project and the git repository it is synched to.
+        branches limits the synch to the given IMS dev paths, an empty list means all.
+        filter_file replaces the path filter of the run for this project. '''
+
+    def __init__(self, name: str, ims_project: str, git_repo: str,
+        branches: "list[str]" = None, push: bool = False, filter_file: str = None):
+        self.name = name
+        self.ims_project = ims_project
+        self.git_repo = git_repo
+        self.branches = branches or []
+        self.push = push
+        self.filter_file = filter_file
+
+###################################################################################################
+
+def read_manifest(file_name: str) -> "list[Project]":
+    ''' reads the projects of a manifest. Every section is one project:
+
+            [DEFAULT]
+            ims_root = /Projects/SW
+            git_root = https://github.com/example
+
+            [spi]
+            ims_project = %(ims_root)s/spi/project.pj
+            git_repo = %(git_root)s/spi.git
+            branches = main, dev_spi_2
+            push = yes
+            filter_file = spi_filter.txt
+
+        Values of the DEFAULT section are shared by all projects. Raises ValueError if a
+        project misses ims_project or git_repo. '''
+
+    if not os.path.exists(file_name):
+        raise ValueError(f"manifest {file_name} not found")
+    parser = configparser.ConfigParser()
+    parser.read(file_name, encoding="utf-8")
+
+    projects = []
+    for name in parser.sections():
+        section = parser[name]
+        if not section.get("ims_project") or not section.get("git_repo"):
+            raise ValueError(f"project {name} needs ims_project and git_repo")
+        projects.append(Project(name, section["ims_project"], section["git_repo"],
+            get_list(section, "branches"), section.getboolean("push", fallback=False),
+            get_file(section, "filter_file", file_name)))
+    return projects
+
+###################################################################################################
+
+class Target:
+    ''' one git repository an IMS project is fanned out to. branches limits the target to the
+        given IMS dev paths, an empty list means all. branch_map names the git branch of an IMS
+        dev path if it differs. filter_file replaces the path filter of the run for this
+        target. Pushes follow push_every commits and push_interval seconds like the pushes of
+        a single repository. '''
+
+    def __init__(self, name: str, git_repo: str, branches: "list[str]" = None,
+        branch_map: "dict[str, str]" = None, push: bool = False, push_every: int = 0,
+        push_interval: float = 0, filter_file: str = None):
+        self.name = name
+        self.git_repo = git_repo
+        self.branches = branches or []
+        self.branch_map = branch_map or {}
+        self.push = push
+        self.push_every = push_every
+        self.push_interval = push_interval
+        self.filter_file = filter_file
+
+    def get_git_branch(self, ims_branch: str) -> str:
+        ''' reports the git branch an IMS dev path is synched to '''
+        return self.branch_map.get(ims_branch, ims_branch)
+
+###################################################################################################
+
+def read_targets(file_name: str) -> "list[Target]":
+    ''' reads the git targets of a fan out. Every section is one target:
+
+            [partner]
+            git_repo = https://github.com/example/partner.git
+            branches = main, dev_release
+            branch_map = main:master, dev_release:release
+            push = yes
+            push_every = 50
+            filter_file = partner_filter.txt
+
+        Raises ValueError if a target misses git_repo or a mapping is malformed. '''
+
+    if not os.path.exists(file_name):
+        raise ValueError(f"target file {file_name} not found")
+    parser = configparser.ConfigParser()
+    parser.read(file_name, encoding="utf-8")
+
+    targets = []
+    for name in parser.sections():
+        section = parser[name]
+        if not section.get("git_repo"):
+            raise ValueError(f"target {name} needs git_repo")
+        branch_map = {}
+        for mapping in get_list(section, "branch_map"):
+            ims_branch, separator, git_branch = mapping.partition(":")
+            if not separator or not ims_branch.strip() or not git_branch.strip():
+                raise ValueError(f"target {name} has invalid branch mapping {mapping}")
+            branch_map[ims_branch.strip()] = git_branch.strip()
+        targets.append(Target(name, section["git_repo"], get_list(section, "branches"),
+            branch_map, section.getboolean("push", fallback=False),
+            section.getint("push_every", fallback=0),
+            section.getfloat("push_interval", fallback=0),
+            get_file(section, "filter_file", file_name)))
+    return targets
+
+###################################################################################################
+
+def get_list(section: configparser.SectionProxy, key: str) -> "list[str]":
+    ''' reports the comma separated entries of a value '''
+    return [entry.strip() for entry in section.get(key, "").split(",") if entry.strip()]
+
+def get_file(section: configparser.SectionProxy, key: str, file_name: str) -> str:
+    ''' reports a file named by a value relative to the given file, None if not set '''
+    value = section.get(key)
+    if not value:
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(file_name)), value)
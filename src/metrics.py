@@ -0,0 +1,139 @@
+''' Timing instrumentation of the synchronization stages '''
+
+###################################################################################################
+# imports
+
+import json
+import time
+import threading
+import contextlib
+
+###################################################################################################
+
+class Span:
+    ''' one execution of a stage '''
+
+    def __init__(self, stage: str, branch: str, checkpoint: str):
+        self.stage = stage
+        self.branch = branch
+        self.checkpoint = checkpoint
+        self.start = time.time()
+        self.duration = 0.0
+        self.files = 0
+        self.bytes = 0
+
+    def add(self, files: int = 0, size: int = 0):
+        ''' counts files and bytes touched by the stage '''
+        self.files += files
+        self.bytes += size
+
+    def to_dict(self) -> dict:
+        ''' reports the span as dictionary '''
+        return {"stage": self.stage, "branch": self.branch, "checkpoint": self.checkpoint,
+            "start": self.start, "duration": round(self.duration, 6), "files": self.files,
+            "bytes": self.bytes}
+
+###################################################################################################
+
+class Metrics:
+    ''' collects the spans of a run. Branch and checkpoint of a span default to the context
+        set by the calling thread. '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = []
+        self.started = time.time()
+        self.local = threading.local()
+
+    @contextlib.contextmanager
+    def context(self, branch: str = None, checkpoint: str = None):
+        ''' sets branch and checkpoint for the spans of the current thread '''
+        previous = getattr(self.local, "context", (None, None))
+        self.local.context = (branch or previous[0], checkpoint or previous[1])
+        try:
+            yield
+        finally:
+            self.local.context = previous
+
+    @contextlib.contextmanager
+    def span(self, stage: str, branch: str = None, checkpoint: str = None):
+        ''' measures the duration of the enclosed code as the given stage '''
+        context = getattr(self.local, "context", (None, None))
+        current = Span(stage, branch or context[0], checkpoint or context[1])
+        start = time.perf_counter()
+        try:
+            yield current
+        finally:
+            current.duration = time.perf_counter() - start
+            with self.lock:
+                self.spans.append(current)
+
+    def summary(self) -> dict:
+        ''' reports count, duration, files and bytes per stage '''
+        stages = {}
+        with self.lock:
+            spans = list(self.spans)
+        for current in spans:
+            stage = stages.setdefault(current.stage, {"count": 0, "seconds": 0.0,
+                "max_seconds": 0.0, "files": 0, "bytes": 0})
+            stage["count"] += 1
+            stage["seconds"] += current.duration
+            stage["max_seconds"] = max(stage["max_seconds"], current.duration)
+            stage["files"] += current.files
+            stage["bytes"] += current.bytes
+        for stage in stages.values():
+            stage["seconds"] = round(stage["seconds"], 6)
+            stage["max_seconds"] = round(stage["max_seconds"], 6)
+        return {"started": self.started, "seconds": round(time.time() - self.started, 6),
+            "stages": stages}
+
+    def write_json(self, file_name: str, with_spans: bool = True):
+        ''' writes the summary and optionally all spans as JSON '''
+        result = self.summary()
+        if with_spans:
+            with self.lock:
+                result["spans"] = [current.to_dict() for current in self.spans]
+        with open(file_name, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+
+    def write_prometheus(self, file_name: str):
+        ''' writes the summary in the Prometheus text exposition format '''
+        summary = self.summary()
+        lines = ["# HELP gtm_synch_run_seconds Duration of the synchronization run.",
+            "# TYPE gtm_synch_run_seconds gauge",
+            f"gtm_synch_run_seconds {summary['seconds']}"]
+        for name, unit, key in (("stage_seconds_total", "seconds", "seconds"),
+            ("stage_count_total", "executions", "count"),
+            ("stage_files_total", "files", "files"),
+            ("stage_bytes_total", "bytes", "bytes")):
+            lines.append(f"# HELP gtm_synch_{name} Sum of {unit} per stage.")
+            lines.append(f"# TYPE gtm_synch_{name} counter")
+            for stage, values in sorted(summary["stages"].items()):
+                lines.append(f'gtm_synch_{name}{{stage="{stage}"}} {values[key]}')
+        with open(file_name, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+    def write(self, file_name: str, file_format: str = "json"):
+        ''' writes the metrics in the given format: json or prometheus '''
+        if file_format == "prometheus":
+            self.write_prometheus(file_name)
+        else:
+            self.write_json(file_name)
+
+###################################################################################################
+# metrics of the current run
+
+METRICS = Metrics()
+
+def span(stage: str, branch: str = None, checkpoint: str = None):
+    ''' measures a stage of the current run. See Metrics.span '''
+    return METRICS.span(stage, branch, checkpoint)
+
+def context(branch: str = None, checkpoint: str = None):
+    ''' sets branch and checkpoint of the current thread. See Metrics.context '''
+    return METRICS.context(branch, checkpoint)
+
+def reset():
+    ''' starts a new run '''
+    global METRICS
+    METRICS = Metrics()
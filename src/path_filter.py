@@ -0,0 +1,124 @@
+''' gitignore-style filter of the paths synched from IMS to git '''
+
+###################################################################################################
+# imports
+
+import re
+
+###################################################################################################
+
+class Pattern:
+    ''' one line of a filter spec '''
+
+    def __init__(self, line: str):
+        self.negated = line.startswith("!")
+        if self.negated:
+            line = line[1:]
+        self.dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        # a slash at the start or in the middle binds the pattern to the top directory
+        anchored = "/" in line
+        line = line.lstrip("/")
+        self.regex = re.compile(("" if anchored else "(?:.*/)?") + translate(line) + "$")
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        ''' reports whether the pattern matches the path relative to the top directory '''
+        return (is_dir or not self.dir_only) and self.regex.match(rel_path) is not None
+
+###################################################################################################
+
+def translate(pattern: str) -> str:
+    ''' translates a gitignore glob into a regular expression '''
+    regex = ""
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            regex += "(?:.*/)?"
+            index += 3
+            continue
+        if pattern.startswith("**", index):
+            regex += ".*"
+            index += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = find_class_end(pattern, index)
+            if end < 0:
+                regex += re.escape(char)
+            else:
+                regex += translate_class(pattern[index + 1:end])
+                index = end
+        elif char == "\\" and index + 1 < len(pattern):
+            index += 1
+            regex += re.escape(pattern[index])
+        else:
+            regex += re.escape(char)
+        index += 1
+    return regex
+
+###################################################################################################
+
+def find_class_end(pattern: str, start: int) -> int:
+    ''' reports the index of the "]" closing the character class which opens at start, -1 if
+        it is not closed. A "]" right after "[" or "[!" is part of the class. '''
+    index = start + 1
+    if pattern.startswith("!", index):
+        index += 1
+    if pattern.startswith("]", index):
+        index += 1
+    return pattern.find("]", index)
+
+###################################################################################################
+
+def translate_class(content: str) -> str:
+    ''' translates the content of a glob character class into a regular expression class.
+        Only a leading ! negates the class. Characters special in a regular expression class
+        are escaped. '''
+    negated = content.startswith("!")
+    if negated:
+        content = content[1:]
+    for char in "\\^[]":
+        content = content.replace(char, "\\" + char)
+    # like the other wildcards a negated class does not match a "/"
+    return "[" + ("^/" if negated else "") + content + "]"
+
+###################################################################################################
+
+class PathFilter:
+    ''' decides which paths of a checkpoint are synched. The patterns follow the gitignore
+        rules: a matching pattern excludes the path, a pattern starting with ! includes it
+        again and the last matching pattern wins. Everything below an excluded directory is
+        excluded. Paths are relative to the top directory and use "/" as separator. '''
+
+    def __init__(self, lines: "list[str]"):
+        self.patterns = []
+        for line in lines:
+            line = line.rstrip("\r\n")
+            if line.strip() and not line.startswith("#"):
+                self.patterns.append(Pattern(line.rstrip()))
+
+    @classmethod
+    def from_file(cls, file_name: str) -> "PathFilter":
+        ''' reads the filter spec of a file '''
+        with open(file_name, encoding="utf-8") as file:
+            return cls(file.readlines())
+
+    def is_excluded_entry(self, rel_path: str, is_dir: bool) -> bool:
+        ''' reports whether the patterns exclude the path itself, its parents aside '''
+        excluded = False
+        for pattern in self.patterns:
+            if pattern.matches(rel_path, is_dir):
+                excluded = not pattern.negated
+        return excluded
+
+    def is_excluded(self, rel_path: str, is_dir: bool = False) -> bool:
+        ''' reports whether the path or one of its parent directories is excluded '''
+        parts = rel_path.split("/")
+        for index in range(1, len(parts)):
+            if self.is_excluded_entry("/".join(parts[:index]), True):
+                return True
+        return self.is_excluded_entry(rel_path, is_dir)
@@ -0,0 +1,62 @@
+''' Overlaps the IMS checkout of upcoming checkpoints with the git commit of the current one '''
+
+###################################################################################################
+# imports
+
+import queue
+import logging
+import threading
+import concurrent.futures
+
+import ims_synch
+
+###################################################################################################
+
+def synch_checkpoints_pipelined(checkpoints: "list[ims_synch.Checkpoint]",
+    sandboxes: "list[ims_synch.Sandbox]", commit_checkpoint):
+    ''' brings the checkpoints into the given pool of sandboxes in the background and calls
+        commit_checkpoint(checkpoint, sandbox) for each of them in strict checkpoint order.
+        While checkpoint N is committed, checkpoints N+1..N+k are checked out, k being the
+        number of sandboxes minus one. A sandbox is reused once its checkpoint is committed. '''
+
+    logger = logging.getLogger(__name__)
+
+    free_sandboxes = queue.Queue()
+    for sandbox in sandboxes:
+        free_sandboxes.put(sandbox)
+    # (checkpoint, future of the checkout) in checkpoint order
+    pending = queue.Queue()
+    stop = threading.Event()
+
+    def checkout(checkpoint: ims_synch.Checkpoint, sandbox: ims_synch.Sandbox):
+        logger.info("Prefetch checkpoint %s into %s", checkpoint.number, sandbox.sandbox_dir)
+        sandbox.update_to(checkpoint.number)
+        return sandbox
+
+    def dispatch(executor: concurrent.futures.ThreadPoolExecutor):
+        for checkpoint in checkpoints:
+            sandbox = free_sandboxes.get()
+            if stop.is_set():
+                break
+            pending.put((checkpoint, executor.submit(checkout, checkpoint, sandbox)))
+        pending.put(None)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(sandboxes),
+        thread_name_prefix="checkout") as executor:
+        dispatcher = threading.Thread(target=dispatch, args=(executor,), daemon=True)
+        dispatcher.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    break
+                checkpoint, future = item
+                sandbox = future.result()
+                commit_checkpoint(checkpoint, sandbox)
+                sandbox.release()
+                free_sandboxes.put(sandbox)
+        finally:
+            # wake up the dispatcher in case it waits for a free sandbox
+            stop.set()
+            free_sandboxes.put(None)
+            dispatcher.join()
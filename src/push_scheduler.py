@@ -0,0 +1,52 @@
+''' Collects commits and pushes the touched branches in batches '''
+
+###################################################################################################
+# imports
+
+import time
+import logging
+import threading
+
+###################################################################################################
+
+class PushScheduler:
+    ''' pushes the branches which got new commits every every_commits commits or after
+        every_seconds seconds, whatever comes first, and once more with flush. 0 disables the
+        limit. push(branches) has to push all given branches atomically, so a failing run never
+        leaves the remote with some branches updated and others not. '''
+
+    def __init__(self, push, every_commits: int = 0, every_seconds: float = 0):
+        self.push = push
+        self.every_commits = every_commits
+        self.every_seconds = every_seconds
+        self.lock = threading.Lock()
+        self.touched = []
+        self.commits = 0
+        self.last_push = time.monotonic()
+
+    def committed(self, branch: str):
+        ''' records a new commit of a branch and pushes if a limit is reached '''
+        with self.lock:
+            if branch not in self.touched:
+                self.touched.append(branch)
+            self.commits += 1
+            if (self.every_commits and self.commits >= self.every_commits) or \
+                (self.every_seconds and time.monotonic() - self.last_push >= self.every_seconds):
+                self.push_touched()
+
+    def flush(self) -> "list[str]":
+        ''' pushes all branches which got commits since the last push and reports them '''
+        with self.lock:
+            return self.push_touched()
+
+    def push_touched(self) -> "list[str]":
+        ''' pushes the touched branches. Call with the lock held. '''
+        branches = self.touched
+        if branches:
+            logging.getLogger(__name__).info("Push %s commits of branches %s", self.commits,
+                branches)
+            self.push(branches)
+        self.touched = []
+        self.commits = 0
+        self.last_push = time.monotonic()
+        return branches
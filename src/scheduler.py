@@ -0,0 +1,111 @@
+''' Schedules the synchronization of IMS branches respecting the branch dependencies '''
+
+###################################################################################################
+# imports
+
+import logging
+import concurrent.futures
+
+import ims_synch
+
+###################################################################################################
+
+def get_parent_name(branch: ims_synch.Branch, branch_names: "Container[str]") -> str:
+    ''' reports the branch which has to be synched before the given branch.
+        Branches with an unknown source are synched after main. '''
+
+    if branch.name == "main":
+        return None
+    if branch.source_dev_path_name in branch_names:
+        return branch.source_dev_path_name
+    return "main" if "main" in branch_names else None
+
+###################################################################################################
+
+class BranchTree:
+    ''' index of the IMS branch tree. Every branch hangs below the branch it is created from,
+        see get_parent_name. Building the index is linear in the number of branches. '''
+
+    def __init__(self, branches: "list[ims_synch.Branch]"):
+        self.branches = {branch.name: branch for branch in branches}
+        self.roots = []
+        self.children = {}
+        for branch in branches:
+            parent_name = get_parent_name(branch, self.branches)
+            if parent_name is None:
+                self.roots.append(branch)
+            else:
+                self.children.setdefault(parent_name, []).append(branch)
+
+    def get_children(self, branch_name: str) -> "list[ims_synch.Branch]":
+        ''' reports the branches created from the given branch '''
+        return self.children.get(branch_name, [])
+
+    def topological_order(self) -> "list[ims_synch.Branch]":
+        ''' reports all branches, every branch after the branch it is created from '''
+        order = list(self.roots)
+        for branch in order:
+            order.extend(self.get_children(branch.name))
+        return order
+
+    def subtrees(self) -> "list[list[ims_synch.Branch]]":
+        ''' reports the subtrees below main (or the other roots) in topological order.
+            Different subtrees do not depend on each other and can be synched concurrently
+            once their roots are. '''
+        subtrees = []
+        for root in self.roots:
+            for child in self.get_children(root.name):
+                subtree = [child]
+                for branch in subtree:
+                    subtree.extend(self.get_children(branch.name))
+                subtrees.append(subtree)
+        return subtrees
+
+###################################################################################################
+
+def select_branches(branches: "list[ims_synch.Branch]",
+    names: "list[str]") -> "list[ims_synch.Branch]":
+    ''' reports the named branches and the branches they are created from in topological order.
+        No names select all branches. '''
+
+    tree = BranchTree(branches)
+    if not names:
+        return tree.topological_order()
+    selected = set()
+    for name in names:
+        while name is not None and name not in selected and name in tree.branches:
+            selected.add(name)
+            name = get_parent_name(tree.branches[name], tree.branches)
+    return [branch for branch in tree.topological_order() if branch.name in selected]
+
+###################################################################################################
+
+def synch_branches_parallel(branches: "list[ims_synch.Branch]", synch_branch, workers: int):
+    ''' calls synch_branch(branch) for all branches with up to workers branches in parallel.
+        A branch is only started once its parent branch is completely synched, because it is
+        created from a commit of the parent. Descendants of a failed branch are skipped and the
+        first error is raised after all other branches are done. '''
+
+    logger = logging.getLogger(__name__)
+
+    tree = BranchTree(branches)
+    errors = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+        thread_name_prefix="branch") as executor:
+        running = {executor.submit(synch_branch, branch): branch for branch in tree.roots}
+        while running:
+            done, _ = concurrent.futures.wait(running,
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                branch = running.pop(future)
+                if future.exception() is not None:
+                    logger.error("Synch of branch %s failed: %s", branch.name,
+                        future.exception())
+                    errors.append(future.exception())
+                    continue
+                logger.info("Synch of branch %s done", branch.name)
+                for child in tree.get_children(branch.name):
+                    running[executor.submit(synch_branch, child)] = child
+
+    if errors:
+        raise errors[0]
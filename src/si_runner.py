@@ -0,0 +1,238 @@
+''' Executes si commands with a concurrency limit, timeouts and retries '''
+
+###################################################################################################
+# imports
+
+import os
+import shlex
+import asyncio
+import logging
+import threading
+
+###################################################################################################
+# constants
+
+def get_si_command() -> "list[str]":
+    ''' reports the command starting the IMS command line client, GTM_SI_COMMAND if set '''
+    return shlex.split(os.environ.get("GTM_SI_COMMAND", "si"))
+
+# command used to start the IMS command line client. Can be replaced e.g. by a test double.
+SI_COMMAND = get_si_command()
+
+# stderr fragments of errors which are worth a retry
+TRANSIENT_ERRORS = ("connection", "timed out", "timeout", "temporarily", "unavailable",
+    "try again", "socket", "server is busy")
+
+# number of stdout lines handed over at once to a thread reading a stream
+STREAM_BATCH_SIZE = 256
+
+###################################################################################################
+
+class SiCommandError(Exception):
+    ''' raised when an si command reports a failure '''
+
+    def __init__(self, cmd: str, returncode: int, stderr: str):
+        super().__init__(f"si command failed ({returncode}): {cmd}\n{stderr}")
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stderr = stderr
+
+    def is_transient(self) -> bool:
+        ''' reports if the error is probably gone when the command is repeated '''
+        stderr = self.stderr.lower()
+        return any(fragment in stderr for fragment in TRANSIENT_ERRORS)
+
+###################################################################################################
+
+class SiRunner:
+    ''' runs si commands on an asyncio event loop in a background thread.
+        At most max_concurrency commands run at the same time to protect the IMS server.
+        A command taking longer than timeout seconds is killed. Failed commands with a
+        transient error are repeated up to retries times with an exponential backoff. '''
+
+    def __init__(self, max_concurrency: int = 4, timeout: float = 3600, retries: int = 3,
+        backoff: float = 2.0):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="si_runner",
+            daemon=True)
+        self.thread.start()
+        self.semaphore = self.call(create(asyncio.Semaphore, max_concurrency))
+
+    def call(self, coroutine):
+        ''' runs a coroutine on the event loop and waits for its result '''
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def close(self):
+        ''' stops the event loop '''
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    ###############################################################################################
+
+    def run(self, args: "list[str]", encoding: str = "utf-8", timeout: float = None) -> str:
+        ''' runs an si command and reports its stdout, as bytes if encoding is None.
+            Raises SiCommandError on failure. '''
+        return self.call(self.run_async(args, encoding, timeout))
+
+    async def run_async(self, args: "list[str]", encoding: str = "utf-8",
+        timeout: float = None) -> str:
+        ''' runs an si command and reports its stdout. Raises SiCommandError on failure. '''
+
+        logger = logging.getLogger(__name__)
+        cmd = shlex.join(SI_COMMAND + args)
+        timeout = timeout if timeout is not None else self.timeout
+
+        for attempt in range(self.retries + 1):
+            async with self.semaphore:
+                process = await asyncio.create_subprocess_exec(*SI_COMMAND, *args,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+                try:
+                    stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+                    error = SiCommandError(cmd, process.returncode,
+                        stderr.decode(encoding or "utf-8", errors="replace"))
+                except asyncio.TimeoutError:
+                    await kill(process)
+                    error = SiCommandError(cmd, None, f"timed out after {timeout} s")
+
+            if process.returncode == 0:
+                return stdout.decode(encoding) if encoding else stdout
+            if not error.is_transient() or attempt == self.retries:
+                raise error
+            delay = self.backoff * 2 ** attempt
+            logger.warning("%s Retry in %s s", error, delay)
+            await asyncio.sleep(delay)
+        raise error
+
+    ###############################################################################################
+
+    def stream(self, args: "list[str]", encoding: str = "utf-8", timeout: float = None):
+        ''' runs an si command and yields its stdout line by line while it is running.
+            Closing the generator early kills the command. timeout is applied per line.
+            A failing command is only retried as long as no line has been yielded. '''
+
+        lines = self.call(create(asyncio.Queue, STREAM_BATCH_SIZE * 4))
+        task = self.call(create(asyncio.ensure_future,
+            self.stream_async(args, lines, encoding, timeout)))
+        try:
+            while True:
+                batch = self.call(get_batch(lines))
+                for line in batch:
+                    if line is None:
+                        # raises the error of a failed command
+                        self.call(wait_for_task(task))
+                        return
+                    yield line
+        finally:
+            self.call(cancel_task(task))
+
+    async def stream_async(self, args: "list[str]", lines: asyncio.Queue, encoding: str,
+        timeout: float):
+        ''' puts the stdout lines of an si command into the queue followed by None '''
+
+        logger = logging.getLogger(__name__)
+        cmd = shlex.join(SI_COMMAND + args)
+        timeout = timeout if timeout is not None else self.timeout
+
+        try:
+            for attempt in range(self.retries + 1):
+                line_count = 0
+                async with self.semaphore:
+                    process = await asyncio.create_subprocess_exec(*SI_COMMAND, *args,
+                        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+                    stderr_task = asyncio.ensure_future(process.stderr.read())
+                    try:
+                        while True:
+                            line = await asyncio.wait_for(process.stdout.readline(), timeout)
+                            if not line:
+                                break
+                            line_count += 1
+                            await lines.put(line.decode(encoding))
+                        await asyncio.wait_for(process.wait(), timeout)
+                        error = SiCommandError(cmd, process.returncode,
+                            (await stderr_task).decode(encoding, errors="replace"))
+                    except asyncio.TimeoutError:
+                        error = SiCommandError(cmd, None, f"timed out after {timeout} s")
+                    finally:
+                        await kill(process)
+                        stderr_task.cancel()
+
+                if process.returncode == 0:
+                    break
+                if not error.is_transient() or attempt == self.retries or line_count > 0:
+                    raise error
+                delay = self.backoff * 2 ** attempt
+                logger.warning("%s Retry in %s s", error, delay)
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # the reader is gone
+            raise
+        except Exception:
+            await lines.put(None)
+            raise
+        await lines.put(None)
+
+###################################################################################################
+
+async def create(factory, *args):
+    ''' creates an asyncio object within the event loop it is used in '''
+    return factory(*args)
+
+async def wait_for_task(task: asyncio.Task):
+    ''' waits for a task and reports its result '''
+    return await task
+
+async def cancel_task(task: asyncio.Task):
+    ''' cancels a task if still running and waits until it is finished '''
+    if not task.done():
+        task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+async def get_batch(lines: asyncio.Queue) -> "list[str]":
+    ''' waits for the next line and takes all further lines which are already available '''
+    batch = [await lines.get()]
+    while batch[-1] is not None and len(batch) < STREAM_BATCH_SIZE and not lines.empty():
+        batch.append(lines.get_nowait())
+    return batch
+
+async def kill(process: asyncio.subprocess.Process):
+    ''' kills a still running process and waits for it '''
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+###################################################################################################
+# shared runner used by all IMS calls
+
+RUNNER = None
+RUNNER_LOCK = threading.Lock()
+
+def configure(max_concurrency: int = 4, timeout: float = 3600, retries: int = 3):
+    ''' replaces the shared runner by one with the given limits '''
+    global RUNNER
+    with RUNNER_LOCK:
+        if RUNNER is not None:
+            RUNNER.close()
+        RUNNER = SiRunner(max_concurrency, timeout, retries)
+
+def get_runner() -> SiRunner:
+    ''' reports the shared runner and creates it with default limits if needed '''
+    global RUNNER
+    with RUNNER_LOCK:
+        if RUNNER is None:
+            RUNNER = SiRunner()
+        return RUNNER
+
+def run(args: "list[str]", encoding: str = "utf-8", timeout: float = None) -> str:
+    ''' runs an si command with the shared runner. See SiRunner.run '''
+    return get_runner().run(args, encoding, timeout)
+
+def stream(args: "list[str]", encoding: str = "utf-8", timeout: float = None):
+    ''' streams an si command with the shared runner. See SiRunner.stream '''
+    return get_runner().stream(args, encoding, timeout)
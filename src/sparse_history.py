@@ -0,0 +1,112 @@
+''' Sparse import of long IMS histories. Only selected checkpoints are imported at first, so the
+    git repository is usable quickly. The checkpoints in between are imported later and grafted
+    below the imported commits with git replace, which leaves these commits and the branch tips
+    unchanged. '''
+
+###################################################################################################
+# imports
+
+import logging
+
+from git import Repo
+
+import ims_synch
+
+###################################################################################################
+# constants
+
+# temporary refs of the backfilled lines of history while they are imported
+BACKFILL_REFS = "refs/ims-backfill"
+
+###################################################################################################
+
+class Selection:
+    ''' checkpoints imported by a sparse import: every Nth checkpoint, the last N checkpoints
+        and the labelled ones. The newest checkpoint of a branch and the checkpoints other
+        branches start from are always imported. '''
+
+    def __init__(self, every: int = 0, last: int = 0, labelled: bool = False):
+        self.every = every
+        self.last = last
+        self.labelled = labelled
+
+    def is_sparse(self) -> bool:
+        ''' reports whether any checkpoints are left out '''
+        return self.every > 1 or self.last > 0 or self.labelled
+
+    def select(self, checkpoints: "list[ims_synch.Checkpoint]",
+        labelled_numbers: "set[str]" = (),
+        keep: "set[str]" = ()) -> "list[ims_synch.Checkpoint]":
+        ''' reports the checkpoints to import from the checkpoints of a branch, oldest first.
+            keep are the numbers of checkpoints which have to be imported. '''
+
+        selected = []
+        for index, checkpoint in enumerate(checkpoints):
+            if index == len(checkpoints) - 1 \
+                or checkpoint.number in keep \
+                or (self.every > 1 and index % self.every == 0) \
+                or (self.last > 0 and index >= len(checkpoints) - self.last) \
+                or (self.labelled and checkpoint.number in labelled_numbers):
+                selected.append(checkpoint)
+        return selected
+
+###################################################################################################
+
+class Gap:
+    ''' checkpoints missing between two commits of a sparse import. Their commits continue the
+        parent commit and the child commit is grafted on top of them. '''
+
+    def __init__(self, branch: str, checkpoints: "list[ims_synch.Checkpoint]", parent: str,
+        child: str, child_checkpoint: str):
+        self.branch = branch
+        self.checkpoints = checkpoints
+        # None if the gap is at the start of the main branch
+        self.parent = parent
+        self.child = child
+        # the line of history is imported to a ref of its own
+        self.ref = f"{BACKFILL_REFS}/{branch}/{child_checkpoint}"
+
+###################################################################################################
+
+def get_branch_points(branches: "list[ims_synch.Branch]") -> "dict[str, set[str]]":
+    ''' reports per branch the numbers of the checkpoints other branches start from '''
+    branch_points = {}
+    for branch in branches:
+        if branch.source_dev_path_name:
+            branch_points.setdefault(branch.source_dev_path_name, set()).add(
+                branch.base_checkpoint)
+    return branch_points
+
+###################################################################################################
+
+def find_gaps(branch: str, checkpoints: "list[ims_synch.Checkpoint]",
+    commits: "dict[str, str]", base_commit: str = None) -> "list[Gap]":
+    ''' reports the gaps of a branch. checkpoints are all checkpoints of the branch, oldest
+        first, and commits the commits of the imported ones by checkpoint number. base_commit
+        is the commit the branch starts from. Checkpoints after the newest imported one are no
+        gap, they are synched the normal way. '''
+
+    gaps = []
+    parent = base_commit
+    missing = []
+    for checkpoint in checkpoints:
+        commit = commits.get(checkpoint.number)
+        if commit is None:
+            missing.append(checkpoint)
+            continue
+        if missing:
+            gaps.append(Gap(branch, missing, parent, commit, checkpoint.number))
+            missing = []
+        parent = commit
+    return gaps
+
+###################################################################################################
+
+def graft(repo: Repo, gap: Gap, last_commit: str):
+    ''' makes the last commit imported for a gap the parent of the commit after the gap and
+        removes the temporary ref of the gap '''
+
+    logger = logging.getLogger(__name__)
+    logger.info("Graft %s onto %s", gap.child, last_commit)
+    repo.git.replace("--force", "--graft", gap.child, last_commit)
+    repo.git.update_ref("-d", gap.ref)
@@ -0,0 +1,143 @@
+''' Deletes directories in the background.
+
+    A directory or file to delete is renamed into the trash directory next to it, which is a
+    single rename on the same file system, and a background thread deletes the content of the
+    trash at low priority. Trash left behind by a terminated run is deleted by reclaim. '''
+
+###################################################################################################
+# imports
+
+import os
+import sys
+import stat
+import uuid
+import queue
+import atexit
+import shutil
+import logging
+import threading
+
+###################################################################################################
+# constants
+
+TRASH_DIR_NAME = ".gtm_trash"
+
+# niceness of the deleting thread. Only used on Linux, where it applies to the thread only and
+# also lowers its I/O priority. Elsewhere it would lower the priority of the whole process.
+WORKER_NICENESS = 10
+
+###################################################################################################
+
+class Trash:
+    ''' moves entries into the trash and deletes them with one background thread '''
+
+    def __init__(self):
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = None
+
+    def discard(self, path: str, trash_dir: str = None):
+        ''' moves a file or directory into the trash next to it or into the given trash
+            directory. If that is not possible it is deleted right away. '''
+        path = os.path.abspath(path.rstrip("/\\"))
+        if trash_dir is None:
+            trash_dir = get_trash_dir(path)
+        trash_path = os.path.join(trash_dir, uuid.uuid4().hex)
+        try:
+            os.makedirs(trash_dir, exist_ok=True)
+            os.rename(path, trash_path)
+        except OSError as error:
+            logging.getLogger(__name__).info("%s deleted in place: %s", path, error)
+            remove(path)
+            return
+        self.schedule(trash_path)
+
+    def empty_dir(self, directory: str, keep: "tuple[str]" = ()):
+        ''' moves everything in the directory into the trash next to the directory except the
+            entries named in keep '''
+        trash_dir = get_trash_dir(directory)
+        with os.scandir(directory) as entries:
+            paths = [entry.path for entry in entries if entry.name not in keep]
+        for path in paths:
+            self.discard(path, trash_dir)
+
+    def reclaim(self, directory: str):
+        ''' deletes the trash a terminated run left next to the given directory and the trash
+            of the entries discarded within it '''
+        for trash_dir in (get_trash_dir(directory), os.path.join(directory, TRASH_DIR_NAME)):
+            if os.path.isdir(trash_dir):
+                with os.scandir(trash_dir) as entries:
+                    for entry in entries:
+                        self.schedule(entry.path)
+
+    def schedule(self, trash_path: str):
+        ''' hands an entry of the trash to the background thread '''
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.run, name="trash", daemon=True)
+                self.worker.start()
+        self.pending.put(trash_path)
+
+    def run(self):
+        ''' deletes the scheduled entries one after the other '''
+        if sys.platform.startswith("linux"):
+            os.nice(WORKER_NICENESS)
+        while True:
+            trash_path = self.pending.get()
+            try:
+                remove(trash_path)
+            except OSError as error:
+                logging.getLogger(__name__).warning("Trash %s not deleted: %s", trash_path,
+                    error)
+            finally:
+                self.pending.task_done()
+
+    def wait(self):
+        ''' waits until everything in the trash is deleted '''
+        self.pending.join()
+
+###################################################################################################
+
+def get_trash_dir(path: str) -> str:
+    ''' reports the trash directory next to a file or directory '''
+    return os.path.join(os.path.dirname(os.path.abspath(path.rstrip("/\\"))), TRASH_DIR_NAME)
+
+###################################################################################################
+
+def remove(path: str):
+    ''' deletes a file or directory, write protected files included '''
+
+    def retry_writable(function, failed_path: str, _):
+        if not os.path.lexists(failed_path):
+            return
+        os.chmod(failed_path, stat.S_IWRITE | stat.S_IREAD | stat.S_IEXEC)
+        function(failed_path)
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, onerror=retry_writable)
+    elif os.path.lexists(path):
+        retry_writable(os.unlink, path, None)
+
+###################################################################################################
+# trash of the current process
+
+TRASH = Trash()
+
+# deleting continues until the trash is empty when the run is done
+atexit.register(TRASH.wait)
+
+def discard(path: str):
+    ''' moves a file or directory into the trash. See Trash.discard '''
+    TRASH.discard(path)
+
+def empty_dir(directory: str, keep: "tuple[str]" = ()):
+    ''' moves the content of a directory into the trash. See Trash.empty_dir '''
+    TRASH.empty_dir(directory, keep)
+
+def reclaim(directory: str):
+    ''' deletes the trash left next to a directory. See Trash.reclaim '''
+    TRASH.reclaim(directory)
+
+def wait():
+    ''' waits until the trash is deleted. See Trash.wait '''
+    TRASH.wait()
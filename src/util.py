@@ -1,11 +1,12 @@
 ''' some functions in here '''
 
 import os
-import shutil
 import stat
 import logging
 from datetime import datetime
 
+import trash
+
 ###################################################################################################
 
 def del_rw(action, name, exc):
@@ -15,15 +16,10 @@ def del_rw(action, name, exc):
 
 ###################################################################################################
 
-def delete_dir(directory: str):
-    '''  Remove everything in dir '''
-
-    sub_dirs = os.scandir(directory)
-    for sub_dir in sub_dirs:
-        if sub_dir.is_dir():
-            shutil.rmtree(sub_dir.path, onerror=del_rw)
-        elif sub_dir.is_file() or sub_dir.is_symlink():
-            os.unlink(sub_dir.path)
+def delete_dir(directory: str, keep: "tuple[str]" = ()):
+    '''  Remove everything in dir except the entries named in keep.
+        The content is moved into the trash and deleted in the background. '''
+    trash.empty_dir(directory, keep)
 
 ###################################################################################################
 
@@ -45,6 +41,10 @@ def setup_logger():
 def setup_temporary_working_folders(source_dir: str, target_dir: str):
     ''' set ups temporary working folder to checkout code or commit code to the repositories'''
 
+    # trash of an earlier run which was terminated before it was deleted
+    trash.reclaim(source_dir)
+    trash.reclaim(target_dir)
+
     # create temporary source working directory
     if not os.path.exists(source_dir):
         os.makedirs(source_dir)
@@ -0,0 +1,55 @@
+''' unit tests of the directory synchronization '''
+import os
+import dir_synch
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text)
+
+def test_synch_tree_reports_and_applies_changes(tmp_path):
+    src = str(tmp_path / "src")
+    dst = str(tmp_path / "dst")
+    write(os.path.join(src, "same.txt"), "same")
+    write(os.path.join(src, "sub", "changed.txt"), "new")
+    write(os.path.join(src, "sub", "added.txt"), "added")
+    write(os.path.join(dst, "same.txt"), "same")
+    write(os.path.join(dst, "sub", "changed.txt"), "old")
+    write(os.path.join(dst, "gone", "deleted.txt"), "deleted")
+    write(os.path.join(dst, ".git", "HEAD"), "ref")
+
+    changes = dir_synch.synch_tree(src, dst)
+
+    assert changes.added == ["sub/added.txt"]
+    assert changes.modified == ["sub/changed.txt"]
+    assert changes.deleted == ["gone/deleted.txt"]
+    assert not os.path.exists(os.path.join(dst, "gone"))
+    assert os.path.exists(os.path.join(dst, ".git", "HEAD"))
+    assert dir_synch.synch_tree(src, dst).is_empty()
+
+def test_copier_falls_back_to_supported_method(tmp_path):
+    src = str(tmp_path / "src")
+    for index in range(10):
+        write(os.path.join(src, "sub", f"file_{index}.txt"), f"content {index}")
+    for mode in dir_synch.COPY_MODES:
+        dst = str(tmp_path / mode)
+        copier = dir_synch.Copier(mode, workers=3)
+        assert dir_synch.copy_tree(src, dst, copier=copier)[0] == 10
+        assert dir_synch.synch_tree(src, dst, copier=copier).is_empty()
+        assert copier.methods[-1] == "copy"
+
+def test_dangling_link_is_synched_as_link(tmp_path):
+    src = str(tmp_path / "src")
+    dst = str(tmp_path / "dst")
+    write(os.path.join(src, "file.txt"), "file")
+    os.symlink("missing.txt", os.path.join(src, "link"))
+    os.makedirs(dst)
+
+    assert sorted(dir_synch.synch_tree(src, dst).added) == ["file.txt", "link"]
+    assert os.readlink(os.path.join(dst, "link")) == "missing.txt"
+    assert dir_synch.synch_tree(src, dst).is_empty()
+
+    os.remove(os.path.join(src, "link"))
+    os.symlink("file.txt", os.path.join(src, "link"))
+    assert dir_synch.synch_tree(src, dst).modified == ["link"]
+    assert os.readlink(os.path.join(dst, "link")) == "file.txt"
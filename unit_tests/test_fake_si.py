@@ -0,0 +1,98 @@
+''' tests of the IMS side against the fake si of the benchmark suite '''
+import os
+import sys
+import json
+import shutil
+import subprocess
+from git import Repo
+import ims_synch
+import dir_synch
+import git_synch
+import si_runner
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench")
+
+def generate_project(tmp_path, monkeypatch) -> str:
+    project_file = str(tmp_path / "project.json")
+    subprocess.run([sys.executable, os.path.join(BENCH_DIR, "generate_project.py"), project_file,
+        "--checkpoints", "5", "--members", "20", "--dev-paths", "2",
+        "--dev-path-checkpoints", "3"], check=True)
+    monkeypatch.setattr(si_runner, "SI_COMMAND",
+        [sys.executable, os.path.join(BENCH_DIR, "fake_si.py")])
+    return project_file
+
+def test_history_and_checkout_against_fake_si(tmp_path, monkeypatch):
+    project_file = generate_project(tmp_path, monkeypatch)
+    with open(project_file, encoding="utf-8") as file:
+        project = json.load(file)
+
+    branches = ims_synch.get_branches_with_source(project_file)
+    assert [branch.name for branch in branches] == ["main", "dev_0", "dev_1"]
+
+    checkpoints = ims_synch.get_checkpoints_from(project_file, "main", "1.2")
+    assert [checkpoint.number for checkpoint in checkpoints] == ["1.3", "1.4", "1.5"]
+    assert checkpoints[0].description == project["checkpoints"]["main"][2]["description"]
+
+    sandbox = ims_synch.Sandbox(project_file, str(tmp_path / "sandbox"), persistent=True)
+    sandbox.update_to("1.1")
+    sandbox.update_to("1.5")
+    assert os.path.exists(sandbox.project_file)
+    sandbox.drop()
+    assert os.listdir(sandbox.sandbox_dir) == []
+
+def test_member_mirror_matches_sandbox(tmp_path, monkeypatch):
+    project_file = generate_project(tmp_path, monkeypatch)
+
+    sandbox = ims_synch.Sandbox(project_file, str(tmp_path / "sandbox"))
+    sandbox.update_to("1.5")
+    mirror = ims_synch.MemberMirror(project_file, str(tmp_path / "mirror"))
+    mirror.update_to("1.1")
+    assert mirror.changes is None
+    mirror.update_to("1.5")
+    assert not mirror.changes.is_empty()
+
+    expected = dir_synch.scan_tree(sandbox.sandbox_dir, exclude=(".git", "project.pj"))
+    assert sorted(dir_synch.scan_tree(mirror.sandbox_dir)) == sorted(expected)
+    for rel_path in expected:
+        with open(os.path.join(sandbox.sandbox_dir, rel_path), "rb") as file:
+            content = file.read()
+        with open(os.path.join(mirror.sandbox_dir, rel_path), "rb") as file:
+            assert file.read() == content
+
+def read_tree(directory: str) -> "dict[str, bytes]":
+    contents = {}
+    for rel_path in dir_synch.scan_tree(directory):
+        with open(os.path.join(directory, rel_path), "rb") as file:
+            contents[rel_path] = file.read()
+    return contents
+
+def test_seeded_member_mirror_only_fetches_changes(tmp_path, monkeypatch):
+    project_file = generate_project(tmp_path, monkeypatch)
+    fetched = []
+    fetch_members = ims_synch.fetch_members
+    monkeypatch.setattr(ims_synch, "fetch_members", lambda ims_project, members, target_dir,
+        workers: fetched.append(sorted(members)) or fetch_members(ims_project, members,
+        target_dir, workers))
+
+    mirror = ims_synch.MemberMirror(project_file, str(tmp_path / "mirror"))
+    mirror.update_to("1.3")
+    shutil.copytree(mirror.sandbox_dir, str(tmp_path / "git"))
+    missing = sorted(mirror.members)[0]
+    os.remove(tmp_path / "git" / missing)
+    repo = Repo.init(str(tmp_path / "git"))
+    repo.git.add(all=True)
+    repo.index.commit("cp\n\nIMS_CP: 1.3 IMS_Author: a")
+
+    seeded = ims_synch.MemberMirror(project_file, str(tmp_path / "seeded"), workers=2)
+    fetched.clear()
+    seeded.seed("1.3", lambda target_dir, rel_paths: git_synch.extract_files(repo, "HEAD",
+        target_dir, rel_paths))
+    # members missing in git are fetched
+    assert fetched == [[missing]]
+    assert read_tree(seeded.sandbox_dir) == read_tree(mirror.sandbox_dir)
+
+    fetched.clear()
+    seeded.update_to("1.5")
+    assert fetched == [sorted(seeded.changes.added + seeded.changes.modified)]
+    mirror.update_to("1.5")
+    assert read_tree(seeded.sandbox_dir) == read_tree(mirror.sandbox_dir)
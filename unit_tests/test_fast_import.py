@@ -0,0 +1,61 @@
+''' tests of the fast-import backend '''
+import os
+import sys
+from git import Repo
+import main
+import git_synch
+import fast_import
+from test_fake_si import BENCH_DIR, generate_project
+
+sys.path.insert(0, BENCH_DIR)
+import run_benchmark
+
+def get_history(repo: Repo, branch: str) -> list:
+    ''' reports tree, checkpoint and parent checkpoints of the commits of a branch '''
+    return [(commit.tree.hexsha, git_synch.get_ims_checkpoint(commit),
+        [git_synch.get_ims_checkpoint(parent) for parent in commit.parents])
+        for commit in repo.iter_commits(branch)]
+
+def test_fast_import_equals_git_add(tmp_path, monkeypatch):
+    project_file = generate_project(tmp_path, monkeypatch)
+    monkeypatch.chdir(tmp_path)
+    repos = {}
+    for name, fast_import_backend in [("add", False), ("fast_import", True)]:
+        remote_dir = str(tmp_path / f"{name}.git")
+        run_benchmark.create_remote(remote_dir)
+        run_benchmark.call_command(main.synch_ims_to_git, ims_repo=project_file,
+            git_repo_url=remote_dir, git_dir=str(tmp_path / f"{name}_git"),
+            ims_dir=str(tmp_path / f"{name}_ims"), fast_import_backend=fast_import_backend,
+            push=True, si_retries=0)
+        repos[name] = Repo(remote_dir)
+
+    for branch in ["main", "dev_0", "dev_1"]:
+        history = get_history(repos["add"], branch)
+        assert len(history) > 1
+        assert get_history(repos["fast_import"], branch) == history
+        assert git_synch.get_checkpoint_refs(repos["fast_import"], branch).keys() == \
+            git_synch.get_checkpoint_refs(repos["add"], branch).keys()
+
+def test_modes_follow_core_file_mode(tmp_path):
+    repo = Repo.init(str(tmp_path / "git"), initial_branch="main")
+    run_sh = tmp_path / "git" / "run.sh"
+    run_sh.write_text("#!/bin/sh")
+    os.chmod(run_sh, 0o755)
+    repo.git.add(all=True)
+    repo.index.commit("initial")
+    repo.git.config("core.fileMode", "false")
+
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    (src_dir / "run.sh").write_text("#!/bin/sh\nexit 0")
+    (src_dir / "new.sh").write_text("#!/bin/sh")
+    os.chmod(src_dir / "new.sh", 0o755)
+    importer = fast_import.FastImport(repo)
+    importer.commit("main", str(src_dir), "cp\n\nIMS_CP: 1.2 IMS_Author: a", "a", "1.2",
+        repo.head.commit.hexsha)
+    (src_dir / "run.sh").write_text("#!/bin/sh\nexit 1")
+    importer.commit("main", str(src_dir), "cp\n\nIMS_CP: 1.3 IMS_Author: a", "a", "1.3")
+    importer.close()
+
+    assert repo.git.ls_tree("main", "run.sh").startswith("100755")
+    assert repo.git.ls_tree("main", "new.sh").startswith("100644")
@@ -0,0 +1,80 @@
+''' unit tests of the git side '''
+import os
+from git import Repo
+import dir_synch
+import git_synch
+
+def test_staged_change_set_equals_full_add(tmp_path):
+    repo = Repo.init(str(tmp_path))
+    (tmp_path / "old.c").write_text("old")
+    (tmp_path / "kept.c").write_text("kept")
+    repo.git.add(all=True)
+    repo.index.commit("initial")
+
+    os.remove(tmp_path / "old.c")
+    (tmp_path / "kept.c").write_text("changed")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "new.sh").write_text("#!/bin/sh")
+    os.chmod(tmp_path / "sub" / "new.sh", 0o755)
+    git_synch.stage_changes(repo, dir_synch.ChangeSet(["sub/new.sh"], ["kept.c"], ["old.c"]))
+    staged_tree = repo.git.write_tree()
+
+    repo.git.add(all=True)
+    assert repo.git.write_tree() == staged_tree
+    assert "100755" in repo.git.ls_files("-s", "sub/new.sh")
+
+def test_staged_modes_follow_core_file_mode(tmp_path):
+    repo = Repo.init(str(tmp_path))
+    (tmp_path / "run.sh").write_text("#!/bin/sh")
+    os.chmod(tmp_path / "run.sh", 0o755)
+    repo.git.add(all=True)
+    repo.index.commit("initial")
+    repo.git.config("core.fileMode", "false")
+
+    # the executable bit of the file system is not trusted
+    (tmp_path / "run.sh").write_text("#!/bin/sh\nexit 0")
+    os.chmod(tmp_path / "run.sh", 0o644)
+    (tmp_path / "new.sh").write_text("#!/bin/sh")
+    os.chmod(tmp_path / "new.sh", 0o755)
+    git_synch.stage_changes(repo, dir_synch.ChangeSet(["new.sh"], ["run.sh"], []))
+    staged_tree = repo.git.write_tree()
+
+    repo.git.add(all=True)
+    assert repo.git.write_tree() == staged_tree
+    assert repo.git.ls_files("-s", "run.sh").startswith("100755")
+    assert repo.git.ls_files("-s", "new.sh").startswith("100644")
+
+def test_checkpoint_refs_find_last_synched_checkpoint(tmp_path):
+    repo = Repo.init(str(tmp_path), initial_branch="main")
+    for checkpoint_number in ["1.9", "1.10"]:
+        repo.index.commit(f"cp\n\nIMS_CP: {checkpoint_number} IMS_Author: a")
+    assert git_synch.get_last_synched_checkpoint(repo, "main") == "1.10"
+    assert git_synch.backfill_checkpoint_refs(repo, ["main"]) == 2
+    assert git_synch.get_newest_checkpoint_ref(repo, "main") == ("1.10",
+        repo.head.commit.hexsha)
+
+    # a checkpoint committed without ref is found after the newest ref
+    repo.index.commit("cp\n\nIMS_CP: 1.11 IMS_Author: a")
+    assert git_synch.get_last_synched_checkpoint(repo, "main") == "1.11"
+    assert git_synch.get_commit(repo, "main", "1.9").hexsha == \
+        git_synch.get_checkpoint_ref_commit(repo, "main", "1.9")
+
+def test_mirror_in_use_is_not_shared(tmp_path):
+    remote = Repo.init(str(tmp_path / "remote"), initial_branch="main")
+    (tmp_path / "remote" / "a.txt").write_text("a")
+    remote.git.add(all=True)
+    remote.index.commit("initial")
+    cache_dir = str(tmp_path / "cache")
+
+    first = git_synch.open_repo(str(tmp_path / "remote"), str(tmp_path / "first"), cache_dir)
+    first.git.checkout("-b", "dev_0")
+    second = git_synch.open_repo(str(tmp_path / "remote"), str(tmp_path / "second"), cache_dir)
+    # a clone instead of a worktree, which leaves the branches of the first run alone
+    assert os.path.isdir(tmp_path / "second" / ".git")
+    assert "dev_0" in git_synch.get_branches(first)
+    git_synch.close_repo(second)
+
+    git_synch.close_repo(first)
+    third = git_synch.open_repo(str(tmp_path / "remote"), str(tmp_path / "third"), cache_dir)
+    assert os.path.isfile(tmp_path / "third" / ".git")
+    git_synch.close_repo(third)
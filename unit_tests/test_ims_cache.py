@@ -0,0 +1,37 @@
+''' unit tests of the IMS metadata cache '''
+import ims_synch
+import ims_cache
+
+def test_only_newer_checkpoints_are_requested(tmp_path, monkeypatch):
+    requests = []
+    history = [ims_synch.Checkpoint("1.1", "anna"), ims_synch.Checkpoint("1.2", "bob")]
+
+    def get_checkpoints_from(ims_project, branch, lowest_checkpoint_number):
+        requests.append(lowest_checkpoint_number)
+        numbers = [checkpoint.number for checkpoint in history]
+        start = numbers.index(lowest_checkpoint_number) + 1 if lowest_checkpoint_number else 0
+        return history[start:]
+
+    monkeypatch.setattr(ims_synch, "get_checkpoints_from", get_checkpoints_from)
+    cache = ims_cache.MetadataCache(str(tmp_path / "metadata.db"))
+    assert [c.number for c in cache.get_checkpoints_from("p.pj", "main", None)] == ["1.1", "1.2"]
+
+    history.append(ims_synch.Checkpoint("1.3", "anna"))
+    assert [c.number for c in cache.get_checkpoints_from("p.pj", "main", "1.1")] == ["1.2", "1.3"]
+    assert requests == [None, "1.2"]
+    cache.close()
+
+def test_dev_paths_are_always_taken_from_ims(tmp_path, monkeypatch):
+    dev_paths = [ims_synch.Branch("main", None, None), ims_synch.Branch("dev_0", "1.1", "main")]
+    monkeypatch.setattr(ims_synch, "get_branches_with_source", lambda ims_project: dev_paths)
+    monkeypatch.setattr(ims_synch, "get_checkpoints_from",
+        lambda ims_project, branch, lowest_checkpoint_number: [ims_synch.Checkpoint("1.1", "a")])
+    cache = ims_cache.MetadataCache(str(tmp_path / "metadata.db"))
+    cache.get_checkpoints_from("p.pj", "main", None)
+    assert [b.name for b in cache.get_branches_with_source("p.pj")] == ["main", "dev_0"]
+
+    # dev paths come and go without a new checkpoint
+    dev_paths[1:] = [ims_synch.Branch("dev_1", "1.1", "main")]
+    cache.get_checkpoints_from("p.pj", "main", None)
+    assert [b.name for b in cache.get_branches_with_source("p.pj")] == ["main", "dev_1"]
+    cache.close()
@@ -0,0 +1,29 @@
+''' unit tests of the IMS side '''
+import ims_synch
+
+def test_parse_history_lines_with_multi_line_descriptions():
+    lines = ["1.3\tanna\tfix build", "", "second paragraph", "1.2\tbob\t", "1.1\tanna\tinitial"]
+
+    checkpoints = list(ims_synch.parse_history_lines(lines))
+
+    assert [checkpoint.number for checkpoint in checkpoints] == ["1.3", "1.2", "1.1"]
+    assert checkpoints[0].author == "anna"
+    assert checkpoints[0].description == "fix build\n\nsecond paragraph"
+    assert checkpoints[1].description == ""
+
+def test_history_stops_at_last_synched_checkpoint(monkeypatch):
+    read = []
+
+    def stream(args, encoding="utf-8", timeout=None):
+        yield "project.pj\n"
+        for number in range(20000, 0, -1):
+            read.append(number)
+            yield f"1.{number}\tanna\tcheckpoint {number}\n"
+
+    monkeypatch.setattr(ims_synch.si_runner, "stream", stream)
+    checkpoints = ims_synch.get_checkpoints_from("project.pj", "main", "1.19997")
+
+    assert [checkpoint.number for checkpoint in checkpoints] == ["1.19998", "1.19999", "1.20000"]
+    assert len(read) < 10
+    assert ims_synch.is_same_or_older("1.9", "1.10")
+    assert not ims_synch.is_same_or_older("1.3.1.1", "1.10")
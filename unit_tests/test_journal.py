@@ -0,0 +1,38 @@
+''' unit tests of the synchronization journal '''
+import os
+import journal
+
+def test_progress_is_restored_after_interruption(tmp_path):
+    file_name = str(tmp_path / "journal.jsonl")
+    run_journal = journal.Journal(file_name)
+    assert not run_journal.is_resumed()
+    run_journal.committed("main", "1.1", "aaa")
+    run_journal.committed("dev", "1.1.1.1", "bbb")
+    run_journal.pushed(run_journal.get_committed_checkpoints(["main"]))
+    run_journal.committed("main", "1.2", "ccc")
+    run_journal.close()
+    with open(file_name, "a", encoding="utf-8") as file:
+        file.write('{"branch": "main", "sta')
+
+    resumed = journal.Journal(file_name)
+    assert resumed.is_resumed()
+    assert resumed.get_committed_checkpoint("main", "ccc") == "1.2"
+    assert resumed.get_committed_checkpoint("main", "ddd") is None
+    assert sorted(resumed.get_unpushed_branches()) == ["dev", "main"]
+    resumed.pushed(resumed.get_committed_checkpoints(["main", "dev", "new"]))
+    resumed.close()
+
+    resumed = journal.Journal(file_name)
+    assert resumed.get_unpushed_branches() == []
+    resumed.finish()
+    assert not os.path.exists(file_name)
+
+def test_commit_during_push_stays_unpushed(tmp_path):
+    run_journal = journal.Journal(str(tmp_path / "journal.jsonl"))
+    run_journal.committed("main", "1.1", "aaa")
+    checkpoints = run_journal.get_committed_checkpoints(["main"])
+    # committed by another branch worker while the push is running
+    run_journal.committed("main", "1.2", "bbb")
+    run_journal.pushed(checkpoints)
+    assert run_journal.get_unpushed_branches() == ["main"]
+    run_journal.finish()
@@ -0,0 +1,173 @@
+''' tests of the synchronization commands '''
+import sys
+import json
+import inspect
+import pytest
+import typer
+from git import Repo
+from git import GitCommandError
+import main
+import manifest
+import git_synch
+import metrics
+import push_scheduler
+from test_fake_si import BENCH_DIR, generate_project
+
+sys.path.insert(0, BENCH_DIR)
+import run_benchmark
+
+def get_files(repo: Repo, branch: str) -> "list[str]":
+    ''' reports the files of the newest commit of a branch '''
+    return repo.git.ls_tree("-r", "--name-only", branch).splitlines()
+
+def get_checkpoints(repo: Repo, branch: str) -> "list[str]":
+    ''' reports the checkpoint numbers of the commits of a branch, newest first '''
+    return [git_synch.get_ims_checkpoint(commit) for commit in repo.iter_commits(branch)
+        if git_synch.is_commit_synched_with_ims(commit)]
+
+def test_failed_poll_does_not_stop_watching(tmp_path, monkeypatch):
+    polls = []
+
+    def synch_new_checkpoints(ims_repo, git_repo, ims_dir, git_dir, options, sandboxes):
+        with metrics.span("synch"):
+            polls.append(len(polls))
+        if len(polls) == 1:
+            raise GitCommandError(["git", "push"], 128)
+        return []
+
+    monkeypatch.setattr(main, "synch_new_checkpoints", synch_new_checkpoints)
+    monkeypatch.setattr(git_synch, "track_remote_branches", lambda repo: None)
+    git_repo = Repo.init(str(tmp_path / "git"))
+    options = main.SynchOptions(True, pusher=push_scheduler.PushScheduler(lambda branches: None))
+    metrics_file = tmp_path / "metrics.json"
+    main.watch_ims_branches("p.pj", git_repo, str(tmp_path / "ims"), str(tmp_path / "git"),
+        options, 0, 3, str(metrics_file))
+
+    assert polls == [0, 1, 2]
+    # the metrics only hold the last poll
+    assert json.loads(metrics_file.read_text())["stages"]["synch"]["count"] == 1
+
+def test_targets_get_their_branches_and_filters(tmp_path, monkeypatch):
+    project_file = generate_project(tmp_path, monkeypatch)
+    monkeypatch.chdir(tmp_path)
+    for name in ["full", "partner"]:
+        run_benchmark.create_remote(str(tmp_path / f"{name}.git"))
+    (tmp_path / "partner_filter.txt").write_text("dir01/\n")
+    (tmp_path / "targets.cfg").write_text(f"""
+[full]
+git_repo = {tmp_path / "full.git"}
+push = yes
+
+[partner]
+git_repo = {tmp_path / "partner.git"}
+branches = main, dev_0
+branch_map = main:master, dev_0:release
+push = yes
+filter_file = {tmp_path / "partner_filter.txt"}
+""")
+
+    run_benchmark.call_command(main.synch_ims_to_targets, ims_repo=project_file,
+        targets_file=str(tmp_path / "targets.cfg"), work_dir=str(tmp_path / "work"),
+        si_retries=0)
+
+    full = Repo(str(tmp_path / "full.git"))
+    partner = Repo(str(tmp_path / "partner.git"))
+    assert {"main", "dev_0", "dev_1"} <= set(git_synch.get_branches(full))
+    assert set(git_synch.get_branches(partner)) == {"main", "master", "release"}
+    for ims_branch, git_branch in [("main", "master"), ("dev_0", "release")]:
+        assert get_checkpoints(partner, git_branch) == get_checkpoints(full, ims_branch)
+        assert get_files(partner, git_branch) == [rel_path for rel_path
+            in get_files(full, ims_branch) if not rel_path.startswith("dir01/")]
+        assert len(get_files(partner, git_branch)) < len(get_files(full, ims_branch))
+    # the release branch starts from the master commit of its base checkpoint
+    assert git_synch.get_ims_checkpoint(partner.commit(partner.git.merge_base("release",
+        "master"))) == git_synch.get_ims_checkpoint(full.commit(full.git.merge_base("dev_0",
+        "main")))
+
+def test_manifest_reports_every_project_and_isolates_failures(tmp_path, monkeypatch):
+    project_file = generate_project(tmp_path, monkeypatch)
+    monkeypatch.chdir(tmp_path)
+    run_benchmark.create_remote(str(tmp_path / "spi.git"))
+    (tmp_path / "manifest.cfg").write_text(f"""
+[spi]
+ims_project = {project_file}
+git_repo = {tmp_path / "spi.git"}
+branches = main, dev_0
+push = yes
+
+[broken]
+ims_project = {project_file}
+git_repo = {tmp_path / "missing.git"}
+""")
+    report_file = tmp_path / "report.json"
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_benchmark.call_command(main.synch_manifest, manifest_file=str(tmp_path /
+            "manifest.cfg"), work_dir=str(tmp_path / "work"), report_file=str(report_file),
+            si_retries=0)
+
+    assert exit_info.value.code == manifest.SYS_EXIT_PROJECTS_FAILED
+    report = json.loads(report_file.read_text())
+    assert report["failed"] == 1
+    results = {result["project"]: result for result in report["projects"]}
+    assert results["broken"]["status"] == "failed"
+    assert results["broken"]["error"]
+    # the failure of one project does not affect the other
+    assert results["spi"]["status"] == "ok"
+    assert results["spi"]["commits"] == {"main": 5, "dev_0": 3}
+    spi = Repo(str(tmp_path / "spi.git"))
+    assert set(git_synch.get_branches(spi)) == {"main", "dev_0"}
+    assert len(get_checkpoints(spi, "main")) == 5
+
+@pytest.mark.parametrize("command, arguments", [
+    (main.synch_ims_to_git, {"persistent_sandbox": True}),
+    (main.watch_ims_to_git, {}),
+    (main.synch_manifest, {"persistent_sandbox": True}),
+    (main.synch_ims_to_targets, {"persistent_sandbox": True}),
+    (main.synch_ims_to_github, {"persistent_sandbox": True, "branch": "main"})])
+def test_hardlinks_are_rejected_with_persistent_sandboxes(tmp_path, monkeypatch, command,
+    arguments):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "projects.cfg").write_text("[spi]\nims_project = p.pj\ngit_repo = spi.git\n")
+    (tmp_path / "targets.cfg").write_text("[spi]\ngit_repo = spi.git\n")
+    candidates = {"ims_repo": "p.pj", "git_repo_url": "spi.git", "git_dir": "git",
+        "ims_dir": "ims", "work_dir": "work", "manifest_file": "projects.cfg",
+        "targets_file": "targets.cfg"}
+    parameters = inspect.signature(command).parameters
+    arguments.update({name: value for name, value in candidates.items() if name in parameters})
+
+    with pytest.raises(typer.BadParameter):
+        run_benchmark.call_command(command, copy_mode="hardlink", **arguments)
+    # changed members are written as new files, which keeps the links intact
+    options = main.create_synch_options(True, False, True, None, False, "hardlink", 1, None)
+    assert options.copier is not None
+
+@pytest.mark.parametrize("command", [main.watch_ims_to_git, main.synch_manifest])
+def test_runs_use_the_requested_fetch_workers(tmp_path, monkeypatch, command):
+    project_file = generate_project(tmp_path, monkeypatch)
+    monkeypatch.chdir(tmp_path)
+    run_benchmark.create_remote(str(tmp_path / "spi.git"))
+    (tmp_path / "manifest.cfg").write_text(f"""
+[spi]
+ims_project = {project_file}
+git_repo = {tmp_path / "spi.git"}
+""")
+    sandboxes = []
+    create_sandbox = main.create_sandbox
+
+    def record_sandbox(ims_repo, sandbox_dir, options):
+        sandboxes.append(create_sandbox(ims_repo, sandbox_dir, options))
+        assert options.prefetch == 0
+        return sandboxes[-1]
+
+    monkeypatch.setattr(main, "create_sandbox", record_sandbox)
+    candidates = {"ims_repo": project_file, "git_repo_url": str(tmp_path / "spi.git"),
+        "git_dir": "git", "ims_dir": "ims", "work_dir": "work",
+        "manifest_file": "manifest.cfg", "interval": 0, "iterations": 1}
+    parameters = inspect.signature(command).parameters
+    run_benchmark.call_command(command, member_fetch=True, fetch_workers=3, si_retries=0,
+        **{name: value for name, value in candidates.items() if name in parameters})
+
+    assert sandboxes
+    assert all(sandbox.workers == 3 for sandbox in sandboxes)
+
@@ -0,0 +1,30 @@
+''' unit tests of the batch manifest '''
+import os
+import manifest
+
+def test_example_manifest():
+    file_name = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "test", "test.cfg")
+
+    projects = manifest.read_manifest(file_name)
+
+    assert [project.name for project in projects] == ["spi", "msc", "sent"]
+    assert projects[0].ims_project == "/Projects/SW/spi/project.pj"
+    assert projects[0].git_repo == "https://github.com/example/spi.git"
+    assert projects[0].branches == []
+    assert projects[1].branches == ["main"]
+    assert [project.push for project in projects] == [False, False, True]
+
+def test_example_targets():
+    file_name = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "test", "targets.cfg")
+
+    targets = manifest.read_targets(file_name)
+
+    assert [target.name for target in targets] == ["internal", "partner"]
+    assert targets[0].get_git_branch("main") == "main"
+    assert targets[1].get_git_branch("main") == "master"
+    assert targets[1].branches == ["dev_release"]
+    assert targets[1].push_every == 50
+    assert targets[1].filter_file == os.path.join(os.path.dirname(file_name),
+        "partner_filter.txt")
@@ -0,0 +1,27 @@
+''' unit tests of the stage instrumentation '''
+import json
+import metrics
+
+def test_spans_are_aggregated_per_stage(tmp_path):
+    run = metrics.Metrics()
+    with run.context("main", "1.2"):
+        with run.span("copy") as span:
+            span.add(2, 100)
+        with run.span("copy") as span:
+            span.add(1, 10)
+    with run.span("git_push"):
+        pass
+
+    summary = run.summary()
+    assert summary["stages"]["copy"]["count"] == 2
+    assert summary["stages"]["copy"]["files"] == 3
+    assert summary["stages"]["copy"]["bytes"] == 110
+
+    run.write_json(str(tmp_path / "metrics.json"))
+    with open(tmp_path / "metrics.json", encoding="utf-8") as file:
+        spans = json.load(file)["spans"]
+    assert (spans[0]["branch"], spans[0]["checkpoint"]) == ("main", "1.2")
+    assert spans[2]["branch"] is None
+
+    run.write_prometheus(str(tmp_path / "metrics.prom"))
+    assert 'gtm_synch_stage_bytes_total{stage="copy"} 110' in (tmp_path / "metrics.prom").read_text()
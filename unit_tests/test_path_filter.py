@@ -0,0 +1,51 @@
+''' unit tests of the gitignore-style path filter '''
+import os
+import dir_synch
+import path_filter
+
+def test_gitignore_rules():
+    paths = path_filter.PathFilter(["# generated files", "*.o", "/build/", "out/",
+        "!keep.o", "doc/**/*.pdf", ""])
+
+    assert paths.is_excluded("main.o")
+    assert paths.is_excluded("src/deep/main.o")
+    assert not paths.is_excluded("keep.o")
+    assert paths.is_excluded("build/main.c")
+    assert not paths.is_excluded("src/build/main.c")
+    assert paths.is_excluded("src/out/main.c")
+    assert not paths.is_excluded("out")
+    assert paths.is_excluded("doc/manual.pdf")
+    assert paths.is_excluded("doc/a/b/manual.pdf")
+    assert not paths.is_excluded("src/main.c")
+
+def test_character_classes():
+    assert path_filter.PathFilter(["file[0-9].txt"]).is_excluded("file1.txt")
+    assert not path_filter.PathFilter(["file[0-9].txt"]).is_excluded("filex.txt")
+    # only a leading ! negates
+    assert path_filter.PathFilter(["file[!0-9].txt"]).is_excluded("filex.txt")
+    assert not path_filter.PathFilter(["file[!0-9].txt"]).is_excluded("file1.txt")
+    assert path_filter.PathFilter(["file[a!].txt"]).is_excluded("file!.txt")
+    assert not path_filter.PathFilter(["file[a!].txt"]).is_excluded("fileb.txt")
+    # a ] right after [ or [! is part of the class
+    assert path_filter.PathFilter(["file[]a].txt"]).is_excluded("file].txt")
+    assert path_filter.PathFilter(["file[!]a].txt"]).is_excluded("fileb.txt")
+    assert not path_filter.PathFilter(["file[!]a].txt"]).is_excluded("file].txt")
+    # characters special in a regular expression class are literal
+    assert path_filter.PathFilter(["file[x^].txt"]).is_excluded("file^.txt")
+    assert path_filter.PathFilter(["file[[x].txt"]).is_excluded("file[.txt")
+    assert path_filter.PathFilter(["file[\\x].txt"]).is_excluded("file\\.txt")
+    assert not path_filter.PathFilter(["a[!x]b"]).is_excluded("a/b")
+
+def test_excluded_files_are_not_synched(tmp_path):
+    src_dir = tmp_path / "src"
+    (src_dir / "build").mkdir(parents=True)
+    (src_dir / "build" / "image.bin").write_text("binary")
+    (src_dir / "main.c").write_text("int main;")
+    dst_dir = tmp_path / "dst"
+    dst_dir.mkdir()
+
+    changes = dir_synch.synch_tree(str(src_dir), str(dst_dir),
+        paths=path_filter.PathFilter(["build/"]))
+
+    assert changes.added == ["main.c"]
+    assert os.listdir(dst_dir) == ["main.c"]
@@ -0,0 +1,78 @@
+''' unit tests of the branch and checkpoint scheduling '''
+import threading
+import ims_synch
+import scheduler
+import pipeline
+import push_scheduler
+
+def test_parents_are_synched_before_children():
+    branches = [ims_synch.Branch("main", "1.1", None),
+        ims_synch.Branch("child", "1.1.1.2", "dev"),
+        ims_synch.Branch("dev", "1.3", "main"),
+        ims_synch.Branch("other", "1.4", "")]
+    done = []
+    lock = threading.Lock()
+
+    def synch_branch(branch):
+        with lock:
+            done.append(branch.name)
+
+    scheduler.synch_branches_parallel(branches, synch_branch, 3)
+
+    assert done[0] == "main"
+    assert done.index("dev") < done.index("child")
+    assert sorted(done) == ["child", "dev", "main", "other"]
+
+class FakeSandbox:
+    def __init__(self, name):
+        self.sandbox_dir = name
+        self.checkpoint = None
+
+    def update_to(self, checkpoint):
+        self.checkpoint = checkpoint
+
+    def release(self):
+        pass
+
+def test_pipeline_commits_in_checkpoint_order():
+    checkpoints = [ims_synch.Checkpoint(f"1.{number}", "anna") for number in range(1, 20)]
+    committed = []
+
+    def commit_checkpoint(checkpoint, sandbox):
+        assert sandbox.checkpoint == checkpoint.number
+        committed.append(checkpoint.number)
+
+    pipeline.synch_checkpoints_pipelined(checkpoints,
+        [FakeSandbox("a"), FakeSandbox("b"), FakeSandbox("c")], commit_checkpoint)
+
+    assert committed == [checkpoint.number for checkpoint in checkpoints]
+
+def test_pushes_touched_branches_in_batches():
+    pushes = []
+    pusher = push_scheduler.PushScheduler(pushes.append, every_commits=3)
+    for branch in ["main", "main", "dev", "dev", "main"]:
+        pusher.committed(branch)
+    assert pushes == [["main", "dev"]]
+    assert pusher.flush() == ["dev", "main"]
+    assert pusher.flush() == []
+    assert pushes == [["main", "dev"], ["dev", "main"]]
+
+def test_branch_tree_is_independent_of_the_listing_order():
+    branches = [ims_synch.Branch("main", "1.1", None),
+        ims_synch.Branch("child", "1.3.2.2", ""),
+        ims_synch.Branch("other_child", "1.3.1.1", ""),
+        ims_synch.Branch("dev", "1.3", ""),
+        ims_synch.Branch("dev2", "1.3", ""),
+        ims_synch.Branch("side", "1.4", "")]
+    prefixes = {"dev": "1.3.1", "dev2": "1.3.2"}
+    ims_synch.assign_source_dev_paths(branches, prefixes.get)
+
+    assert [branch.source_dev_path_name for branch in branches] == \
+        [None, "dev2", "dev", "main", "main", "main"]
+    tree = scheduler.BranchTree(branches)
+    order = [branch.name for branch in tree.topological_order()]
+    assert order[0] == "main"
+    assert order.index("dev2") < order.index("child")
+    assert order.index("dev") < order.index("other_child")
+    assert [[branch.name for branch in subtree] for subtree in tree.subtrees()] == \
+        [["dev", "other_child"], ["dev2", "child"], ["side"]]
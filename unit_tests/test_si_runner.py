@@ -0,0 +1,68 @@
+''' unit tests of the si command runner against a fake si command '''
+import os
+import sys
+import time
+import shlex
+import pytest
+import si_runner
+
+FAKE_SI = """
+import os, sys, time
+mode, state_dir = sys.argv[1], sys.argv[2]
+attempts_file = os.path.join(state_dir, "attempts")
+attempts = int(open(attempts_file).read()) + 1 if os.path.exists(attempts_file) else 1
+open(attempts_file, "w").write(str(attempts))
+if mode == "hang":
+    time.sleep(60)
+elif mode == "flaky" and attempts < 3:
+    sys.exit("Connection refused by the server")
+elif mode == "broken":
+    sys.exit("No such project")
+elif mode == "endless":
+    open(os.path.join(state_dir, "pid"), "w").write(str(os.getpid()))
+    while True:
+        print("line", flush=True)
+        time.sleep(0.01)
+print("done")
+"""
+
+@pytest.fixture(name="runner")
+def fixture_runner(tmp_path, monkeypatch):
+    script = tmp_path / "fake_si.py"
+    script.write_text(FAKE_SI)
+    monkeypatch.setenv("GTM_SI_COMMAND", shlex.join([sys.executable, str(script)]))
+    monkeypatch.setattr(si_runner, "SI_COMMAND", si_runner.get_si_command())
+    runner = si_runner.SiRunner(max_concurrency=2, timeout=10, retries=3, backoff=0.1)
+    yield runner
+    runner.close()
+
+def get_attempts(tmp_path) -> int:
+    return int((tmp_path / "attempts").read_text())
+
+def test_hanging_command_is_killed(runner, tmp_path):
+    start = time.monotonic()
+    with pytest.raises(si_runner.SiCommandError) as error:
+        runner.run(["hang", str(tmp_path)], timeout=0.5)
+    assert error.value.returncode is None
+    assert time.monotonic() - start < 10
+
+def test_transient_error_is_retried_with_backoff(runner, tmp_path):
+    start = time.monotonic()
+    assert runner.run(["flaky", str(tmp_path)]).strip() == "done"
+    assert get_attempts(tmp_path) == 3
+    # backoff of 0.1 s and 0.2 s
+    assert time.monotonic() - start >= 0.3
+
+def test_other_error_is_not_retried(runner, tmp_path):
+    with pytest.raises(si_runner.SiCommandError) as error:
+        runner.run(["broken", str(tmp_path)])
+    assert error.value.returncode == 1
+    assert "No such project" in error.value.stderr
+    assert get_attempts(tmp_path) == 1
+
+def test_closing_a_stream_kills_the_command(runner, tmp_path):
+    lines = runner.stream(["endless", str(tmp_path)])
+    assert next(lines).strip() == "line"
+    lines.close()
+    with pytest.raises(ProcessLookupError):
+        os.kill(int((tmp_path / "pid").read_text()), 0)
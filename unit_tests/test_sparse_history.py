@@ -0,0 +1,22 @@
+''' unit tests of the sparse import '''
+import ims_synch
+import sparse_history
+
+def make_checkpoints(count: int) -> "list[ims_synch.Checkpoint]":
+    return [ims_synch.Checkpoint(f"1.{number}", "author") for number in range(1, count + 1)]
+
+def test_selection_keeps_tip_and_branch_points():
+    checkpoints = make_checkpoints(12)
+    selection = sparse_history.Selection(every=5, last=2, labelled=True)
+    selected = selection.select(checkpoints, labelled_numbers={"1.3"}, keep={"1.8"})
+    assert [checkpoint.number for checkpoint in selected] == \
+        ["1.1", "1.3", "1.6", "1.8", "1.11", "1.12"]
+    assert not sparse_history.Selection().is_sparse()
+
+def test_gaps_end_at_the_newest_imported_checkpoint():
+    checkpoints = make_checkpoints(6)
+    gaps = sparse_history.find_gaps("main", checkpoints, {"1.2": "a", "1.5": "b"})
+    assert [[checkpoint.number for checkpoint in gap.checkpoints] for gap in gaps] == \
+        [["1.1"], ["1.3", "1.4"]]
+    assert [(gap.parent, gap.child) for gap in gaps] == [(None, "a"), ("a", "b")]
+    assert gaps[1].ref == "refs/ims-backfill/main/1.5"
@@ -0,0 +1,32 @@
+''' unit tests of the background deletion '''
+import os
+import stat
+import trash
+
+def test_empty_dir_moves_content_into_the_trash(tmp_path):
+    work_dir = tmp_path / "work"
+    (work_dir / "sub").mkdir(parents=True)
+    (work_dir / ".git").write_text("gitdir: elsewhere")
+    read_only = work_dir / "sub" / "read_only.c"
+    read_only.write_text("content")
+    os.chmod(read_only, stat.S_IREAD)
+
+    trash.empty_dir(str(work_dir), keep=(".git",))
+
+    assert os.listdir(work_dir) == [".git"]
+    trash.wait()
+    assert os.listdir(tmp_path / trash.TRASH_DIR_NAME) == []
+
+def test_trash_of_a_terminated_run_is_reclaimed(tmp_path):
+    # trash next to the directory and trash of entries discarded within it
+    trash_dirs = [tmp_path / trash.TRASH_DIR_NAME, tmp_path / "work" / trash.TRASH_DIR_NAME]
+    for trash_dir in trash_dirs:
+        left_over = trash_dir / "0123" / "sub"
+        left_over.mkdir(parents=True)
+        (left_over / "file.c").write_text("content")
+
+    trash.reclaim(str(tmp_path / "work"))
+    trash.wait()
+
+    for trash_dir in trash_dirs:
+        assert os.listdir(trash_dir) == []